@@ -0,0 +1,63 @@
+# benchmarks/ann_recall.py
+#
+# Recall@k and latency of EmbeddingIndex.knn through the IVF index at
+# several nprobe settings, against exact search over the same vectors.
+#
+#   python -m PaperSearch.benchmarks.ann_recall --vectors 200000 --k 10
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.embedding_index import EmbeddingIndex
+from .synthetic import clustered_vectors, write_embeddings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--spread", type=float, default=2.0)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.vectors + args.queries, args.dim, spread=args.spread)
+    data, queries = vectors[:args.vectors], vectors[args.vectors:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "emb.db"))
+        write_embeddings(db_path, data)
+        emb = EmbeddingIndex(db_path)
+        emb.load_matrix()
+
+        start = time.perf_counter()
+        emb.build_ann(Path(tmp, "ivf"), n_lists=args.lists)
+        build_s = time.perf_counter() - start
+        emb.load_ann(Path(tmp, "ivf"))
+
+        start = time.perf_counter()
+        truth = [{wid for wid, _ in emb.knn(q, args.k, exact=True)} for q in queries]
+        exact_ms = (time.perf_counter() - start) / len(queries) * 1e3
+
+        print(
+            f"{args.vectors} vectors x {args.dim}, {emb.ann.n_lists} lists, build {build_s:.1f} s; "
+            f"exact {exact_ms:.2f} ms/query"
+        )
+        for nprobe in args.nprobe:
+            start = time.perf_counter()
+            hits = [emb.knn(q, args.k, nprobe=nprobe) for q in queries]
+            ms = (time.perf_counter() - start) / len(queries) * 1e3
+            recall = np.mean([
+                len(truth_set & {wid for wid, _ in found}) / args.k for truth_set, found in zip(truth, hits)
+            ])
+            print(f"nprobe {nprobe:>4}  recall@{args.k} {recall:.3f}  {ms:7.2f} ms/query  x{exact_ms / ms:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/batch_queries.py
+#
+# Throughput of a batch of saved queries, looped one at a time against
+# scored as one batch: BM25Index.score (numpy and wand) against
+# score_many on a memory-mapped segment, then CanonicalSearch.search
+# against search_many with metadata hydration. Scoring is measured for a
+# mix of common terms and for selective queries of rare terms (few
+# postings per query, where batch steps hold many queries). Batch
+# results are checked against the looped ones (numpy scores exactly; for
+# search, the work ids ranked, where only float32 rounding of near-equal
+# scores may differ).
+#
+#   python -m PaperSearch.benchmarks.batch_queries --docs 100000 --queries 2000
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index
+from PaperSearch.src.PaperSearch.indexing.search_api import CanonicalSearch
+from .synthetic import make_queries, write_normalized_works
+
+
+def saved_queries(n: int, seed: int = 0) -> list[str]:
+    """
+    A mix of 1-4 term queries, as an alerting job would hold them.
+    """
+    rng = random.Random(seed)
+    pools = {k: make_queries(n, k, seed=seed + k) for k in (1, 2, 3, 4)}
+    return [pools[rng.randint(1, 4)][i] for i in range(n)]
+
+
+def selective_queries(index: BM25Index, n: int, seed: int = 0) -> list[str]:
+    """
+    1-3 term queries over terms found in 5 to 200 documents.
+    """
+    rng = random.Random(seed)
+    rare = sorted(t for t in index.inverted if 5 <= index.df[t] <= 200)
+    return [" ".join(rng.sample(rare, rng.randint(1, 3))) for _ in range(n)]
+
+
+def qps(run, n: int) -> tuple[float, object]:
+    start = time.perf_counter()
+    out = run()
+    return n / (time.perf_counter() - start), out
+
+
+def same_up_to_ties(a: list[tuple[str, float]], b: list[tuple[str, float]], tol: float = 1e-4) -> bool:
+    """
+    Same scores in order, and the same ids except among equal scores.
+    """
+    if len(a) != len(b) or any(abs(x - y) > tol for (_, x), (_, y) in zip(a, b)):
+        return False
+    cut = a[-1][1] if a else 0.0
+    return {w for w, s in a if s > cut + tol} == {w for w, s in b if s > cut + tol}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        build_canonical_bm25_index(db_path).save(Path(tmp, "bm25"))
+        index = BM25Index.load(Path(tmp, "bm25"))
+        queries = saved_queries(args.queries)
+        n = len(queries)
+        print(f"{args.docs} docs, {n} queries ({len(set(queries))} distinct), top {args.top_k}")
+
+        index.score_many(queries[:50], args.top_k)
+        for label, batch in (("saved", queries), ("selective", selective_queries(index, n))):
+            print(f"\n{'scoring, ' + label:<28} {'queries/s':>10}  same")
+            numpy_qps, looped = qps(lambda: [index.score(q, args.top_k, method="numpy") for q in batch], n)
+            wand_qps, _ = qps(lambda: [index.score(q, args.top_k, method="wand") for q in batch], n)
+            batch_qps, batched = qps(lambda: index.score_many(batch, args.top_k), n)
+            same = all(same_up_to_ties(a, b) for a, b in zip(batched, looped))
+            print(f"{'loop score(numpy)':<28} {numpy_qps:10.0f}")
+            print(f"{'loop score(wand)':<28} {wand_qps:10.0f}")
+            print(f"{'score_many':<28} {batch_qps:10.0f}  {same}  ({batch_qps / numpy_qps:.1f}x numpy)")
+
+        canonical = CanonicalSearch(db_path, index)
+        loop_qps, looped = qps(lambda: [canonical.search(q, args.top_k) for q in queries], n)
+        batch_qps, batched = qps(lambda: canonical.search_many(queries, args.top_k), n)
+        agree = sum(
+            [r["work_id"] for r in a] == [r["work_id"] for r in b] for a, b in zip(looped, batched)
+        ) / n
+        print(f"\n{'search':<28} {'queries/s':>10}  identical rankings")
+        print(f"{'loop CanonicalSearch.search':<28} {loop_qps:10.0f}")
+        print(f"{'search_many':<28} {batch_qps:10.0f}  {agree:.1%}  ({batch_qps / loop_qps:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
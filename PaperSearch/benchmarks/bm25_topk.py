@@ -0,0 +1,86 @@
+# benchmarks/bm25_topk.py
+#
+# Query latency of BM25Index.score for each evaluation method, on short
+# and long queries, plus a check that every method returns the same hits.
+#
+#   python -m PaperSearch.benchmarks.bm25_topk --docs 30000 --segment /tmp/bm25_bench
+
+import argparse
+import math
+import statistics
+import time
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index, SCORE_METHODS
+from PaperSearch.src.PaperSearch.indexing.segment import MANIFEST_NAME
+from .synthetic import iter_documents, make_queries
+
+
+def load_or_build(n_docs: int, segment: str | None) -> BM25Index:
+    if segment and Path(segment, MANIFEST_NAME).exists():
+        return BM25Index.load(segment)
+
+    index = BM25Index()
+    for doc_id, (work_id, text, concepts) in enumerate(iter_documents(n_docs)):
+        index.add_document(doc_id, work_id, text, concepts=concepts)
+    index.finalize()
+    if segment:
+        index.save(segment)
+        return BM25Index.load(segment)
+    return index
+
+
+def same_hits(hits, reference, rel_tol: float = 1e-5) -> bool:
+    """
+    Same ranked scores (to float32 precision, for the numpy path) and the
+    same documents above the k-th score.
+    """
+    if len(hits) != len(reference):
+        return False
+    if not all(math.isclose(h, r, rel_tol=rel_tol) for (_, h), (_, r) in zip(hits, reference)):
+        return False
+    if not reference:
+        return True
+    cutoff = reference[-1][1] * (1 + rel_tol)
+    return {w for w, s in hits if s > cutoff} == {w for w, s in reference if s > cutoff}
+
+
+def time_queries(index: BM25Index, queries: list[str], top_k: int, method: str) -> list[float]:
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.score(q, top_k=top_k, method=method)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=30_000)
+    parser.add_argument("--segment", help="reuse/save the index here")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = load_or_build(args.docs, args.segment)
+    print(f"{index.N} docs, {len(index.inverted)} terms, top_k={args.top_k}")
+
+    for label, n_terms in (("short", 2), ("long", 8)):
+        queries = make_queries(args.queries, n_terms, seed=n_terms)
+
+        reference = [index.score(q, top_k=args.top_k) for q in queries]
+        for method in SCORE_METHODS:
+            hits = [index.score(q, top_k=args.top_k, method=method) for q in queries]
+            same = all(same_hits(h, r) for h, r in zip(hits, reference))
+            lat = sorted(time_queries(index, queries, args.top_k, method))
+            print(
+                f"{label:<5} ({n_terms} terms) {method:<10} "
+                f"mean {statistics.mean(lat):7.2f} ms  "
+                f"p50 {lat[len(lat) // 2]:7.2f} ms  "
+                f"p95 {lat[int(len(lat) * 0.95) - 1]:7.2f} ms  "
+                f"same hits: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
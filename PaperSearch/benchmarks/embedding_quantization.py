@@ -0,0 +1,105 @@
+# benchmarks/embedding_quantization.py
+#
+# Memory, scoring throughput and ranking agreement of float16 and int8
+# embedding storage against float32: table bytes per vector, resident
+# matrix size, candidate rerank and full-scan latency, top-k overlap
+# and rank correlation of the scores.
+#
+#   python -m PaperSearch.benchmarks.embedding_quantization --vectors 100000
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.embedding_index import EmbeddingIndex
+from .synthetic import clustered_vectors, write_embeddings
+
+DTYPES = ["float32", "float16", "int8"]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def ranks(x: np.ndarray) -> np.ndarray:
+    out = np.empty(len(x))
+    out[np.argsort(x, kind="stable")] = np.arange(len(x))
+    return out
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.corrcoef(ranks(a), ranks(b))[0, 1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.vectors + args.queries, args.dim, spread=2.0)
+    data, queries = vectors[:args.vectors], vectors[args.vectors:]
+    rng = np.random.default_rng(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        indexes = {}
+        for dtype in DTYPES:
+            db_path = str(Path(tmp, f"{dtype}.db"))
+            work_ids = write_embeddings(db_path, data, dtype=dtype)
+            with sqlite3.connect(db_path) as conn:
+                blob_bytes = conn.execute("SELECT AVG(LENGTH(vector)) FROM embeddings").fetchone()[0]
+            emb = EmbeddingIndex(db_path, dtype=dtype)
+            start = time.perf_counter()
+            emb.load_matrix()
+            load_s = time.perf_counter() - start
+            indexes[dtype] = (emb, blob_bytes, load_s)
+
+        candidates = [
+            [work_ids[i] for i in rng.choice(len(work_ids), args.candidates, replace=False)]
+            for _ in queries
+        ]
+        base = indexes["float32"][0]
+        base_rerank = [base.similarities(q, c) for q, c in zip(queries, candidates)]
+        base_top = [{wid for wid, _ in base.knn(q, args.k, exact=True)} for q in queries]
+
+        print(
+            f"{args.vectors} vectors x {args.dim}, {args.queries} queries, "
+            f"{args.candidates} candidates, k={args.k}"
+        )
+        print(
+            f"{'dtype':<8} {'blob B':>7} {'matrix MB':>10} {'load s':>7} {'rerank ms':>10} "
+            f"{'scan ms':>8} {'recall@k':>9} {'spearman':>9} {'max |diff|':>11}"
+        )
+        for dtype in DTYPES:
+            emb, blob_bytes, load_s = indexes[dtype]
+            matrix_mb = (emb.matrix.nbytes + (emb.scales.nbytes if emb.scales is not None else 0)) / 2**20
+
+            rerank = [emb.similarities(q, c) for q, c in zip(queries, candidates)]
+            rerank_ms = timed(lambda: [emb.similarities(q, c) for q, c in zip(queries, candidates)], 3)
+            rerank_ms /= len(queries)
+
+            start = time.perf_counter()
+            top = [{wid for wid, _ in emb.knn(q, args.k, exact=True)} for q in queries]
+            scan_ms = (time.perf_counter() - start) / len(queries) * 1e3
+
+            recall = np.mean([len(a & b) / args.k for a, b in zip(base_top, top)])
+            rho = np.mean([spearman(a, b) for a, b in zip(base_rerank, rerank)])
+            diff = max(float(np.max(np.abs(a - b))) for a, b in zip(base_rerank, rerank))
+            print(
+                f"{dtype:<8} {blob_bytes:7.0f} {matrix_mb:10.1f} {load_s:7.2f} {rerank_ms:10.3f} "
+                f"{scan_ms:8.2f} {recall:9.4f} {rho:9.5f} {diff:11.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
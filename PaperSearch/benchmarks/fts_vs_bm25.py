@@ -0,0 +1,133 @@
+# benchmarks/fts_vs_bm25.py
+#
+# FTS5Index against BM25Index over the same normalized_works table:
+# build time, bytes on disk, cold latency (first query on a freshly
+# opened index: a new FTS5 connection, or a BM25 segment just mapped;
+# the OS page cache stays warm in both cases), warm latency per query
+# length, overlap of the top k, and the cost of syncing rows changed
+# through the triggers. The two must match the same documents; only
+# their BM25 parameters differ.
+#
+#   python -m PaperSearch.benchmarks.fts_vs_bm25 --docs 100000
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index
+from PaperSearch.src.PaperSearch.indexing.fts_index import FTS5Index
+from .synthetic import make_queries, write_normalized_works
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def db_bytes(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(db_path)
+
+
+def median_ms(score, queries: list[str], top_k: int) -> float:
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        score(q, top_k=top_k)
+        latencies.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=100, help="queries per term count")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--method", default="wand", help="BM25Index score method")
+    parser.add_argument("--updates", type=int, default=1000, help="rows rewritten before timing a sync")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        base_bytes = db_bytes(db_path)
+
+        start = time.perf_counter()
+        built = build_canonical_bm25_index(db_path)
+        bm25_build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        built.save(Path(tmp, "bm25"))
+        bm25_save_s = time.perf_counter() - start
+        bm25_bytes = dir_bytes(Path(tmp, "bm25"))
+        del built
+
+        start = time.perf_counter()
+        FTS5Index.build(db_path)
+        fts_build_s = time.perf_counter() - start
+        fts_bytes = db_bytes(db_path) - base_bytes
+
+        print(f"{args.docs} docs")
+        print(f"{'':<6} {'build s':>8} {'disk MB':>8}")
+        print(f"{'bm25':<6} {bm25_build_s + bm25_save_s:8.2f} {bm25_bytes / 2**20:8.1f}"
+              f"   (in-memory build {bm25_build_s:.2f} s, needed per process without a segment)")
+        print(f"{'fts5':<6} {fts_build_s:8.2f} {fts_bytes / 2**20:8.1f}")
+
+        queries = {n: make_queries(args.queries, n, seed=n) for n in (1, 2, 4)}
+        cold_query = queries[2][0]
+        start = time.perf_counter()
+        bm25 = BM25Index.load(Path(tmp, "bm25"))
+        bm25.score(cold_query, top_k=args.top_k, method=args.method)
+        bm25_cold = (time.perf_counter() - start) * 1e3
+        start = time.perf_counter()
+        fts = FTS5Index(db_path)
+        fts.score(cold_query, top_k=args.top_k)
+        fts_cold = (time.perf_counter() - start) * 1e3
+        print(f"\ncold first query ms: bm25 load + {args.method} {bm25_cold:.1f}, fts5 connect + query {fts_cold:.1f}")
+
+        def bm25_score(q: str, top_k: int):
+            return bm25.score(q, top_k=top_k, method=args.method)
+
+        print(f"\nwarm median ms, top {args.top_k}")
+        print(f"{'terms':>5} {'bm25':>8} {'fts5':>8} {'overlap':>8}  same matches")
+        for n, qs in queries.items():
+            bm25_ms = median_ms(bm25_score, qs, args.top_k)
+            fts_ms = median_ms(fts.score, qs, args.top_k)
+            overlaps = []
+            for q in qs:
+                a = {w for w, _ in bm25_score(q, args.top_k)}
+                b = {w for w, _ in fts.score(q, top_k=args.top_k)}
+                overlaps.append(len(a & b) / max(len(a), 1))
+            same = all(
+                {w for w, _ in bm25_score(q, args.docs)} == {w for w, _ in fts.score(q, top_k=args.docs)}
+                for q in qs[:5]
+            )
+            print(f"{n:>5} {bm25_ms:8.2f} {fts_ms:8.2f} {statistics.mean(overlaps):8.0%}  {same}")
+
+        conn = sqlite3.connect(db_path)
+        start = time.perf_counter()
+        conn.execute(
+            "UPDATE normalized_works SET title = title || ' revised' WHERE id <= ?", (args.updates,)
+        )
+        conn.commit()
+        update_ms = (time.perf_counter() - start) * 1e3
+        conn.close()
+        pending = fts.pending()
+        stale = len({w for w, _ in fts.score("revised", top_k=args.docs)})
+        start = time.perf_counter()
+        synced = fts.sync()
+        sync_ms = (time.perf_counter() - start) * 1e3
+        found = {w for w, _ in fts.score("revised", top_k=args.docs)}
+        print(f"\n{args.updates} rows updated in {update_ms:.1f} ms (triggers included); {pending} pending, "
+              f"{stale} searchable before the sync")
+        print(f"sync of {synced} rows {sync_ms:.1f} ms; all searchable: {len(found) == args.updates}")
+        fts.close()
+
+
+if __name__ == "__main__":
+    main()
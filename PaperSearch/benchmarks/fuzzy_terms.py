@@ -0,0 +1,147 @@
+# benchmarks/fuzzy_terms.py
+#
+# Typo-tolerant term lookup. First, TrigramIndex.neighbours against a
+# scan of the vocabulary with bounded_edit_distance, for growing
+# vocabularies: lookup time should grow far slower than the scan, with
+# the same neighbours. Then BM25Index.score(..., fuzzy=True) on queries
+# with one misspelled term, reporting the expansion overhead from
+# `last_expansion` and how often the correct term's top hits come back
+# (typos in the first character are not corrected, by design).
+#
+# Synthetic documents use "t<rank>" tokens, which are all one edit
+# apart, so they are rewritten into made-up words first.
+#
+#   python -m PaperSearch.benchmarks.fuzzy_terms --vocab 10000 100000 --docs 30000
+
+import argparse
+import random
+import statistics
+import time
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index
+from PaperSearch.src.PaperSearch.indexing.fuzzy import TrigramIndex, bounded_edit_distance, fuzziness
+from .synthetic import iter_documents, make_queries
+
+CONSONANTS = "bcdfghklmnprstvz"
+VOWELS = "aeiou"
+
+
+def made_up_words(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    words: dict[str, None] = {}
+    while len(words) < n:
+        syllables = rng.randint(2, 5)
+        words["".join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(syllables))] = None
+    return list(words)
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word))
+    edit = rng.choice(("delete", "insert", "replace", "swap"))
+    if edit == "swap" and i + 1 < len(word) and word[i] != word[i + 1]:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == "delete":
+        return word[:i] + word[i + 1:]
+    if edit == "insert":
+        return word[:i] + rng.choice(VOWELS + CONSONANTS) + word[i:]
+    return word[:i] + rng.choice([c for c in VOWELS + CONSONANTS if c != word[i]]) + word[i + 1:]
+
+
+def scan(vocab: list[str], word: str) -> list[tuple[str, int]]:
+    """
+    What TrigramIndex.neighbours should find: every term with the same
+    first character within `fuzziness(word)` edits.
+    """
+    d = fuzziness(word)
+    hits = [(t, bounded_edit_distance(word, t, d)) for t in vocab if t[:1] == word[:1]]
+    return sorted((t, dist) for t, dist in hits if dist <= d)
+
+
+def lookup_scaling(vocab_sizes: list[int], n_words: int) -> None:
+    print(f"{'vocab':>9} {'build s':>8} {'lookup us':>10} {'scan ms':>9} {'candidates':>11}  same")
+    rng = random.Random(1)
+    for size in vocab_sizes:
+        vocab = made_up_words(size)
+        start = time.perf_counter()
+        index = TrigramIndex(vocab)
+        build_s = time.perf_counter() - start
+
+        typos = [misspell(w, rng) for w in rng.sample(vocab, n_words)]
+        lookup, scanned, candidates, same = [], [], [], True
+        for i, typo in enumerate(typos):
+            t0 = time.perf_counter()
+            found = index.neighbours(typo)
+            lookup.append((time.perf_counter() - t0) * 1e6)
+            candidates.append(len(index.candidates(typo, fuzziness(typo))))
+            if i < 10:
+                t0 = time.perf_counter()
+                same &= sorted(found) == scan(vocab, typo)
+                scanned.append((time.perf_counter() - t0) * 1e3)
+        print(
+            f"{size:>9} {build_s:8.2f} {statistics.median(lookup):10.1f} {statistics.median(scanned):9.1f} "
+            f"{statistics.mean(candidates):11.1f}  {same}"
+        )
+
+
+def query_expansion(n_docs: int, n_queries: int, top_k: int) -> None:
+    words = made_up_words(50_000, seed=2)
+
+    def rewrite(text: str) -> str:
+        return " ".join(
+            words[int(t[1:])] if t[0] == "t" and t[1:].isdigit() else t for t in text.split()
+        )
+
+    index = BM25Index()
+    for doc_id, (work_id, text, concepts) in enumerate(iter_documents(n_docs)):
+        index.add_document(doc_id, work_id, rewrite(text), concepts=concepts)
+    index.finalize()
+    start = time.perf_counter()
+    index.fuzzy_index()
+    print(f"\n{n_docs} docs, {len(index.inverted)} terms: trigram index built in {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(3)
+    rows = []
+    for query in make_queries(n_queries, 3, seed=4):
+        terms = rewrite(query).split()
+        i = rng.randrange(len(terms))
+        typo = misspell(terms[i], rng)
+        if typo in index.inverted:
+            continue
+        bad = " ".join(terms[:i] + [typo] + terms[i + 1:])
+
+        t0 = time.perf_counter()
+        exact = index.score(bad, top_k=top_k, method="wand")
+        plain_ms = (time.perf_counter() - t0) * 1e3
+        t0 = time.perf_counter()
+        fuzzy = index.score(bad, top_k=top_k, method="wand", fuzzy=True)
+        fuzzy_ms = (time.perf_counter() - t0) * 1e3
+        expansion_ms = index.last_expansion["ms"]
+        corrected = terms[i] in {t for t, _ in index.last_expansion["expanded"].get(typo, [])}
+        reference = {w for w, _ in index.score(" ".join(terms), top_k=top_k, method="wand")}
+        overlap = [len(reference & {w for w, _ in hits}) / max(len(reference), 1) for hits in (exact, fuzzy)]
+        rows.append((plain_ms, fuzzy_ms, expansion_ms, corrected, *overlap))
+
+    plain, fuzzy, expansion, corrected, overlap_plain, overlap_fuzzy = zip(*rows)
+    print(f"{len(rows)} queries with one misspelled term, wand top {top_k}")
+    print(f"  median ms: plain {statistics.median(plain):.2f}, fuzzy {statistics.median(fuzzy):.2f}, "
+          f"of which expansion {statistics.median(expansion):.2f} (max {max(expansion):.2f})")
+    print(f"  misspelled term corrected: {sum(corrected) / len(rows):.0%}")
+    print(f"  overlap with the correctly spelled query's top {top_k}: "
+          f"plain {statistics.mean(overlap_plain):.0%}, fuzzy {statistics.mean(overlap_fuzzy):.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vocab", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--words", type=int, default=200, help="misspelled words looked up per vocabulary")
+    parser.add_argument("--docs", type=int, default=30_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    lookup_scaling(args.vocab, args.words)
+    query_expansion(args.docs, args.queries, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
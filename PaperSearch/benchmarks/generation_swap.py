@@ -0,0 +1,99 @@
+# benchmarks/generation_swap.py
+#
+# Search latency across a hot swap: a SearchService over a
+# GenerationStore answers queries from client threads while a new
+# generation is built and published. The service's watcher picks it up;
+# reported are the build and pick-up times, latency percentiles before,
+# during the build, around the swap and after it, failed requests
+# (should be 0) and the generations left on disk after garbage
+# collection (keep=1, so only the new one once the old is unpinned).
+#
+#   python -m PaperSearch.benchmarks.generation_swap --docs 50000
+
+import argparse
+import asyncio
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.generations import GenerationStore, build_generation
+from PaperSearch.src.PaperSearch.indexing.search_service import SearchService, load_generation
+from .synthetic import make_queries, write_normalized_works
+
+
+def percentiles(samples: list[tuple[float, float]], lo: float, hi: float) -> str:
+    ms = np.array([m for t, m in samples if lo <= t < hi])
+    if not ms.size:
+        return "no requests"
+    p50, p99 = np.percentile(ms, [50, 99])
+    return f"{ms.size:6d} requests, p50 {p50:6.2f} ms, p99 {p99:6.2f} ms, max {ms.max():6.2f} ms"
+
+
+async def run(args, db_path: str, store: GenerationStore) -> None:
+    service = SearchService(load_generation(db_path, store), workers=args.clients, store=store)
+    watcher = asyncio.create_task(service.watch(0.05))
+    queries = make_queries(500, 2)
+    samples: list[tuple[float, float]] = []
+    seen: set[str] = set()
+    errors = 0
+    stop = threading.Event()
+
+    def client(seed: int) -> None:
+        nonlocal errors
+        i = seed
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                service.search({"query": queries[i % len(queries)], "top_k": 10})
+                seen.add(service.snapshot.index_generation)
+            except Exception:
+                errors += 1
+            samples.append((t0, (time.perf_counter() - t0) * 1e3))
+            i += args.clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    await asyncio.sleep(args.steady)
+
+    build_start = time.perf_counter()
+    name = await asyncio.get_running_loop().run_in_executor(None, build_generation, db_path, store)
+    published = time.perf_counter()
+    while service.snapshot.index_generation != name:
+        await asyncio.sleep(0.01)
+    swapped = time.perf_counter()
+    await asyncio.sleep(args.steady)
+    stop.set()
+    for t in threads:
+        t.join()
+    watcher.cancel()
+    service.close()
+
+    print(f"build {published - build_start:.2f} s, picked up {swapped - published:.2f} s after publishing")
+    print(f"  before:   {percentiles(samples, 0, build_start)}")
+    print(f"  building: {percentiles(samples, build_start, published)}")
+    print(f"  swapping: {percentiles(samples, published, swapped + 0.5)}  (publish to 0.5 s after the swap)")
+    print(f"  after:    {percentiles(samples, swapped + 0.5, float('inf'))}")
+    print(f"failed requests: {errors}; generations served: {sorted(seen)}; on disk: {store.generations()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--steady", type=float, default=2.0, help="seconds measured before and after")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        store = GenerationStore(Path(tmp, "generations"), keep=1)
+        build_generation(db_path, store)
+        asyncio.run(run(args, db_path, store))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/hybrid_hydration.py
+#
+# HybridSearch.search latency with the original per-candidate title
+# lookups (one get_db connect/query/commit/close per candidate) versus
+# bulk hydration of the top_k results and in-memory metadata, with the
+# per-stage breakdown from `last_timings`.
+#
+# Query vectors are placed in the query cache up front, so no model is
+# needed and the encode stage measures a cache hit.
+#
+#   python -m PaperSearch.benchmarks.hybrid_hydration --docs 30000
+
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index
+from PaperSearch.src.PaperSearch.indexing.embedding_index import EmbeddingIndex, normalize_query
+from PaperSearch.src.PaperSearch.indexing.hybrid_search import HybridSearch
+from PaperSearch.src.PaperSearch.sql.db.connection import get_db
+from .synthetic import clustered_vectors, iter_documents, make_queries, write_embeddings, write_normalized_works
+
+STAGES = ("bm25", "encode", "similarity", "combine", "hydrate", "total")
+
+
+def per_candidate_search(hs: HybridSearch, query: str, top_k: int = 20) -> list:
+    """
+    HybridSearch.search as it was: a title query per candidate.
+    """
+    def get_title(work_id: str) -> str:
+        with get_db(hs.db_path) as conn:
+            row = conn.execute("SELECT title FROM normalized_works WHERE work_id = ?", (work_id,)).fetchone()
+        return row["title"] if row else ""
+
+    bm25_results = hs.bm25.score(query, top_k=300)
+    emb_scores = hs.emb.similarities(hs.emb.encode(query), [w for w, _ in bm25_results])
+    reranked = []
+    for (work_id, bm25_score), emb_score in zip(bm25_results, emb_scores):
+        if math.isnan(emb_score):
+            continue
+        final_score = bm25_score + float(emb_score) + 1.0
+        reranked.append((work_id, get_title(work_id), final_score))
+    reranked.sort(key=lambda x: x[2], reverse=True)
+    return reranked[:top_k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=30_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        write_embeddings(db_path, clustered_vectors(args.docs, args.dim))
+
+        bm25 = BM25Index()
+        for doc_id, (work_id, text, concepts) in enumerate(iter_documents(args.docs)):
+            bm25.add_document(doc_id, work_id, text, concepts=concepts)
+        bm25.finalize()
+
+        emb = EmbeddingIndex(db_path)
+        emb.load_matrix()
+        queries = make_queries(args.queries, 3)
+        rng = np.random.default_rng(1)
+        for q in queries:
+            emb.query_cache.put((emb.model_name, normalize_query(q)), rng.standard_normal(args.dim, dtype=np.float32))
+
+        hs = HybridSearch(bm25, emb, db_path)
+        start = time.perf_counter()
+        old = [per_candidate_search(hs, q) for q in queries]
+        old_ms = (time.perf_counter() - start) / len(queries) * 1e3
+
+        print(f"{args.docs} docs, {args.queries} queries, top_k 20 of 300 candidates")
+        print(f"{'variant':<22} {'ms/query':>9}  " + " ".join(f"{s:>10}" for s in STAGES))
+        print(f"{'per-candidate titles':<22} {old_ms:9.2f}")
+
+        for label in ("bulk hydration", "in-memory metadata"):
+            if label == "in-memory metadata":
+                hs.load_metadata()
+            sums = dict.fromkeys(STAGES, 0.0)
+            results = []
+            for q in queries:
+                results.append(hs.search(q))
+                for stage in STAGES:
+                    sums[stage] += hs.last_timings[stage]
+            means = {s: v / len(queries) for s, v in sums.items()}
+            same = all(
+                [(w, t) for w, t, *_ in new] == [(w, t) for w, t, _ in ref] for new, ref in zip(results, old)
+            )
+            print(
+                f"{label:<22} {means['total']:9.2f}  " + " ".join(f"{means[s]:10.3f}" for s in STAGES)
+                + f"  same results: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/hybrid_rerank.py
+#
+# Embedding rerank latency for one query's BM25 candidates: per-candidate
+# SQLite lookups + cosine (the original HybridSearch loop) versus bulk
+# fetch and the resident / memory-mapped matrix.
+#
+#   python -m PaperSearch.benchmarks.hybrid_rerank --vectors 50000 --candidates 300
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.embedding_index import EmbeddingIndex
+
+
+def fill_embeddings(db_path: str, n: int, dim: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    work_ids = [f"https://openalex.org/W{i}" for i in range(n)]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (work_id TEXT PRIMARY KEY, vector BLOB, text_hash TEXT)")
+        for start in range(0, n, 10_000):
+            vecs = rng.standard_normal((min(10_000, n - start), dim), dtype=np.float32)
+            conn.executemany(
+                "INSERT INTO embeddings (work_id, vector) VALUES (?, ?)",
+                [(work_ids[start + i], v.tobytes()) for i, v in enumerate(vecs)],
+            )
+    return work_ids
+
+
+def per_candidate(emb: EmbeddingIndex, q_vec, work_ids) -> list[float]:
+    scores = []
+    for wid in work_ids:
+        d_vec = emb.get(wid)
+        if d_vec is not None:
+            scores.append(emb.cosine_similarity(q_vec, d_vec))
+    return scores
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--candidates", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "emb.db"))
+        work_ids = fill_embeddings(db_path, args.vectors, args.dim)
+        rng = np.random.default_rng(1)
+        candidates = [work_ids[i] for i in rng.choice(len(work_ids), args.candidates, replace=False)]
+        q_vec = rng.standard_normal(args.dim, dtype=np.float32)
+
+        emb = EmbeddingIndex(db_path)
+        reference = np.array(per_candidate(emb, q_vec, candidates))
+        results = [("per-candidate get + cosine", timed(lambda: per_candidate(emb, q_vec, candidates), args.repeat))]
+        results.append(("bulk fetch", timed(lambda: emb.similarities(q_vec, candidates), args.repeat)))
+
+        start = time.perf_counter()
+        emb.load_matrix()
+        load_s = time.perf_counter() - start
+        resident = emb.similarities(q_vec, candidates)
+        results.append(("resident matrix", timed(lambda: emb.similarities(q_vec, candidates), args.repeat * 10)))
+
+        emb.save_matrix(Path(tmp, "matrix"))
+        mapped = EmbeddingIndex(db_path)
+        mapped.load_matrix(Path(tmp, "matrix"))
+        results.append(("memory-mapped matrix", timed(lambda: mapped.similarities(q_vec, candidates), args.repeat * 10)))
+
+        print(f"{args.vectors} vectors x {args.dim}, {args.candidates} candidates; matrix load {load_s:.2f} s")
+        base = results[0][1]
+        for label, ms in results:
+            print(f"{label:<28} {ms:9.3f} ms  x{base / ms:7.1f}")
+        print(f"max |score diff| vs per-candidate: {np.max(np.abs(resident - reference)):.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/parallel_build.py
+#
+# Serial versus opt-in process-pool build (parallel=True) of the
+# canonical BM25 index over a synthetic normalized_works table, checking
+# that both give the same index. Measured so far on a single CPU only,
+# where the pool is pure overhead:
+#
+#      10000 docs  serial   4.4 s | 2 workers   5.4 s | 4 workers   5.9 s
+#     100000 docs  serial  39.2 s |                     4 workers  47.1 s
+#    1000000 docs  serial 378.1 s |                     4 workers 412.3 s
+#
+# Run it on the target multi-core machine before building with parallel=True.
+#
+#   python -m PaperSearch.benchmarks.parallel_build --docs 10000 100000 1000000 --workers 1 2 4
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index
+from .synthetic import write_normalized_works
+
+
+def same_index(a, b) -> bool:
+    if (a.N, list(a.doc_ids), list(a.doc_len)) != (b.N, list(b.doc_ids), list(b.doc_len)):
+        return False
+    if a.avg_len != b.avg_len or dict(a.df) != dict(b.df):
+        return False
+    return all(list(a.inverted[t]) == list(b.inverted[t]) for t in a.inverted)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_docs in args.docs:
+            db_path = Path(tmp, f"works_{n_docs}.db")
+            write_normalized_works(db_path, n_docs)
+
+            serial = None
+            for workers in sorted(set(args.workers)):
+                start = time.perf_counter()
+                if workers > 1:
+                    index = build_canonical_bm25_index(str(db_path), parallel=True, workers=workers)
+                else:
+                    index = build_canonical_bm25_index(str(db_path))
+                elapsed = time.perf_counter() - start
+                if serial is None:
+                    serial, serial_time = index, elapsed
+                    check = ""
+                else:
+                    check = "same" if same_index(serial, index) else "DIFFERENT"
+                print(
+                    f"{n_docs:>9} docs  workers {workers:>2}  {elapsed:8.2f} s  "
+                    f"{n_docs / elapsed:9.0f} docs/s  x{serial_time / elapsed:4.2f}  {check}"
+                )
+
+
+if __name__ == "__main__":
+    main()
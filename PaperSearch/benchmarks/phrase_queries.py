@@ -0,0 +1,130 @@
+# benchmarks/phrase_queries.py
+#
+# Cost of positional postings: build time and postings/segment size with
+# and without positions, then latency of quoted-phrase and NEAR/k queries
+# against the same words as a plain query. Phrases are taken from the
+# documents so they match; every result set is checked against a scan of
+# the token streams.
+#
+#   python -m PaperSearch.benchmarks.phrase_queries --docs 30000
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index, tokenize
+from PaperSearch.src.PaperSearch.indexing.normalizer import normalize_text
+from PaperSearch.src.PaperSearch.indexing.positions import phrase_starts, spans_near, token_positions
+from .synthetic import iter_documents
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def build(n_docs: int, store_positions: bool) -> tuple[BM25Index, float]:
+    start = time.perf_counter()
+    index = BM25Index(store_positions=store_positions)
+    for doc_id, (work_id, text, concepts) in enumerate(iter_documents(n_docs)):
+        index.add_document(doc_id, work_id, text, concepts=concepts)
+    index.finalize()
+    return index, time.perf_counter() - start
+
+
+def sample_phrases(streams: list[list[str]], n: int, length: int, seed: int = 0) -> list[list[str]]:
+    rng = random.Random(seed)
+    out = []
+    while len(out) < n:
+        tokens = rng.choice(streams)
+        if len(tokens) > length:
+            i = rng.randrange(len(tokens) - length)
+            out.append(tokens[i:i + length])
+    return out
+
+
+def scan(streams: list[list[str]], left: list[str], right: list[str] | None = None, k: int = 0) -> set[int]:
+    """
+    Documents containing phrase `left`, or with `right` given, `left`
+    NEAR/k `right`.
+    """
+    out = set()
+    for doc_id, tokens in enumerate(streams):
+        pos = token_positions(tokens)
+        if not all(t in pos for t in left + (right or [])):
+            continue
+        a = phrase_starts([pos[t] for t in left])
+        if right is None:
+            if a:
+                out.add(doc_id)
+        elif a and spans_near(a, len(left), phrase_starts([pos[t] for t in right]), len(right), k):
+            out.add(doc_id)
+    return out
+
+
+def time_queries(index: BM25Index, queries: list[str], top_k: int, method: str) -> float:
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.score(q, top_k=top_k, method=method)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=30_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--method", default="wand")
+    parser.add_argument("--check", type=int, default=10, help="queries per kind checked against a scan")
+    args = parser.parse_args()
+
+    plain, plain_s = build(args.docs, store_positions=False)
+    positional, positional_s = build(args.docs, store_positions=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        plain.save(Path(tmp, "plain"))
+        positional.save(Path(tmp, "positional"))
+        plain_seg = dir_bytes(Path(tmp, "plain")) / 2**20
+        pos_seg = dir_bytes(Path(tmp, "positional")) / 2**20
+        mapped = BM25Index.load(Path(tmp, "positional"))
+
+        print(f"{args.docs} docs")
+        print(f"{'':<12} {'build s':>8} {'postings MB':>12} {'segment MB':>11}")
+        print(f"{'plain':<12} {plain_s:8.2f} {plain.postings_nbytes() / 2**20:12.1f} {plain_seg:11.1f}")
+        print(
+            f"{'positions':<12} {positional_s:8.2f} {positional.postings_nbytes() / 2**20:12.1f} {pos_seg:11.1f}"
+        )
+
+        streams = [tokenize(normalize_text(text)) for _, text, _ in iter_documents(args.docs)]
+        bigrams = sample_phrases(streams, args.queries, 2)
+        trigrams = sample_phrases(streams, args.queries, 3, seed=1)
+        kinds = {
+            "2 words": ([" ".join(p) for p in bigrams], None),
+            '"2 words"': ([f'"{" ".join(p)}"' for p in bigrams], [(p, None, 0) for p in bigrams]),
+            "3 words": ([" ".join(p) for p in trigrams], None),
+            '"3 words"': ([f'"{" ".join(p)}"' for p in trigrams], [(p, None, 0) for p in trigrams]),
+            "a NEAR/5 b": (
+                [f"{p[0]} NEAR/5 {p[2]}" for p in trigrams], [([p[0]], [p[2]], 5) for p in trigrams]
+            ),
+        }
+
+        print(f"\n{args.method}, top {args.top_k}: median ms/query")
+        print(f"{'query':<12} {'in-memory':>10} {'mapped':>10}  matches scan")
+        for label, (queries, constraints) in kinds.items():
+            memory_ms = time_queries(positional, queries, args.top_k, args.method)
+            mapped_ms = time_queries(mapped, queries, args.top_k, args.method)
+            ok = ""
+            if constraints is not None:
+                ok = all(
+                    {w for w, _ in mapped.score(q, top_k=args.docs, method=args.method)}
+                    == {mapped.doc_ids[d] for d in scan(streams, *c)}
+                    for q, c in list(zip(queries, constraints))[:args.check]
+                )
+            print(f"{label:<12} {memory_ms:10.2f} {mapped_ms:10.2f}  {ok}")
+
+
+if __name__ == "__main__":
+    main()
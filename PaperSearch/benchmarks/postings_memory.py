@@ -0,0 +1,59 @@
+# benchmarks/postings_memory.py
+#
+# Bytes per posting for the legacy list-of-tuples layout versus the
+# array-backed PostingList, plain and compressed.
+#
+#   python -m PaperSearch.benchmarks.postings_memory --docs 20000
+
+import argparse
+import sys
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index
+from .synthetic import iter_documents
+
+
+def tuple_list_nbytes(index: BM25Index) -> int:
+    """
+    Size the postings would have as `list[tuple[int, int]]`: list slots,
+    tuple objects and every int that is not a cached small int.
+    """
+    total = 0
+    for plist in index.inverted.values():
+        pairs = list(plist)
+        total += sys.getsizeof(pairs)
+        for doc_id, tf in pairs:
+            total += sys.getsizeof((doc_id, tf))
+            for v in (doc_id, tf):
+                if v > 256:
+                    total += sys.getsizeof(v)
+    return total
+
+
+def build(n_docs: int, compress: bool) -> BM25Index:
+    index = BM25Index(compress=compress)
+    for doc_id, (work_id, text, concepts) in enumerate(iter_documents(n_docs)):
+        index.add_document(doc_id, work_id, text, concepts=concepts)
+    index.finalize()
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20_000)
+    args = parser.parse_args()
+
+    plain = build(args.docs, compress=False)
+    packed = build(args.docs, compress=True)
+    n_postings = sum(len(p) for p in plain.inverted.values())
+
+    print(f"{args.docs} docs, {len(plain.inverted)} terms, {n_postings} postings")
+    for label, nbytes in (
+        ("list[tuple]", tuple_list_nbytes(plain)),
+        ("PostingList", plain.postings_nbytes()),
+        ("PostingList (vbyte)", packed.postings_nbytes()),
+    ):
+        print(f"{label:<22} {nbytes / n_postings:6.2f} bytes/posting")
+
+
+if __name__ == "__main__":
+    main()
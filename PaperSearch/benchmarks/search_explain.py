@@ -0,0 +1,115 @@
+# benchmarks/search_explain.py
+#
+# Cost of search instrumentation: BM25Index.score per method and
+# CanonicalSearch.search, untraced against traced with a SearchTrace and
+# traced plus reported to a HistogramSink (what the search service does
+# for every request). Results must not change. Then the mean per-stage
+# breakdown and counters of the traced searches, and the sink's total
+# latency quantiles.
+#
+#   python -m PaperSearch.benchmarks.search_explain --docs 100000 --queries 500
+
+import argparse
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import SCORE_METHODS, BM25Index
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index
+from PaperSearch.src.PaperSearch.indexing.instrumentation import HistogramSink, SearchTrace
+from PaperSearch.src.PaperSearch.indexing.search_api import CanonicalSearch
+from .synthetic import make_queries, write_normalized_works
+
+
+def interleaved_us(variants: dict, queries: list[str], repeat: int) -> tuple[dict, dict]:
+    """
+    Microseconds per query of each variant, running the variants back to
+    back on every query so drift in machine load hits them alike; each
+    query's time is its best of `repeat`. Also returns the results of
+    the last round.
+    """
+    best = {name: [float("inf")] * len(queries) for name in variants}
+    out: dict = {name: [None] * len(queries) for name in variants}
+    for _ in range(repeat):
+        for i, q in enumerate(queries):
+            for name, run in variants.items():
+                start = time.perf_counter()
+                out[name][i] = run(q)
+                best[name][i] = min(best[name][i], time.perf_counter() - start)
+    return {name: sum(t) / len(queries) * 1e6 for name, t in best.items()}, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        build_canonical_bm25_index(db_path).save(Path(tmp, "bm25"))
+        index = BM25Index.load(Path(tmp, "bm25"))
+        queries = [q for n in (1, 2, 3) for q in make_queries(args.queries // 3, n, seed=n)]
+        print(f"{args.docs} docs, {len(queries)} queries of 1-3 terms, top {args.top_k}")
+
+        sink = HistogramSink()
+        traces: dict[str, list[SearchTrace]] = defaultdict(list)
+
+        def traced(label: str, run, report: bool):
+            def call(q: str):
+                trace = SearchTrace()
+                out = run(q, trace)
+                if report:
+                    trace.report(sink, label)
+                    traces[label].append(trace)
+                return out
+            return call
+
+        print(f"\n{'':<12} {'plain us':>9} {'traced':>9} {'+report':>9} {'overhead':>9}  same")
+        runs = {
+            m: lambda q, trace, m=m: index.score(q, args.top_k, method=m, trace=trace) for m in SCORE_METHODS
+        }
+        canonical = CanonicalSearch(db_path, index)
+        runs["search"] = lambda q, trace: canonical.search(q, args.top_k, trace=trace)
+        for label, run in runs.items():
+            us, out = interleaved_us(
+                {
+                    "plain": lambda q, run=run: run(q, None),
+                    "traced": traced(label, run, False),
+                    "report": traced(label, run, True),
+                },
+                queries,
+                args.repeat,
+            )
+            same = out["traced"] == out["plain"] == out["report"]
+            print(
+                f"{label:<12} {us['plain']:9.1f} {us['traced']:9.1f} {us['report']:9.1f} "
+                f"{(us['report'] - us['plain']) / us['plain']:9.1%}  {same}"
+            )
+
+        print("\nmean per query (traced + reported runs)")
+        for label, ts in traces.items():
+            stages: dict[str, float] = defaultdict(float)
+            counters: dict[str, float] = defaultdict(float)
+            for t in ts:
+                for stage, ms in t.stages.items():
+                    stages[stage] += ms / len(ts)
+                for name, n in t.counters.items():
+                    counters[name] += n / len(ts)
+            print(
+                f"{label:<12} " + "  ".join(f"{s} {ms:.3f} ms" for s, ms in stages.items())
+                + "  |  " + "  ".join(f"{c} {n:.0f}" for c, n in counters.items())
+            )
+
+        print("\ntotal_ms quantiles from the sink (log buckets)")
+        for name, h in sink.export().items():
+            if name.endswith(".total_ms"):
+                print(f"{name:<22} n {h['count']:5d}  p50 {h['p50']:7.3f}  p90 {h['p90']:7.3f}  p99 {h['p99']:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
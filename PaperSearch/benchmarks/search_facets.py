@@ -0,0 +1,116 @@
+# benchmarks/search_facets.py
+#
+# Facet counts (year, venue, top concepts) over every document matching a
+# query: FacetColumns.counts over BM25Index.matching_docs, against
+# hydrating the matches with `SELECT *` and parsing their metadata JSON,
+# which is what CanonicalSearch rows would otherwise require. Queries
+# range from rare to very common terms; every facet result is checked
+# against the hydrated counts.
+#
+#   python -m PaperSearch.benchmarks.search_facets --docs 100000
+
+import argparse
+import json
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import BM25Index
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index, build_facets
+from PaperSearch.src.PaperSearch.indexing.facets import FacetColumns
+from .synthetic import make_queries, write_normalized_works
+
+# SQLite's default limit on bound parameters.
+MAX_PARAMS = 32_000
+
+
+def hydrated_counts(conn: sqlite3.Connection, work_ids: list[str]) -> dict[str, Counter]:
+    years, venues, concepts = Counter(), Counter(), Counter()
+    for i in range(0, len(work_ids), MAX_PARAMS):
+        chunk = work_ids[i:i + MAX_PARAMS]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(f"SELECT * FROM normalized_works WHERE work_id IN ({placeholders})", chunk):
+            md = json.loads(row["openalex_metadata"])
+            years[row["year"]] += 1
+            venues[md["primary_location"]["source"]["display_name"]] += 1
+            concepts.update(c["id"] for c in md["concepts"])
+    return {"year": years, "venue": venues, "concept": concepts}
+
+
+def same_counts(facets: dict, reference: dict[str, Counter], limit: int) -> bool:
+    if {f["value"]: f["count"] for f in facets["year"]} != dict(reference["year"]):
+        return False
+    for name in ("venue", "concept"):
+        expected = sorted(reference[name].values(), reverse=True)[:limit]
+        if [f["count"] for f in facets[name]] != expected:
+            return False
+        if any(reference[name][f["value"]] != f["count"] for f in facets[name]):
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20, help="queries per term count")
+    parser.add_argument("--limit", type=int, default=10, help="venues and concepts returned")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        build_canonical_bm25_index(db_path).save(Path(tmp, "bm25"))
+        index = BM25Index.load(Path(tmp, "bm25"))
+
+        start = time.perf_counter()
+        columns = build_facets(db_path, index)
+        build_s = time.perf_counter() - start
+        columns.save(Path(tmp, "facets"))
+        mapped = FacetColumns.load(Path(tmp, "facets"))
+        nbytes = sum(a.nbytes for a in (columns.years, columns.venues, columns.concept_offsets, columns.concept_ids))
+        print(f"{args.docs} docs: facet columns built in {build_s:.2f} s, {nbytes / 2**20:.1f} MB of arrays")
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        print(f"\n{'terms':>5} {'matches':>9} {'match ms':>9} {'count ms':>9} {'mapped ms':>10} "
+              f"{'hydrate ms':>11} {'speedup':>8}  same")
+        for n_terms in (1, 2, 4):
+            rows = []
+            for query in make_queries(args.queries, n_terms, seed=n_terms):
+                t0 = time.perf_counter()
+                docs = index.matching_docs(query)
+                match_ms = (time.perf_counter() - t0) * 1e3
+                t0 = time.perf_counter()
+                facets = columns.counts(docs, args.limit)
+                count_ms = (time.perf_counter() - t0) * 1e3
+                t0 = time.perf_counter()
+                mapped_facets = mapped.counts(docs, args.limit)
+                mapped_ms = (time.perf_counter() - t0) * 1e3
+
+                t0 = time.perf_counter()
+                work_ids = [w for w, _ in index.score(query, top_k=args.docs, method="numpy")]
+                reference = hydrated_counts(conn, work_ids)
+                hydrate_ms = (time.perf_counter() - t0) * 1e3
+                ok = (
+                    sorted(work_ids) == sorted(index.doc_ids[d] for d in docs)
+                    and same_counts(facets, reference, args.limit)
+                    and facets == mapped_facets
+                )
+                rows.append((len(docs), match_ms, count_ms, mapped_ms, hydrate_ms, ok))
+
+            matches, match_ms, count_ms, mapped_ms, hydrate_ms, ok = zip(*rows)
+            facet_ms = [m + c for m, c in zip(match_ms, count_ms)]
+            print(
+                f"{n_terms:>5} {statistics.median(matches):9.0f} {statistics.median(match_ms):9.2f} "
+                f"{statistics.median(count_ms):9.2f} {statistics.median(mapped_ms):10.2f} "
+                f"{statistics.median(hydrate_ms):11.1f} {statistics.median(hydrate_ms) / statistics.median(facet_ms):7.0f}x"
+                f"  {all(ok)}"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
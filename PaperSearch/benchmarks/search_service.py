@@ -0,0 +1,100 @@
+# benchmarks/search_service.py
+#
+# Throughput and latency of the search daemon under concurrent clients,
+# with a hot swap to a rebuilt BM25 segment halfway through. Every
+# request must succeed and responses must move from generation 0 to 1.
+#
+#   python -m PaperSearch.benchmarks.search_service --docs 30000 --clients 8
+
+import argparse
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index
+from PaperSearch.src.PaperSearch.indexing.search_service import SearchService, load_snapshot
+from .synthetic import make_queries, write_normalized_works
+
+
+async def request(reader, writer, method: str, path: str, payload=None) -> tuple[int, dict]:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: local\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(sock: str, queries: list[str], deadline: float, seen: dict) -> None:
+    reader, writer = await asyncio.open_unix_connection(sock)
+    i = 0
+    while time.perf_counter() < deadline:
+        status, resp = await request(reader, writer, "POST", "/search", {"query": queries[i % len(queries)]})
+        key = resp.get("generation", "error") if status == 200 else f"HTTP {status}"
+        seen[key] = seen.get(key, 0) + 1
+        i += 1
+    writer.close()
+
+
+async def drive(sock: str, queries: list[str], clients: int, seconds: float, swap_to: str) -> None:
+    seen: dict = {}
+    deadline = time.perf_counter() + seconds
+    tasks = [asyncio.create_task(client(sock, queries[c::clients], deadline, seen)) for c in range(clients)]
+
+    await asyncio.sleep(seconds / 2)
+    reader, writer = await asyncio.open_unix_connection(sock)
+    status, reload = await request(reader, writer, "POST", "/reload", {"bm25": swap_to})
+    print(f"reload: HTTP {status}, generation {reload.get('generation')}, {reload.get('load_s', 0) * 1e3:.1f} ms")
+
+    await asyncio.gather(*tasks)
+    status, stats = await request(reader, writer, "GET", "/stats")
+    writer.close()
+
+    lat = stats["latency_ms"]
+    print(f"responses by generation: {seen}")
+    print(
+        f"{stats['requests']} requests, {stats['errors']} errors, {stats['requests'] / seconds:.0f} QPS; "
+        f"p50 {lat['p50']:.2f} ms  p90 {lat['p90']:.2f} ms  p99 {lat['p99']:.2f} ms  max {lat['max']:.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=30_000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+        index = build_canonical_bm25_index(db_path)
+        index.save(Path(tmp, "bm25-a"))
+        index.save(Path(tmp, "bm25-b"))
+
+        service = SearchService(load_snapshot(db_path, str(Path(tmp, "bm25-a"))), workers=args.workers)
+        sock = str(Path(tmp, "search.sock"))
+        loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=loop.run_until_complete, args=(service.serve(unix_path=sock),), daemon=True
+        ).start()
+        while not Path(sock).exists():
+            time.sleep(0.01)
+
+        print(f"{args.docs} docs, {args.clients} clients, {args.workers} workers, {args.seconds:.0f} s")
+        asyncio.run(drive(sock, make_queries(1000, 3), args.clients, args.seconds, str(Path(tmp, "bm25-b"))))
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# benchmarks/suite.py
+#
+# End-to-end search benchmark over synthetic normalized_works databases:
+# index build time and memory, then query latency percentiles and QPS
+# per engine and query length. Results are written as JSON so runs can
+# be compared.
+#
+#   python -m PaperSearch.benchmarks.suite --docs 10000 100000 --out after.json
+#   python -m PaperSearch.benchmarks.suite --docs 10000 --out after.json --compare before.json
+#
+# Engines: "bm25:<method>" for each BM25Index.score method,
+# "canonical" (CanonicalSearch) and, with --hybrid, "hybrid"
+# (HybridSearch over synthetic embeddings; query vectors are pre-seeded
+# in the query cache, so no model is loaded).
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.bm25_index import SCORE_METHODS, BM25Index
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import build_canonical_bm25_index
+from PaperSearch.src.PaperSearch.indexing.embedding_index import EmbeddingIndex, normalize_query
+from PaperSearch.src.PaperSearch.indexing.hybrid_search import HybridSearch
+from PaperSearch.src.PaperSearch.indexing.search_api import CanonicalSearch
+from .synthetic import clustered_vectors, make_queries, write_embeddings, write_normalized_works
+
+PERCENTILES = (50, 95, 99)
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    lat = np.array(latencies_ms)
+    out = {f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, np.percentile(lat, PERCENTILES))}
+    out["mean_ms"] = float(lat.mean())
+    out["qps"] = float(len(lat) / (lat.sum() / 1e3))
+    return out
+
+
+def time_engine(run: Callable[[str], Any], queries: List[str], warmup: int = 3) -> List[float]:
+    for q in queries[:warmup]:
+        run(q)
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        run(q)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    return latencies
+
+
+def measure_build(db_path: str, workers: int, trace_memory: bool) -> tuple[BM25Index, Dict[str, Any]]:
+    start = time.perf_counter()
+    index = build_canonical_bm25_index(db_path, parallel=workers > 1, workers=workers)
+    out: Dict[str, Any] = {"build_s": time.perf_counter() - start, "workers": workers}
+
+    if trace_memory:
+        # A second, serial build under tracemalloc: slower, but its heap
+        # figures do not depend on the timing run.
+        tracemalloc.start()
+        traced = build_canonical_bm25_index(db_path)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced
+        out["heap_retained_mb"] = current / 2**20
+        out["heap_peak_mb"] = peak / 2**20
+    return index, out
+
+
+def run_size(args, tmp: Path, n_docs: int) -> Dict[str, Any]:
+    db_path = str(tmp / f"works_{n_docs}.db")
+    start = time.perf_counter()
+    write_normalized_works(db_path, n_docs, vocab_size=args.vocab, mean_len=args.doc_len)
+    result: Dict[str, Any] = {"docs": n_docs, "generate_s": time.perf_counter() - start}
+
+    index, build = measure_build(db_path, args.workers, args.trace_memory)
+    segment = tmp / f"bm25_{n_docs}"
+    start = time.perf_counter()
+    index.save(segment)
+    build["save_s"] = time.perf_counter() - start
+    build["segment_mb"] = dir_bytes(segment) / 2**20
+    build["postings_mb"] = index.postings_nbytes() / 2**20
+    build["terms"] = len(index.inverted)
+    start = time.perf_counter()
+    loaded = BM25Index.load(segment)
+    build["load_ms"] = (time.perf_counter() - start) * 1e3
+    result["build"] = build
+
+    engines: Dict[str, Callable[[str], Any]] = {}
+    for method in args.methods:
+        engines[f"bm25:{method}"] = lambda q, m=method: loaded.score(q, top_k=args.top_k, method=m)
+    canonical = CanonicalSearch(db_path, loaded)
+    engines["canonical"] = lambda q: canonical.search(q, top_k=args.top_k)
+
+    queries_by_len = {
+        n_terms: make_queries(args.queries, n_terms, seed=n_terms) for n_terms in args.query_lengths
+    }
+    if args.hybrid:
+        write_embeddings(db_path, clustered_vectors(n_docs, args.dim))
+        emb = EmbeddingIndex(db_path)
+        emb.load_matrix()
+        rng = np.random.default_rng(0)
+        for q in {q for queries in queries_by_len.values() for q in queries}:
+            vec = rng.standard_normal(args.dim, dtype=np.float32)
+            emb.query_cache.put((emb.model_name, normalize_query(q)), vec)
+        hybrid = HybridSearch(loaded, emb, db_path)
+        hybrid.load_metadata()
+        engines["hybrid"] = lambda q: hybrid.search(q, top_k=args.top_k)
+
+    result["queries"] = {}
+    for name, run in engines.items():
+        per_len = {}
+        everything: List[float] = []
+        for n_terms, queries in queries_by_len.items():
+            lat = time_engine(run, queries)
+            per_len[str(n_terms)] = latency_summary(lat)
+            everything.extend(lat)
+        per_len["mixed"] = latency_summary(everything)
+        result["queries"][name] = per_len
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def print_run(result: Dict[str, Any]) -> None:
+    b = result["build"]
+    print(
+        f"\n{result['docs']} docs: build {b['build_s']:.2f} s ({b['workers']} workers), "
+        f"save {b['save_s']:.2f} s, load {b['load_ms']:.1f} ms, {b['terms']} terms, "
+        f"postings {b['postings_mb']:.1f} MB, segment {b['segment_mb']:.1f} MB, "
+        f"peak RSS {result['peak_rss_mb']:.0f} MB"
+        + (f", heap {b['heap_retained_mb']:.1f} MB (peak {b['heap_peak_mb']:.1f})" if "heap_peak_mb" in b else "")
+    )
+    print(f"  {'engine':<16} {'terms':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'QPS':>9}")
+    for engine, per_len in result["queries"].items():
+        for n_terms, s in per_len.items():
+            print(
+                f"  {engine:<16} {n_terms:>5} {s['p50_ms']:9.2f} {s['p95_ms']:9.2f} "
+                f"{s['p99_ms']:9.2f} {s['qps']:9.1f}"
+            )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """
+    Print current / baseline ratios for every size, engine and query length in both.
+    """
+    print(f"\ncompared with {baseline['meta'].get('label') or baseline['meta'].get('commit')}:")
+    base_runs = {r["docs"]: r for r in baseline["runs"]}
+    # "mixed" only means the same thing if both runs used the same lengths.
+    same_mix = current["meta"]["args"]["query_lengths"] == baseline["meta"]["args"]["query_lengths"]
+    for run in current["runs"]:
+        base = base_runs.get(run["docs"])
+        if base is None:
+            continue
+        ratio = run["build"]["build_s"] / base["build"]["build_s"]
+        print(f"  {run['docs']} docs: build time x{ratio:.2f}")
+        for engine, per_len in run["queries"].items():
+            for n_terms, s in per_len.items():
+                b = base["queries"].get(engine, {}).get(n_terms)
+                if b is None or (n_terms == "mixed" and not same_mix):
+                    continue
+                print(
+                    f"    {engine:<16} {n_terms:>5}  p50 x{s['p50_ms'] / b['p50_ms']:.2f}  "
+                    f"p99 x{s['p99_ms'] / b['p99_ms']:.2f}  QPS x{s['qps'] / b['qps']:.2f}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--vocab", type=int, default=50_000, help="Zipfian vocabulary size")
+    parser.add_argument("--doc-len", type=int, default=120, help="mean document length in terms")
+    parser.add_argument("--query-lengths", type=int, nargs="+", default=[1, 2, 3, 5, 8])
+    parser.add_argument("--queries", type=int, default=100, help="queries per length")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--methods", nargs="+", default=list(SCORE_METHODS), choices=SCORE_METHODS)
+    parser.add_argument("--workers", type=int, default=1, help="processes for the index build; > 1 opts into the parallel build")
+    parser.add_argument("--hybrid", action="store_true", help="also benchmark HybridSearch")
+    parser.add_argument("--dim", type=int, default=384, help="embedding size for --hybrid")
+    parser.add_argument("--trace-memory", action="store_true", help="measure build heap with tracemalloc")
+    parser.add_argument("--label", help="name for this run in the results file")
+    parser.add_argument("--out", help="write results as JSON here")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "label": args.label,
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_docs in args.docs:
+            result = run_size(args, Path(tmp), n_docs)
+            print_run(result)
+            results["runs"].append(result)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# benchmarks/synthetic.py
+
+import json
+import random
+import sqlite3
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.quantization import quantize_rows
+from PaperSearch.src.PaperSearch.sql.db.init_db import init_ingestion_db
+
+PHRASES = [
+    "reinforcement learning",
+    "grid world",
+    "model-based rl",
+    "policy gradient",
+    "neural network",
+]
+
+
+def make_vocabulary(size: int) -> List[str]:
+    return [f"t{i}" for i in range(size)]
+
+
+def zipf_weights(size: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (rank + 1) ** s for rank in range(size)]
+
+
+def iter_documents(
+    n_docs: int,
+    vocab_size: int = 50_000,
+    mean_len: int = 120,
+    n_concepts: int = 500,
+    seed: int = 0,
+) -> Iterator[Tuple[str, str, list[tuple[str, float]]]]:
+    """
+    Yield (work_id, text, concepts) with Zipf-distributed terms, a few
+    domain phrases that exercise synonym expansion, and random concepts.
+    """
+    rng = random.Random(seed)
+    vocab = make_vocabulary(vocab_size)
+    cum_weights = []
+    total = 0.0
+    for w in zipf_weights(vocab_size):
+        total += w
+        cum_weights.append(total)
+
+    for i in range(n_docs):
+        length = max(5, int(rng.gauss(mean_len, mean_len / 3)))
+        tokens = rng.choices(vocab, cum_weights=cum_weights, k=length)
+        if rng.random() < 0.3:
+            tokens.insert(rng.randrange(len(tokens)), rng.choice(PHRASES))
+        concepts = [
+            (f"https://openalex.org/C{rng.randrange(n_concepts)}", round(rng.random(), 4))
+            for _ in range(rng.randint(0, 6))
+        ]
+        yield f"https://openalex.org/W{i}", " ".join(tokens), concepts
+
+
+def make_queries(n_queries: int, n_terms: int, vocab_size: int = 50_000, seed: int = 1) -> List[str]:
+    """
+    Queries drawn from the same Zipf distribution as the documents,
+    skipping the very head so queries are not all stopword-like.
+    """
+    rng = random.Random(seed)
+    vocab = make_vocabulary(vocab_size)
+    weights = zipf_weights(vocab_size)
+    head = min(20, vocab_size // 10)
+    return [
+        " ".join(rng.choices(vocab[head:], weights=weights[head:], k=n_terms))
+        for _ in range(n_queries)
+    ]
+
+
+# ------------------------------------------------------------
+# Synthetic normalized_works database
+# ------------------------------------------------------------
+# init_db's normalized_works predates the metadata columns that
+# store_normalized writes.
+METADATA_COLUMNS = ("pdf_metadata", "crossref_metadata", "openalex_metadata")
+
+INSERT_WORK = (
+    "INSERT INTO normalized_works (work_id, doi, title, authors, year, openalex_metadata) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+VENUES = [f"Journal of Synthetic Studies {i}" for i in range(40)]
+
+
+def write_normalized_works(
+    db_path: str | Path,
+    n_docs: int,
+    seed: int = 0,
+    batch: int = 10_000,
+    vocab_size: int = 50_000,
+    mean_len: int = 120,
+) -> None:
+    """
+    Create `db_path` with the ingestion schema and fill normalized_works
+    with `n_docs` rows whose openalex_metadata carries an abstract
+    inverted index, concepts, a publication year, a venue and a
+    heavy-tailed cited_by_count, as OpenAlex returns them. The indexed text of each row is the matching
+    `iter_documents` document; year, doi and authors are also set on the
+    row itself.
+    """
+    init_ingestion_db(str(db_path))
+    conn = sqlite3.connect(db_path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(normalized_works)")}
+    for col in METADATA_COLUMNS:
+        if col not in columns:
+            conn.execute(f"ALTER TABLE normalized_works ADD COLUMN {col} TEXT")
+
+    meta_rng = random.Random(seed + 1)
+    cite_rng = random.Random(seed + 2)
+    rows = []
+    for work_id, text, concepts in iter_documents(n_docs, vocab_size=vocab_size, mean_len=mean_len, seed=seed):
+        tokens = text.split()
+        title, abstract = " ".join(tokens[:10]), tokens[10:]
+        inverted: dict[str, list[int]] = {}
+        for pos, token in enumerate(abstract):
+            inverted.setdefault(token, []).append(pos)
+        year = meta_rng.randint(1990, 2025)
+        doi = f"10.5555/synthetic.{work_id.rsplit('W', 1)[1]}"
+        authors = [f"Author {meta_rng.randrange(20_000)}" for _ in range(meta_rng.randint(1, 6))]
+        md = {
+            "id": work_id,
+            "doi": f"https://doi.org/{doi}",
+            "title": title,
+            "publication_year": year,
+            "primary_location": {"source": {"display_name": meta_rng.choice(VENUES)}},
+            "cited_by_count": int(cite_rng.paretovariate(1.2)) - 1,
+            "abstract_inverted_index": inverted,
+            "concepts": [
+                {"id": cid, "display_name": f"Concept {cid.rsplit('C', 1)[1]}", "score": score}
+                for cid, score in concepts
+            ],
+        }
+        rows.append((work_id, doi, title, json.dumps(authors), year, json.dumps(md)))
+        if len(rows) >= batch:
+            conn.executemany(INSERT_WORK, rows)
+            rows = []
+    conn.executemany(INSERT_WORK, rows)
+    conn.commit()
+    conn.close()
+
+
+# ------------------------------------------------------------
+# Synthetic embeddings
+# ------------------------------------------------------------
+def clustered_vectors(
+    n: int,
+    dim: int = 768,
+    n_fields: int = 50,
+    n_topics: int = 2000,
+    spread: float = 1.0,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Unit vectors around `n_topics` topic directions, which are in turn
+    spread around `n_fields` field directions. The two-level structure
+    makes neighbourhoods overlap the way real text embeddings do, so
+    approximate search has to work for its recall.
+    """
+    rng = np.random.default_rng(seed)
+
+    def unit(x: np.ndarray) -> np.ndarray:
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+    def noise(rows: int) -> np.ndarray:
+        return rng.standard_normal((rows, dim), dtype=np.float32) / np.sqrt(dim)
+
+    fields = unit(noise(n_fields))
+    topics = unit(fields[rng.integers(n_fields, size=n_topics)] + noise(n_topics))
+    return unit(topics[rng.integers(n_topics, size=n)] + spread * noise(n)).astype(np.float32)
+
+
+def write_embeddings(
+    db_path: str | Path,
+    vectors: np.ndarray,
+    batch: int = 10_000,
+    dtype: str = "float32",
+) -> List[str]:
+    """
+    Store `vectors` in an embeddings table as W0, W1, ... in storage
+    `dtype` and return the work_ids.
+    """
+    work_ids = [f"https://openalex.org/W{i}" for i in range(len(vectors))]
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings "
+        "(work_id TEXT PRIMARY KEY, vector BLOB, text_hash TEXT, dtype TEXT, scale REAL)"
+    )
+    for start in range(0, len(vectors), batch):
+        codes, scales = quantize_rows(vectors[start:start + batch], dtype)
+        conn.executemany(
+            "INSERT INTO embeddings (work_id, vector, dtype, scale) VALUES (?, ?, ?, ?)",
+            [
+                (work_ids[start + i], codes[i].tobytes(), dtype, None if scales is None else float(scales[i]))
+                for i in range(len(codes))
+            ],
+        )
+    conn.commit()
+    conn.close()
+    return work_ids
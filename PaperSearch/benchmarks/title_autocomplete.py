@@ -0,0 +1,118 @@
+# benchmarks/title_autocomplete.py
+#
+# Type-ahead latency per keystroke: the TitleAutocomplete index (in
+# memory and memory-mapped) against the `LIKE` scan of
+# normalized_works.title it replaces. Keystrokes replay the first words
+# of sampled titles one character at a time; results are checked against
+# a Python scan of all titles.
+#
+#   python -m PaperSearch.benchmarks.title_autocomplete --docs 100000
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from PaperSearch.src.PaperSearch.indexing.autocomplete import TitleAutocomplete
+from PaperSearch.src.PaperSearch.indexing.bm25_index import tokenize
+from PaperSearch.src.PaperSearch.indexing.canonical_index_builder import (
+    build_title_autocomplete, iter_title_citations,
+)
+from .synthetic import write_normalized_works
+
+
+def keystrokes(titles: list[str], n_titles: int, words: int = 2, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    for title in rng.sample(titles, n_titles):
+        typed = " ".join(title.split()[:words])
+        out.extend(typed[:i] for i in range(1, len(typed) + 1))
+    return out
+
+
+def scan(rows: list[tuple[str, str, int]], text: str, limit: int) -> list[str]:
+    """
+    Reference: every complete word present and, unless `text` ends in a
+    space, some word starting with the last one; most cited first.
+    """
+    tokens = tokenize(text)
+    words, prefix = (tokens[:-1], tokens[-1]) if text[-1:].isalnum() else (tokens, None)
+    hits = []
+    for work_id, title, cites in rows:
+        title_tokens = set(tokenize(title))
+        if all(w in title_tokens for w in words) and (
+            prefix is None or any(t.startswith(prefix) for t in title_tokens)
+        ):
+            hits.append((cites, work_id))
+    hits.sort(key=lambda h: -h[0])
+    return [w for _, w in hits[:limit]]
+
+
+def time_us(run, inputs: list[str]) -> np.ndarray:
+    lat = []
+    for text in inputs:
+        t0 = time.perf_counter()
+        run(text)
+        lat.append((time.perf_counter() - t0) * 1e6)
+    return np.array(lat)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--titles", type=int, default=50, help="sampled titles to type")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--like", type=int, default=40, help="keystrokes to time with LIKE")
+    parser.add_argument("--check", type=int, default=30, help="keystrokes checked against a scan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp, "works.db"))
+        write_normalized_works(db_path, args.docs)
+
+        start = time.perf_counter()
+        index = build_title_autocomplete(db_path)
+        build_s = time.perf_counter() - start
+        index.save(Path(tmp, "autocomplete"))
+        mapped = TitleAutocomplete.load(Path(tmp, "autocomplete"))
+        print(
+            f"{args.docs} docs: build {build_s:.2f} s, {len(index.terms)} terms, "
+            f"{len(index.prefixes)} cached prefixes"
+        )
+
+        conn = sqlite3.connect(db_path)
+        rows = list(iter_title_citations(conn))
+        inputs = keystrokes([title for _, title, _ in rows], args.titles)
+
+        def like(text: str):
+            return conn.execute(
+                "SELECT work_id, title FROM normalized_works WHERE title LIKE ? LIMIT ?",
+                (f"%{text}%", args.limit),
+            ).fetchall()
+
+        print(f"{len(inputs)} keystrokes, top {args.limit}")
+        print(f"{'':<14} {'p50 us':>10} {'p99 us':>10} {'max us':>10}")
+        for label, run, texts in (
+            ("LIKE scan", like, inputs[:args.like]),
+            ("in-memory", lambda t: index.complete(t, args.limit), inputs),
+            ("mapped", lambda t: mapped.complete(t, args.limit), inputs),
+            ("mapped terms", lambda t: mapped.complete_terms(t, args.limit), inputs),
+        ):
+            lat = time_us(run, texts)
+            print(f"{label:<14} {np.percentile(lat, 50):10.1f} {np.percentile(lat, 99):10.1f} {lat.max():10.1f}")
+        conn.close()
+
+        checked = inputs[::max(1, len(inputs) // args.check)][:args.check]
+        same = all(
+            [w for w, _, _ in mapped.complete(text, args.limit)] == scan(rows, text, args.limit)
+            for text in checked
+        )
+        print(f"matches scan on {len(checked)} keystrokes: {same}")
+
+
+if __name__ == "__main__":
+    main()
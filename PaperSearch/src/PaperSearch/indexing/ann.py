@@ -0,0 +1,192 @@
+# ann.py
+
+from array import array
+from pathlib import Path
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from .segment import SegmentReader, SegmentWriter
+
+SEGMENT_KIND = "ivf"
+SEGMENT_VERSION = 1
+
+# Rows per matrix product when assigning vectors to lists.
+ASSIGN_CHUNK = 16_384
+
+
+def _to_array(values: np.ndarray, typecode: str) -> array:
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values).tobytes())
+    return out
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Index of the most similar centroid for every row.
+    """
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        block = vectors[start:start + ASSIGN_CHUNK]
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 10,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    k-means on unit vectors with cosine similarity: rows are assigned to
+    the centroid with the largest dot product, and centroids are the
+    renormalised means. Empty clusters are reseeded from random rows.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        empty = ~filled
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF-Flat) index for inner-product search over unit
+    vectors. A spherical k-means quantizer splits the vectors into
+    `n_lists` lists; vectors are stored grouped by list, so a query
+    scores the `nprobe` lists whose centroids are closest and only
+    those rows. `nprobe` trades recall for latency: nprobe = n_lists is
+    exact search.
+
+    Result rows refer to the order of the matrix the index was built
+    from; `labels` (e.g. work_ids) are stored alongside.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+        vectors: np.ndarray,
+        labels: Sequence[str],
+    ):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.vectors = vectors
+        self.labels = labels
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        labels: Sequence[str],
+        n_lists: int | None = None,
+        n_iter: int = 10,
+        train_size: int = 100_000,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Train the quantizer on up to `train_size` rows of `matrix` (unit
+        rows) and file every row under its nearest centroid. `n_lists`
+        defaults to about 4 * sqrt(len(matrix)).
+        """
+        n = len(matrix)
+        if n == 0:
+            raise ValueError("cannot build an IVF index over an empty matrix")
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(n)))
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.default_rng(seed)
+        sample = matrix
+        if n > train_size:
+            sample = matrix[np.sort(rng.choice(n, train_size, replace=False))]
+        centroids = spherical_kmeans(np.asarray(sample, dtype=np.float32), n_lists, n_iter, seed)
+
+        assignment = _assign(matrix, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.uint64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        return cls(
+            centroids,
+            offsets,
+            order.astype(np.uint32),
+            np.ascontiguousarray(matrix[order], dtype=np.float32),
+            labels,
+        )
+
+    def search(self, q: np.ndarray, k: int, nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k rows by inner product with unit vector `q`.
+        Returns (rows, scores), best first.
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        centroid_scores = self.centroids @ q
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+
+        rows_parts = []
+        score_parts = []
+        for lst in probe:
+            start, end = int(self.list_offsets[lst]), int(self.list_offsets[lst + 1])
+            if start == end:
+                continue
+            score_parts.append(self.vectors[start:end] @ q)
+            rows_parts.append(self.list_rows[start:end])
+        if not rows_parts:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.float32)
+
+        rows = np.concatenate(rows_parts)
+        scores = np.concatenate(score_parts)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: str | Path) -> None:
+        writer = SegmentWriter(path, SEGMENT_KIND, SEGMENT_VERSION)
+        writer.write_array("centroids", _to_array(self.centroids, "f"))
+        writer.write_array("list_offsets", _to_array(self.list_offsets.astype(np.uint64), "Q"))
+        writer.write_array("list_rows", _to_array(self.list_rows.astype(np.uint32), "I"))
+        writer.write_array("vectors", _to_array(self.vectors, "f"))
+        writer.write_strings("labels", self.labels)
+        writer.close(dim=self.vectors.shape[1], n_lists=self.n_lists)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IVFIndex":
+        """
+        Memory-map an index written by `save()`.
+        """
+        seg = SegmentReader(path, SEGMENT_KIND, SEGMENT_VERSION)
+        dim = seg.meta["dim"]
+        return cls(
+            np.frombuffer(seg.array("centroids"), dtype=np.float32).reshape(-1, dim),
+            np.frombuffer(seg.array("list_offsets"), dtype=np.uint64),
+            np.frombuffer(seg.array("list_rows"), dtype=np.uint32),
+            np.frombuffer(seg.array("vectors"), dtype=np.float32).reshape(-1, dim),
+            seg.strings("labels"),
+        )
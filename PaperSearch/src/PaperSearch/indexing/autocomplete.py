@@ -0,0 +1,350 @@
+# autocomplete.py
+
+import re
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .bm25_index import tokenize
+from .segment import SegmentReader, SegmentWriter
+
+SEGMENT_KIND = "title_autocomplete"
+SEGMENT_VERSION = 1
+
+# Prefixes matching more than HEAVY_RANGE terms get their top CACHE_SIZE
+# terms and titles precomputed, so no lookup touches more than
+# HEAVY_RANGE posting lists.
+HEAVY_RANGE = 256
+CACHE_SIZE = 32
+
+# Candidate titles checked per step when a prefix follows complete words.
+FILTER_CHUNK = 256
+
+_ENDS_IN_WORD = re.compile(r"[a-z0-9]$")
+
+
+def _to_array(values: np.ndarray, typecode: str) -> array:
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values).tobytes())
+    return out
+
+
+def _successor(prefix: str) -> str:
+    """
+    Smallest string greater than every string starting with `prefix`.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _gather(offsets: np.ndarray, rows: np.ndarray, limit: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flat indices of the CSR rows `rows` (at most `limit` entries of
+    each) and the length taken from each row.
+    """
+    starts = offsets[rows].astype(np.int64)
+    lens = offsets[rows + 1].astype(np.int64) - starts
+    if limit is not None:
+        lens = np.minimum(lens, limit)
+    firsts = np.cumsum(lens) - lens
+    return np.arange(int(lens.sum())) + np.repeat(starts - firsts, lens), lens
+
+
+class TitleAutocomplete:
+    """
+    Type-ahead over paper titles. Titles are ranked once by popularity
+    (`cited_by_count`, most cited first) and referred to by rank, so
+    every posting list is already in popularity order and the first
+    matches found are the best ones.
+
+    - `terms`: sorted title vocabulary; a prefix is a contiguous range
+    - `term_offsets` / `term_titles`: title ranks per term (CSR)
+    - `title_offsets` / `title_terms`: term ids per title (CSR)
+    - `weights`: per term, the sum of (cited_by_count + 1) over its titles
+    - `prefixes`: sorted prefixes matching more than HEAVY_RANGE terms,
+      with their top terms and titles in `cached_terms` / `cached_titles`
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        term_offsets: np.ndarray,
+        term_titles: np.ndarray,
+        title_offsets: np.ndarray,
+        title_terms: np.ndarray,
+        weights: np.ndarray,
+        work_ids: Sequence[str],
+        titles: Sequence[str],
+        cites: np.ndarray,
+        prefixes: Sequence[str],
+        cache_offsets: np.ndarray,
+        cached_terms: np.ndarray,
+        cached_titles: np.ndarray,
+    ):
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.term_titles = term_titles
+        self.title_offsets = title_offsets
+        self.title_terms = title_terms
+        self.weights = weights
+        self.work_ids = work_ids
+        self.titles = titles
+        self.cites = cites
+        self.prefixes = prefixes
+        self.cache_offsets = cache_offsets
+        self.cached_terms = cached_terms
+        self.cached_titles = cached_titles
+
+    def __len__(self) -> int:
+        return len(self.work_ids)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[str, str, int]]) -> "TitleAutocomplete":
+        """
+        Index (work_id, title, cited_by_count) rows. Titles without a
+        token are skipped.
+        """
+        entries = []
+        for work_id, title, cites in rows:
+            tokens = set(tokenize(title or ""))
+            if tokens:
+                entries.append((work_id, title.strip(), max(int(cites or 0), 0), tokens))
+        entries.sort(key=lambda e: -e[2])
+
+        terms = sorted(set().union(*(e[3] for e in entries)))
+        term_id = {t: i for i, t in enumerate(terms)}
+        title_offsets = np.zeros(len(entries) + 1, dtype=np.uint64)
+        title_terms = np.fromiter(
+            (term_id[t] for e in entries for t in sorted(e[3])), dtype=np.uint32
+        )
+        title_offsets[1:] = np.cumsum([len(e[3]) for e in entries])
+        cites = np.array([e[2] for e in entries], dtype=np.uint32)
+
+        # Title ranks ascending within each term: a stable sort of the
+        # forward entries (which are in rank order) by term id.
+        lens = np.diff(title_offsets).astype(np.int64)
+        ranks = np.repeat(np.arange(len(entries), dtype=np.uint32), lens)
+        order = np.argsort(title_terms, kind="stable")
+        term_titles = ranks[order]
+        counts = np.bincount(title_terms, minlength=len(terms))
+        term_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.uint64)
+        weights = np.bincount(
+            title_terms, weights=np.repeat(cites.astype(np.float64) + 1, lens), minlength=len(terms)
+        ).astype(np.uint64)
+
+        index = cls(
+            terms, term_offsets, term_titles, title_offsets, title_terms, weights,
+            [e[0] for e in entries], [e[1] for e in entries], cites,
+            [], np.zeros(1, dtype=np.uint64), np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32),
+        )
+        index._cache_heavy_prefixes()
+        return index
+
+    def _cache_heavy_prefixes(self) -> None:
+        terms = self.terms
+        heavy: List[Tuple[str, int, int]] = []
+        ranges = [(0, len(terms))]
+        length = 1
+        while ranges:
+            deeper = []
+            for lo, hi in ranges:
+                i = lo
+                while i < hi:
+                    if len(terms[i]) < length:
+                        i += 1
+                        continue
+                    prefix = terms[i][:length]
+                    j = bisect_left(terms, _successor(prefix), i, hi)
+                    if j - i > HEAVY_RANGE:
+                        heavy.append((prefix, i, j))
+                        deeper.append((i, j))
+                    i = j
+            ranges = deeper
+            length += 1
+        heavy.sort()
+
+        offsets = np.zeros(len(heavy) + 1, dtype=np.uint64)
+        top_terms, top_titles = [], []
+        for n, (_, lo, hi) in enumerate(heavy):
+            top_terms.append(self._top_terms(lo, hi, CACHE_SIZE))
+            top_titles.append(self._top_titles(lo, hi, CACHE_SIZE))
+            offsets[n + 1] = offsets[n] + len(top_titles[-1])
+        self.prefixes = [p for p, _, _ in heavy]
+        # Row n holds CACHE_SIZE terms (a heavy prefix has more terms than
+        # that) and offsets[n]:offsets[n + 1] of the cached titles.
+        self.cache_offsets = offsets
+        self.cached_terms = np.concatenate(top_terms or [np.zeros(0)]).astype(np.uint32)
+        self.cached_titles = np.concatenate(top_titles or [np.zeros(0)]).astype(np.uint32)
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect_left(self.terms, prefix)
+        return lo, bisect_left(self.terms, _successor(prefix), lo)
+
+    def _term_id(self, term: str) -> int:
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def _cached(self, prefix: str, limit: int) -> int:
+        """
+        Row of `prefix` in the prefix cache, or -1.
+        """
+        if limit > CACHE_SIZE:
+            return -1
+        i = bisect_left(self.prefixes, prefix)
+        return i if i < len(self.prefixes) and self.prefixes[i] == prefix else -1
+
+    def _top_terms(self, lo: int, hi: int, limit: int) -> np.ndarray:
+        w = np.asarray(self.weights[lo:hi])
+        if len(w) > limit:
+            top = np.argpartition(-w.astype(np.float64), limit - 1)[:limit]
+        else:
+            top = np.arange(len(w))
+        top = top[np.lexsort((top, -w[top].astype(np.float64)))]
+        return top + lo
+
+    def _top_titles(self, lo: int, hi: int, limit: int) -> np.ndarray:
+        """
+        Best `limit` titles containing any of terms lo..hi. Each term's
+        list is in rank order, so only its first `limit` entries count.
+        """
+        idx, _ = _gather(self.term_offsets, np.arange(lo, hi), limit)
+        return np.unique(self.term_titles[idx])[:limit]
+
+    def _with_prefix(self, candidates: np.ndarray, lo: int, hi: int, limit: int) -> np.ndarray:
+        """
+        The first `limit` of `candidates` having a term in lo..hi. The
+        candidates' terms are checked in order until enough match, unless
+        the prefix is rare enough that intersecting its titles with the
+        candidates is expected to be cheaper.
+        """
+        start, end = int(self.term_offsets[lo]), int(self.term_offsets[hi])
+        expected_scan = min(len(candidates), limit * len(self) / max(end - start, 1))
+        terms_per_title = len(self.title_terms) / max(len(self), 1)
+        if end - start + len(candidates) < expected_scan * terms_per_title:
+            matching = np.unique(self.term_titles[start:end])
+            return np.intersect1d(candidates, matching, assume_unique=True)[:limit]
+
+        found = []
+        n_found = 0
+        for start in range(0, len(candidates), FILTER_CHUNK):
+            chunk = candidates[start:start + FILTER_CHUNK]
+            idx, lens = _gather(self.title_offsets, chunk)
+            t = self.title_terms[idx]
+            hit = ((t >= lo) & (t < hi)).astype(np.int32)
+            keep = chunk[np.add.reduceat(hit, np.cumsum(lens) - lens) > 0]
+            found.append(keep)
+            n_found += len(keep)
+            if n_found >= limit:
+                break
+        return np.concatenate(found)[:limit] if found else candidates[:0]
+
+    def complete_terms(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Title words starting with `prefix`, most popular first, with
+        their weights.
+        """
+        tokens = tokenize(prefix)
+        if not tokens or limit <= 0:
+            return []
+        prefix = tokens[-1]
+        row = self._cached(prefix, limit)
+        if row >= 0:
+            ids = self.cached_terms[row * CACHE_SIZE:row * CACHE_SIZE + limit]
+        else:
+            ids = self._top_terms(*self._prefix_range(prefix), limit)
+        return [(self.terms[int(i)], int(self.weights[i])) for i in ids]
+
+    def complete(self, text: str, limit: int = 10) -> List[Tuple[str, str, int]]:
+        """
+        Most cited titles matching what has been typed: every complete
+        word, plus a word starting with the last one unless `text` ends
+        in a separator. Returns (work_id, title, cited_by_count).
+        """
+        tokens = tokenize(text)
+        if not tokens or limit <= 0:
+            return []
+        if _ENDS_IN_WORD.search(text.lower()):
+            words, prefix = tokens[:-1], tokens[-1]
+        else:
+            words, prefix = tokens, None
+
+        if words:
+            lists = []
+            for word in set(words):
+                i = self._term_id(word)
+                if i < 0:
+                    return []
+                lists.append(self.term_titles[int(self.term_offsets[i]):int(self.term_offsets[i + 1])])
+            lists.sort(key=len)
+            ranks = np.asarray(lists[0])
+            for other in lists[1:]:
+                ranks = np.intersect1d(ranks, other, assume_unique=True)
+            if prefix is not None:
+                lo, hi = self._prefix_range(prefix)
+                ranks = self._with_prefix(ranks, lo, hi, limit) if hi > lo else ranks[:0]
+        else:
+            row = self._cached(prefix, limit)
+            if row >= 0:
+                start, end = int(self.cache_offsets[row]), int(self.cache_offsets[row + 1])
+                ranks = self.cached_titles[start:min(end, start + limit)]
+            else:
+                lo, hi = self._prefix_range(prefix)
+                ranks = self._top_titles(lo, hi, limit)
+
+        return [(self.work_ids[r], self.titles[r], int(self.cites[r])) for r in map(int, ranks[:limit])]
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: str | Path) -> None:
+        writer = SegmentWriter(path, SEGMENT_KIND, SEGMENT_VERSION)
+        writer.write_strings("terms", self.terms)
+        writer.write_array("term_offsets", _to_array(self.term_offsets, "Q"))
+        writer.write_array("term_titles", _to_array(self.term_titles, "I"))
+        writer.write_array("title_offsets", _to_array(self.title_offsets, "Q"))
+        writer.write_array("title_terms", _to_array(self.title_terms, "I"))
+        writer.write_array("weights", _to_array(self.weights, "Q"))
+        writer.write_strings("work_ids", self.work_ids)
+        writer.write_strings("titles", self.titles)
+        writer.write_array("cites", _to_array(self.cites, "I"))
+        writer.write_strings("prefixes", self.prefixes)
+        writer.write_array("cache_offsets", _to_array(self.cache_offsets, "Q"))
+        writer.write_array("cached_terms", _to_array(self.cached_terms, "I"))
+        writer.write_array("cached_titles", _to_array(self.cached_titles, "I"))
+        writer.close(titles=len(self.work_ids), terms=len(self.terms), cache_size=CACHE_SIZE)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "TitleAutocomplete":
+        """
+        Memory-map an index written by `save()`.
+        """
+        seg = SegmentReader(path, SEGMENT_KIND, SEGMENT_VERSION)
+        if seg.meta["cache_size"] != CACHE_SIZE:
+            raise ValueError(f"{path} was built with a prefix cache of {seg.meta['cache_size']}; rebuild it")
+
+        def numpy(name: str, dtype) -> np.ndarray:
+            return np.frombuffer(seg.array(name), dtype=dtype)
+
+        return cls(
+            seg.strings("terms"),
+            numpy("term_offsets", np.uint64),
+            numpy("term_titles", np.uint32),
+            numpy("title_offsets", np.uint64),
+            numpy("title_terms", np.uint32),
+            numpy("weights", np.uint64),
+            seg.strings("work_ids"),
+            seg.strings("titles"),
+            numpy("cites", np.uint32),
+            seg.strings("prefixes"),
+            numpy("cache_offsets", np.uint64),
+            numpy("cached_terms", np.uint32),
+            numpy("cached_titles", np.uint32),
+        )
@@ -2,34 +2,114 @@
 
 import math
 import re
+import threading
+import time
+from array import array
 from collections import Counter, defaultdict
-from typing import Dict, List, Tuple
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
 
+import numpy as np
+
+from .concepts import ConceptStore
+from .fuzzy import TrigramIndex, nearest
+from .instrumentation import SearchTrace
 from .normalizer import normalize_text
+from .positions import ParsedQuery, TermPositions, has_syntax, parse_query, phrase_starts, spans_near, token_positions
+from .postings import PostingList
+from .segment import SegmentReader, SegmentWriter
+from .vector_scoring import batch_top_k, length_norms, numpy_top_k, posting_arrays
+from .wand import wand_top_k
+
+SEGMENT_KIND = "bm25"
+SEGMENT_VERSION = 4
+
+SCORE_METHODS = ("exhaustive", "wand", "bmw", "numpy")
+
+# Stored block bounds are float32; inflate them so rounding never
+# makes a bound smaller than a real score.
+BOUND_SLACK = 1 + 1e-6
+
+# fuzzy=True: an unknown query term is replaced by at most
+# FUZZY_EXPANSIONS of its nearest vocabulary terms, each weighted
+# FUZZY_PENALTY ** edit distance.
+FUZZY_EXPANSIONS = 3
+FUZZY_PENALTY = 0.5
 
 
 def tokenize(text: str) -> List[str]:
     return re.findall(r"[a-z0-9]+", text.lower())
 
 
+@dataclass
+class IndexShard:
+    """
+    Flat, picklable contents of an unfinalized BM25Index, produced by
+    `BM25Index.to_shard()` in a worker process and combined with
+    `BM25Index.from_shards()`. Postings are CSR over `terms`.
+    """
+    k1: float
+    b: float
+    N: int
+    doc_ids: List[str]
+    doc_len: array
+    terms: List[str]
+    term_offsets: array
+    post_docs: array
+    post_tfs: array
+    concept_names: Sequence[str]
+    concept_offsets: array
+    concept_cids: array
+    concept_scores: array
+    pos_offsets: array | None = None
+    pos_data: bytes | None = None
+
+
 class BM25Index:
     """
-    Lightweight BM25 index with synonym expansion and concept metadata.
+    Lightweight BM25 index with synonym expansion and concept metadata,
+    updatable in place and persisted as a memory-mapped segment.
     """
 
-    def __init__(self, k1: float = 1.5, b: float = 0.75):
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        compress: bool = False,
+        auto_compact_ratio: float = 0.1,
+        store_positions: bool = False,
+    ):
         self.k1 = k1
         self.b = b
+        self.compress = compress
+        self.store_positions = store_positions
+        self.auto_compact_ratio = auto_compact_ratio
 
         self.N = 0
-        self.doc_len: Dict[int, int] = {}
+        self.doc_len = array("I")
         self.avg_len: float = 0.0
 
         self.df: Counter = Counter()
-        self.inverted: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
-        self.doc_ids: Dict[int, str] = {}
+        self.inverted: Dict[str, PostingList] = defaultdict(PostingList)
+        self.doc_ids: List[str] = []
+
+        self.doc_concepts = ConceptStore()
+
+        self.deleted: frozenset[int] = frozenset()
+        self._doc_of: Dict[str, int] | None = {}
+        self._total_len = 0
+        self._forward: _ForwardIndex | None = None
+        self._lock = threading.RLock()
+        self._compactor: threading.Thread | None = None
 
-        self.doc_concepts: Dict[int, List[Tuple[str, float]]] = {}
+        self._segment: SegmentReader | None = None
+        self._norms = None
+        self._norms_key: Tuple[int, float] | None = None
+
+        self._fuzzy: TrigramIndex | None = None
+        self.last_expansion: Dict[str, Any] = {}
 
     def add_document(
         self,
@@ -45,28 +125,395 @@ class BM25Index:
         # 🔥 Improved tokenization
         tokens = tokenize(text)
         counts = Counter(tokens)
+        positions = token_positions(tokens) if self.store_positions else None
+
+        with self._lock:
+            self._thaw()
+            self._reserve(doc_id)
+            self.doc_ids[doc_id] = work_id
+            self.doc_len[doc_id] = len(tokens)
+            self.N += 1
+            self._total_len += len(tokens)
+            self._doc_of[work_id] = doc_id
 
-        self.doc_ids[doc_id] = work_id
-        self.doc_len[doc_id] = len(tokens)
-        self.N += 1
+            for term, tf in counts.items():
+                self.df[term] += 1
+                plist = self.inverted[term]
+                if positions is not None:
+                    # Positions first, so readers never see a posting
+                    # without them.
+                    if plist.positions is None:
+                        plist.positions = TermPositions()
+                    plist.positions.append(positions[term])
+                plist.append(doc_id, tf)
 
-        for term, tf in counts.items():
-            self.df[term] += 1
-            self.inverted[term].append((doc_id, tf))
+            self.doc_concepts.set(doc_id, concepts or [])
+            if self._forward is not None:
+                self._forward.add(doc_id, counts)
 
-        self.doc_concepts[doc_id] = concepts or []
+    def _reserve(self, doc_id: int) -> None:
+        missing = doc_id + 1 - len(self.doc_ids)
+        if missing > 0:
+            self.doc_ids.extend([""] * missing)
+            self.doc_len.extend([0] * missing)
 
     def finalize(self) -> None:
-        if self.N > 0:
-            self.avg_len = sum(self.doc_len.values()) / self.N
+        with self._lock:
+            self._total_len = sum(self.doc_len)
+            if self.N > 0:
+                self.avg_len = self._total_len / self.N
+            for plist in self.inverted.values():
+                if self.compress:
+                    plist.compress()
+                self._compute_block_max(plist)
+            self.length_norms()
+
+    # ------------------------------------------------------------
+    # Sharded builds
+    # ------------------------------------------------------------
+    def to_shard(self) -> IndexShard:
+        """
+        Export the documents and postings for merging elsewhere.
+        Tombstoned documents are compacted away first.
+        """
+        with self._lock:
+            if self.deleted:
+                self.compact()
+            terms = list(self.inverted)
+            term_offsets = array("Q", [0])
+            post_docs = array("I")
+            post_tfs = array("I")
+            pos_offsets = array("Q", [0]) if self.store_positions else None
+            pos_data = bytearray()
+            for term in terms:
+                plist = self.inverted[term]
+                if plist.packed_count:
+                    docs, tfs = posting_arrays(plist)
+                    post_docs.frombytes(docs.tobytes())
+                    post_tfs.frombytes(tfs.tobytes())
+                else:
+                    post_docs.extend(plist.docs)
+                    post_tfs.extend(plist.tfs)
+                term_offsets.append(len(post_docs))
+                if pos_offsets is not None:
+                    _append_positions(plist.positions, pos_offsets, pos_data)
+            names, offsets, cids, scores = self.doc_concepts.flat()
+            return IndexShard(
+                k1=self.k1, b=self.b, N=self.N,
+                doc_ids=list(self.doc_ids), doc_len=array("I", self.doc_len),
+                terms=terms, term_offsets=term_offsets, post_docs=post_docs, post_tfs=post_tfs,
+                concept_names=list(names), concept_offsets=array("Q", offsets),
+                concept_cids=array("I", cids), concept_scores=array("f", scores),
+                pos_offsets=pos_offsets, pos_data=bytes(pos_data) if pos_offsets is not None else None,
+            )
+
+    @classmethod
+    def from_shards(cls, shards: Iterable[IndexShard], compress: bool = False) -> "BM25Index":
+        """
+        Concatenate shards built over disjoint documents, in order. The
+        result must still be finalized.
+        """
+        index = None
+        term_id: Dict[str, int] = {}
+        parts_terms, parts_docs, parts_tfs = [], [], []
+        # term -> per-shard (posting offsets, bytes) of its positions
+        parts_pos: Dict[str, List[Tuple[np.ndarray, bytes]]] = {}
+
+        for shard in shards:
+            if index is None:
+                index = cls(
+                    k1=shard.k1, b=shard.b, compress=compress,
+                    store_positions=shard.pos_offsets is not None,
+                )
+            base = len(index.doc_ids)
+
+            if shard.pos_offsets is not None:
+                pos_offsets = np.frombuffer(shard.pos_offsets, dtype=np.uint64)
+                for i, term in enumerate(shard.terms):
+                    start, end = shard.term_offsets[i], shard.term_offsets[i + 1]
+                    offs = pos_offsets[start:end + 1]
+                    parts_pos.setdefault(term, []).append((offs, shard.pos_data[offs[0]:offs[-1]]))
+
+            ids = np.fromiter(
+                (term_id.setdefault(t, len(term_id)) for t in shard.terms),
+                dtype=np.uint32, count=len(shard.terms),
+            )
+            counts = np.diff(np.frombuffer(shard.term_offsets, dtype=np.uint64)).astype(np.int64)
+            parts_terms.append(np.repeat(ids, counts))
+            parts_docs.append(np.frombuffer(shard.post_docs, dtype=np.uint32) + np.uint32(base))
+            parts_tfs.append(np.frombuffer(shard.post_tfs, dtype=np.uint32))
+
+            index.doc_ids.extend(shard.doc_ids)
+            index.doc_len.extend(shard.doc_len)
+            index.doc_concepts.extend(
+                shard.concept_names, shard.concept_offsets, shard.concept_cids, shard.concept_scores,
+            )
+            index.N += shard.N
+
+        if index is None:
+            return cls(compress=compress)
+
+        if term_id:
+            term_ids = np.concatenate(parts_terms)
+            # Stable, so each term keeps shard order and doc ids stay sorted.
+            order = np.argsort(term_ids, kind="stable")
+            docs = np.concatenate(parts_docs)[order]
+            tfs = np.concatenate(parts_tfs)[order]
+            offsets = np.zeros(len(term_id) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(term_ids, minlength=len(term_id)), out=offsets[1:])
+            del term_ids, order, parts_terms, parts_docs, parts_tfs
+
+            for term, i in term_id.items():
+                start, end = offsets[i], offsets[i + 1]
+                plist = PostingList(
+                    array("I", docs[start:end].tobytes()), array("I", tfs[start:end].tobytes())
+                )
+                if index.store_positions:
+                    plist.positions = _merge_positions(parts_pos.pop(term))
+                index.inverted[term] = plist
+                index.df[term] = int(end - start)
+
+        index._doc_of = {wid: doc_id for doc_id, wid in enumerate(index.doc_ids) if wid}
+        index._total_len = sum(index.doc_len)
+        return index
+
+    # ------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------
+    def upsert_document(
+        self,
+        work_id: str,
+        text: str,
+        concepts: List[Tuple[str, float]] | None = None,
+    ) -> int:
+        """
+        Add `work_id`, replacing any live document with the same id.
+        Returns the new doc id.
+        """
+        with self._lock:
+            self._thaw()
+            old = self._doc_of.get(work_id)
+            doc_id = len(self.doc_ids)
+            self.add_document(doc_id, work_id, text, concepts=concepts)
+            if old is not None:
+                self._tombstone(old)
+            self._update_avg_len()
+        self._maybe_compact()
+        return doc_id
+
+    def delete_document(self, work_id: str) -> bool:
+        """
+        Tombstone `work_id`. Returns False if it is not in the index.
+        """
+        with self._lock:
+            self._thaw()
+            doc_id = self._doc_of.pop(work_id, None)
+            if doc_id is None:
+                return False
+            self._tombstone(doc_id)
+            self._update_avg_len()
+        self._maybe_compact()
+        return True
 
-    def score(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+    def _tombstone(self, doc_id: int) -> None:
+        for term in self._forward_index().terms_of(doc_id):
+            self.df[term] -= 1
+        # Replaced, never mutated, so queries can iterate a snapshot.
+        self.deleted = self.deleted | {doc_id}
+        self.N -= 1
+        self._total_len -= self.doc_len[doc_id]
+        self.doc_len[doc_id] = 0
 
-        # 🔥 Normalize query too
-        query = normalize_text(query)
-        q_tokens = tokenize(query)
+    def _update_avg_len(self) -> None:
+        self.avg_len = self._total_len / self.N if self.N else 0.0
 
+    def _maybe_compact(self) -> None:
+        if len(self.deleted) > self.auto_compact_ratio * max(self.N, 1):
+            self.compact_in_background()
+
+    def compact_in_background(self) -> threading.Thread:
+        """
+        Run `compact()` on a daemon thread unless one is already running.
+        """
+        with self._lock:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(
+                    target=self.compact, name="bm25-compactor", daemon=True
+                )
+                self._compactor.start()
+            return self._compactor
+
+    def compact(self) -> int:
+        """
+        Drop the postings of tombstoned documents. Returns the number of
+        postings removed.
+        """
+        with self._lock:
+            dead = set(self.deleted)
+            forward = self._forward_index()
+            terms = {t for doc_id in dead for t in forward.terms_of(doc_id)}
+
+        removed = 0
+        for term in terms:
+            with self._lock:
+                plist = self.inverted.get(term)
+                if plist is None:
+                    continue
+                fresh = PostingList()
+                positions = plist.positions
+                if positions is not None:
+                    fresh.positions = TermPositions()
+                for j, (doc_id, tf) in enumerate(plist):
+                    if doc_id not in dead:
+                        if positions is not None:
+                            fresh.positions.extend_raw(positions.raw(j))
+                        fresh.append(doc_id, tf)
+                removed += len(plist) - len(fresh)
+
+                if len(fresh):
+                    if self.compress:
+                        fresh.compress()
+                    self._compute_block_max(fresh)
+                    self.inverted[term] = fresh
+                else:
+                    del self.inverted[term]
+                    del self.df[term]
+                    self._fuzzy = None
+
+        with self._lock:
+            for doc_id in dead:
+                self.doc_ids[doc_id] = ""
+                self.doc_concepts.set(doc_id, [])
+            self.deleted = self.deleted - dead
+        return removed
+
+    def _forward_index(self) -> "_ForwardIndex":
+        if self._forward is None:
+            self._forward = _ForwardIndex.from_postings(self.inverted, len(self.doc_ids))
+        return self._forward
+
+    def _thaw(self) -> None:
+        """
+        Copy a memory-mapped segment into mutable in-memory structures.
+        """
+        if self._segment is None:
+            return
+
+        inverted: Dict[str, PostingList] = defaultdict(PostingList)
+        for term, mapped in zip(self.inverted, self.inverted.values()):
+            if mapped.packed_count:
+                plist = PostingList.from_packed(
+                    bytes(mapped.packed),
+                    array("I", mapped.block_last),
+                    array("I", mapped.block_offsets),
+                    mapped.packed_count,
+                )
+            else:
+                plist = PostingList(array("I", mapped.docs), array("I", mapped.tfs))
+            plist.block_max = array("f", mapped.block_max)
+            plist.bound_count = mapped.bound_count
+            plist.bound_avg_len = mapped.bound_avg_len
+            if mapped.positions is not None:
+                plist.positions = mapped.positions.copy()
+            inverted[term] = plist
+
+        self.df = Counter({term: len(plist) for term, plist in inverted.items()})
+        self.inverted = inverted
+        self.doc_len = array("I", self.doc_len)
+        self.doc_ids = list(self.doc_ids)
+        self.doc_concepts = self.doc_concepts.thaw()
+        self._doc_of = None
+        self._doc_map()
+        self._total_len = sum(self.doc_len)
+        self._segment = None
+
+    def length_norms(self):
+        """
+        float32 array of k1 * (1 - b + b * dl / avg_len) per doc id,
+        recomputed only when documents or avg_len have changed.
+        """
+        key = (len(self.doc_len), self.avg_len)
+        if self._norms_key != key:
+            self._norms = length_norms(self.doc_len, self.k1, self.b, self.avg_len)
+            self._norms_key = key
+        return self._norms
+
+    def _compute_block_max(self, plist: PostingList) -> None:
+        """
+        Record, per block, the largest BM25 tf component of its postings.
+        Multiplied by idf this bounds any posting's score in the block.
+        """
+        k1, b, avg_len = self.k1, self.b, self.avg_len
+        block_max = array("f")
+        if avg_len > 0:
+            for i in range(plist.num_blocks):
+                docs, tfs = plist.block(i)
+                best = 0.0
+                for doc_id, tf in zip(docs, tfs):
+                    part = tf * (k1 + 1) / (tf + k1 * (1 - b + b * self.doc_len[doc_id] / avg_len))
+                    if part > best:
+                        best = part
+                block_max.append(best * BOUND_SLACK)
+        plist.block_max = block_max
+        plist.bound_count = len(plist) if avg_len > 0 else 0
+        plist.bound_avg_len = avg_len
+
+    def score(
+        self,
+        query: str,
+        top_k: int = 20,
+        method: str = "exhaustive",
+        required_concepts: Iterable[str] | None = None,
+        fuzzy: bool = False,
+        trace: SearchTrace | None = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank documents for `query` with one of SCORE_METHODS (all return the
+        same hits; "numpy" in float32), restricted to `required_concepts`.
+        """
+        if method not in SCORE_METHODS:
+            raise ValueError(f"Unknown score method {method!r}; expected one of {SCORE_METHODS}")
+
+        plan = self._plan(query, required_concepts, fuzzy, trace)
+        if plan is None:
+            return []
+        q_tokens, term_weights, allowed = plan
+        deleted = self.deleted
+        stats = None if trace is None else trace.counters
+        if trace is not None:
+            trace.details["method"] = method
+
+        if method == "numpy":
+            top = numpy_top_k(self, q_tokens, top_k, deleted, allowed, term_weights, stats)
+        elif method != "exhaustive":
+            top = wand_top_k(
+                self, q_tokens, top_k, deleted, block_max=(method == "bmw"),
+                allowed=None if allowed is None else allowed.tolist(), term_weights=term_weights,
+                stats=stats,
+            )
+        else:
+            top = self._exhaustive_top_k(q_tokens, top_k, deleted, allowed, term_weights, stats)
+        if trace is not None:
+            trace.lap("bm25")
+            trace.count("hits", len(top))
+        return [(self.doc_ids[doc_id], score) for doc_id, score in top]
+
+    def _exhaustive_top_k(
+        self,
+        q_tokens: List[str],
+        top_k: int,
+        deleted: frozenset[int],
+        allowed: np.ndarray | None,
+        term_weights: Dict[str, float] | None,
+        stats: Dict[str, int] | None,
+    ) -> List[Tuple[int, float]]:
+        """
+        The "exhaustive" method: every posting of every query term,
+        accumulated per document in a Counter.
+        """
+        allowed_set = None if allowed is None else set(allowed.tolist())
         scores: Counter = Counter()
+        postings = 0
 
         for term in q_tokens:
             if term not in self.inverted:
@@ -74,17 +521,531 @@ class BM25Index:
 
             df = self.df[term]
             idf = math.log(1 + (self.N - df + 0.5) / (df + 0.5))
+            if term_weights is not None:
+                idf *= term_weights.get(term, 1.0)
 
+            postings += len(self.inverted[term])
             for doc_id, tf in self.inverted[term]:
+                if allowed_set is not None and doc_id not in allowed_set:
+                    continue
                 dl = self.doc_len[doc_id]
                 denom = tf + self.k1 * (1 - self.b + self.b * dl / self.avg_len)
                 scores[doc_id] += idf * (tf * (self.k1 + 1) / denom)
 
-        top = scores.most_common(top_k)
-        return [(self.doc_ids[doc_id], score) for doc_id, score in top]
+        for doc_id in deleted:
+            scores.pop(doc_id, None)
+
+        if stats is not None:
+            stats["postings"] = stats.get("postings", 0) + postings
+            stats["candidates"] = stats.get("candidates", 0) + len(scores)
+        return scores.most_common(top_k)
+
+    def score_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 20,
+        required_concepts: Iterable[str] | None = None,
+        fuzzy: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        `score(query, top_k, "numpy", ...)` for every query, scored as one
+        batch by `batch_top_k`.
+        """
+        required_concepts = list(required_concepts or ())
+        distinct = list(dict.fromkeys(queries))
+        plans = {q: self._plan(q, required_concepts, fuzzy) for q in distinct}
+        live = [q for q in distinct if plans[q] is not None]
+        tops = batch_top_k(self, [plans[q] for q in live], top_k, self.deleted)
+        ranked = {q: [(self.doc_ids[doc_id], score) for doc_id, score in top] for q, top in zip(live, tops)}
+        return [ranked.get(q, []) for q in queries]
+
+    def _plan(
+        self,
+        query: str,
+        required_concepts: Iterable[str] | None,
+        fuzzy: bool,
+        trace: SearchTrace | None = None,
+    ) -> Tuple[List[str], Dict[str, float] | None, np.ndarray | None] | None:
+        """
+        Query terms, their weights (fuzzy expansions only) and the sorted
+        doc ids scoring is restricted to (None for all), or None if no
+        document can match.
+        """
+        parsed = None
+        if self.store_positions and has_syntax(query):
+            parsed = parse_query(query, lambda text: tokenize(normalize_text(text)))
+            q_tokens = parsed.tokens
+        else:
+            # 🔥 Normalize query too
+            query = normalize_text(query)
+            q_tokens = tokenize(query)
+        if trace is not None:
+            trace.lap("normalize")
+        term_weights = None
+        if fuzzy:
+            q_tokens, term_weights = self.expand_unknown(q_tokens)
+            if trace is not None:
+                trace.lap("fuzzy")
+        if trace is not None:
+            trace.count("query_terms", len(q_tokens))
+
+        allowed = None
+        if required_concepts:
+            allowed = self.docs_with_concepts(required_concepts)
+            if trace is not None:
+                trace.lap("concept_filter")
+            if not allowed.size:
+                return None
+        if parsed is not None and parsed.constrained:
+            allowed = self.docs_matching(parsed, allowed)
+            if trace is not None:
+                trace.lap("phrase_filter")
+            if not allowed.size:
+                return None
+        if trace is not None and allowed is not None:
+            trace.count("allowed", int(allowed.size))
+        return q_tokens, term_weights, allowed
+
+    def matching_docs(
+        self,
+        query: str,
+        required_concepts: Iterable[str] | None = None,
+        fuzzy: bool = False,
+    ) -> np.ndarray:
+        """
+        Sorted ids of every live document `score()` would rank for the
+        same arguments with an unlimited top k: those containing any
+        query term and passing the concept, phrase and NEAR filters.
+        """
+        plan = self._plan(query, required_concepts, fuzzy)
+        if plan is None:
+            return np.zeros(0, dtype=np.int64)
+        q_tokens, _, allowed = plan
+
+        mask = np.zeros(len(self.doc_ids), dtype=bool)
+        for term in set(q_tokens):
+            plist = self.inverted.get(term)
+            if plist is not None:
+                mask[posting_arrays(plist)[0]] = True
+        if allowed is not None:
+            keep = np.zeros_like(mask)
+            keep[allowed] = True
+            mask &= keep
+        deleted = self.deleted
+        if deleted:
+            mask[np.fromiter(deleted, dtype=np.int64, count=len(deleted))] = False
+        return np.flatnonzero(mask)
+
+    # ------------------------------------------------------------
+    # Typo tolerance
+    # ------------------------------------------------------------
+    def fuzzy_index(self) -> TrigramIndex:
+        """
+        Trigram index over the vocabulary, rebuilt when terms were added
+        or compacted away since it was built.
+        """
+        fuzzy = self._fuzzy
+        if fuzzy is None or len(fuzzy) != len(self.inverted):
+            with self._lock:
+                fuzzy = self._fuzzy = TrigramIndex(list(self.inverted))
+        return fuzzy
+
+    def expand_unknown(self, q_tokens: List[str]) -> Tuple[List[str], Dict[str, float]]:
+        """
+        Replace query terms missing from the vocabulary by their nearest
+        terms; returns the new tokens and each expansion's weight.
+        """
+        start = time.perf_counter()
+        tokens: List[str] = []
+        weights: Dict[str, float] = {}
+        expanded: Dict[str, List[Tuple[str, int]]] = {}
+        for term in q_tokens:
+            if term in self.inverted:
+                tokens.append(term)
+                continue
+            if term in expanded:
+                continue
+            found = nearest(self.fuzzy_index().neighbours(term), self.df, FUZZY_EXPANSIONS)
+            expanded[term] = found
+            for neighbour, dist in found:
+                if neighbour in q_tokens or neighbour in weights:
+                    continue
+                weights[neighbour] = FUZZY_PENALTY ** dist
+                tokens.append(neighbour)
+        self.last_expansion = {"ms": (time.perf_counter() - start) * 1e3, "expanded": expanded}
+        return tokens, weights
+
+    # ------------------------------------------------------------
+    # Phrase and proximity filtering
+    # ------------------------------------------------------------
+    def docs_matching(self, parsed: ParsedQuery, candidates: np.ndarray | None = None) -> np.ndarray:
+        """
+        Sorted ids of the documents (among `candidates`, if given) that
+        satisfy every phrase and NEAR pair of `parsed`.
+        """
+        lists: Dict[str, Tuple[PostingList, np.ndarray] | None] = {}
+
+        def lookup(term: str):
+            if term not in lists:
+                plist = self.inverted.get(term)
+                lists[term] = None if plist is None else (plist, posting_arrays(plist)[0])
+            return lists[term]
+
+        constraints = [(phrase, None, 0) for phrase in parsed.phrases] + list(parsed.near)
+        docs = candidates
+        for left, right, k in constraints:
+            terms = set(left) | set(right or ())
+            entries = {t: lookup(t) for t in terms}
+            if any(e is None for e in entries.values()):
+                return np.zeros(0, dtype=np.uint32)
+            for _, term_docs in sorted(entries.values(), key=lambda e: len(e[1])):
+                docs = term_docs if docs is None else np.intersect1d(docs, term_docs, assume_unique=True)
+                if not docs.size:
+                    return docs
+
+            rows = {t: np.searchsorted(term_docs, docs) for t, (_, term_docs) in entries.items()}
+            keep = np.zeros(docs.size, dtype=bool)
+            for i in range(docs.size):
+                pos = {t: entries[t][0].positions.get(int(rows[t][i])) for t in terms}
+                starts = phrase_starts([pos[t] for t in left])
+                if right is None:
+                    keep[i] = bool(starts)
+                elif starts:
+                    keep[i] = spans_near(starts, len(left), phrase_starts([pos[t] for t in right]), len(right), k)
+            docs = docs[keep]
+            if not docs.size:
+                return docs
+        return docs if docs is not None else np.zeros(0, dtype=np.uint32)
+
+    # ------------------------------------------------------------
+    # Document lookups
+    # ------------------------------------------------------------
+    def _doc_map(self) -> Dict[str, int]:
+        """
+        work_id -> live doc id. Maintained by every write; for a loaded
+        segment it is built from `doc_ids` on first use.
+        """
+        if self._doc_of is None:
+            deleted = self.deleted
+            self._doc_of = {
+                wid: doc_id
+                for doc_id, wid in enumerate(self.doc_ids)
+                if wid and doc_id not in deleted
+            }
+        return self._doc_of
+
+    def doc_id_of(self, work_id: str) -> int | None:
+        return self._doc_map().get(work_id)
 
     def get_doc_concepts(self, work_id: str) -> List[Tuple[str, float]]:
-        for doc_id, wid in self.doc_ids.items():
-            if wid == work_id:
-                return self.doc_concepts.get(doc_id, [])
-        return []
+        doc_id = self.doc_id_of(work_id)
+        if doc_id is None:
+            return []
+        return self.doc_concepts[doc_id]
+
+    def concept_boost(self, work_id: str, concepts: Iterable[str]) -> float:
+        """
+        Sum of `work_id`'s scores for the given concept ids.
+        """
+        doc_id = self.doc_id_of(work_id)
+        if doc_id is None:
+            return 0.0
+        return self.doc_concepts.concept_score(doc_id, set(self.doc_concepts.lookup(concepts)))
+
+    def concept_boosts(self, work_ids: Sequence[str], concepts: Iterable[str]) -> Dict[str, float]:
+        """
+        `concept_boost()` of every one of `work_ids`.
+        """
+        concepts = list(concepts)
+        return {work_id: self.concept_boost(work_id, concepts) for work_id in work_ids}
+
+    def docs_with_concepts(self, concepts: Iterable[str]) -> np.ndarray:
+        """
+        Sorted doc ids tagged with every one of `concepts` (tombstoned
+        docs included; scoring drops them).
+        """
+        store = self.doc_concepts
+        if store.inv_offsets is None:
+            with self._lock:
+                if store.inv_offsets is None:
+                    store._invert()
+        return store.docs_with_all(store.lookup(concepts))
+
+    def has_concepts(self, work_id: str, concepts: Iterable[str]) -> bool:
+        """
+        True if `work_id` is tagged with every one of `concepts`.
+        """
+        wanted = self.doc_concepts.lookup(concepts)
+        if not wanted:
+            return True
+        doc_id = self.doc_id_of(work_id)
+        if doc_id is None or -1 in wanted:
+            return False
+        return self.doc_concepts.has_all(doc_id, wanted)
+
+    def postings_nbytes(self) -> int:
+        """
+        Payload bytes used by all posting lists.
+        """
+        return sum(plist.nbytes() for plist in self.inverted.values())
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def save(self, path: str | Path) -> None:
+        """
+        Write the finalized index as a versioned segment directory (see segment.py).
+        """
+        with self._lock:
+            if self.deleted:
+                self.compact()
+            self._save(path)
+
+    def _save(self, path: str | Path) -> None:
+        terms = sorted(self.inverted, key=lambda t: t.encode("utf-8"))
+        writer = SegmentWriter(path, SEGMENT_KIND, SEGMENT_VERSION)
+        writer.write_strings("vocab", terms)
+
+        term_offsets = array("Q", [0])
+        term_blocks = array("Q", [0])
+        block_max = array("f")
+        if self.compress:
+            term_bytes = array("Q", [0])
+            block_last = array("I")
+            block_offsets = array("I")
+            packed = bytearray()
+        else:
+            post_docs = array("I")
+            post_tfs = array("I")
+        if self.store_positions:
+            pos_offsets = array("Q", [0])
+            pos_data = bytearray()
+
+        for term in terms:
+            plist = self.inverted[term]
+            if self.compress:
+                plist.compress()
+                packed += plist.packed
+                block_last.extend(plist.block_last)
+                block_offsets.extend(plist.block_offsets)
+                term_bytes.append(len(packed))
+            else:
+                for doc_id, tf in plist:
+                    post_docs.append(doc_id)
+                    post_tfs.append(tf)
+            if plist.bound_count != len(plist) or plist.bound_avg_len != self.avg_len:
+                self._compute_block_max(plist)
+            block_max.extend(plist.block_max)
+            term_offsets.append(term_offsets[-1] + len(plist))
+            term_blocks.append(len(block_max))
+            if self.store_positions:
+                _append_positions(plist.positions, pos_offsets, pos_data)
+
+        if self.compress:
+            writer.write_array("term_bytes", term_bytes)
+            writer.write_array("block_last", block_last)
+            writer.write_array("block_offsets", block_offsets)
+            writer.write_array("packed", array("B", packed))
+        else:
+            writer.write_array("post_docs", post_docs)
+            writer.write_array("post_tfs", post_tfs)
+        writer.write_array("term_blocks", term_blocks)
+        writer.write_array("block_max", block_max)
+        writer.write_array("term_offsets", term_offsets)
+        if self.store_positions:
+            writer.write_array("pos_offsets", pos_offsets)
+            writer.write_array("pos_data", array("B", pos_data))
+
+        writer.write_array("doc_len", self.doc_len)
+        writer.write_strings("doc_ids", self.doc_ids)
+        self.doc_concepts.write(writer)
+        writer.close(
+            k1=self.k1, b=self.b, N=self.N, avg_len=self.avg_len,
+            compress=self.compress, positions=self.store_positions,
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BM25Index":
+        """
+        Memory-map a segment written by `save()`. Postings, doc lengths,
+        doc ids and concepts are read lazily from the mapped files.
+        """
+        seg = SegmentReader(path, SEGMENT_KIND, SEGMENT_VERSION)
+        meta = seg.meta
+
+        index = cls(
+            k1=meta["k1"], b=meta["b"], compress=meta["compress"],
+            store_positions=meta.get("positions", False),
+        )
+        index.N = meta["N"]
+        index.avg_len = meta["avg_len"]
+
+        postings = _MappedPostings(seg, meta["compress"], meta["avg_len"])
+        index.inverted = postings
+        index.df = _MappedDf(postings)
+        index.doc_len = seg.array("doc_len")
+        index.doc_ids = seg.strings("doc_ids")
+        index.doc_concepts = ConceptStore.load(seg)
+        index._doc_of = None
+        index._segment = seg
+        return index
+
+
+def _append_positions(positions: TermPositions, offsets: array, data: bytearray) -> None:
+    """
+    Append one term's positions to segment-wide CSR arrays.
+    """
+    lo, hi = positions.span()
+    base = len(data)
+    data += positions.data[lo:hi]
+    term_offsets = np.asarray(positions.offsets[1:], dtype=np.uint64)
+    offsets.frombytes((term_offsets - np.uint64(lo) + np.uint64(base)).tobytes())
+
+
+def _merge_positions(parts: List[Tuple[np.ndarray, bytes]]) -> TermPositions:
+    """
+    Concatenate a term's positions from several shards, in shard order.
+    """
+    offsets = array("Q", [0])
+    data = bytearray()
+    for offs, raw in parts:
+        offsets.frombytes((offs[1:] - offs[0] + np.uint64(len(data))).tobytes())
+        data += raw
+    return TermPositions(offsets, data)
+
+
+class _ForwardIndex:
+    """
+    doc id -> ids of the terms it contains, used to update df when a
+    document is tombstoned. Built on first use by inverting the postings
+    (CSR rows), then extended as documents are added.
+    """
+
+    def __init__(self, terms: List[str], offsets: array, ids: array):
+        self.terms = terms
+        self.term_id = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.ids = ids
+
+    @classmethod
+    def from_postings(cls, inverted, n_docs: int) -> "_ForwardIndex":
+        terms = list(inverted)
+        doc_parts = [np.zeros(0, dtype=np.uint32)]
+        term_parts = [np.zeros(0, dtype=np.uint32)]
+        for i, term in enumerate(terms):
+            docs, _ = posting_arrays(inverted[term])
+            doc_parts.append(docs)
+            term_parts.append(np.full(docs.size, i, dtype=np.uint32))
+
+        docs = np.concatenate(doc_parts)
+        term_ids = np.concatenate(term_parts)[np.argsort(docs, kind="stable")]
+        offsets = np.zeros(n_docs + 1, dtype=np.uint64)
+        np.cumsum(np.bincount(docs, minlength=n_docs), out=offsets[1:])
+        return cls(terms, array("Q", offsets.tobytes()), array("I", term_ids.tobytes()))
+
+    def add(self, doc_id: int, terms) -> None:
+        if doc_id < len(self.offsets) - 1:
+            raise ValueError(f"doc id {doc_id} is already in the forward index")
+        while len(self.offsets) - 1 < doc_id:
+            self.offsets.append(self.offsets[-1])
+        for term in terms:
+            tid = self.term_id.get(term)
+            if tid is None:
+                tid = self.term_id[term] = len(self.terms)
+                self.terms.append(term)
+            self.ids.append(tid)
+        self.offsets.append(len(self.ids))
+
+    def terms_of(self, doc_id: int) -> List[str]:
+        if doc_id >= len(self.offsets) - 1:
+            return []
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        return [self.terms[tid] for tid in self.ids[start:end]]
+
+
+# ------------------------------------------------------------
+# Read-only views over a mapped segment
+# ------------------------------------------------------------
+class _MappedPostings(Mapping):
+    """
+    Term -> PostingList lookup over a mapped segment. Each lookup is a
+    binary search in the sorted vocabulary and builds a PostingList
+    over zero-copy slices of the mapped arrays.
+    """
+
+    def __init__(self, seg: SegmentReader, packed: bool, avg_len: float):
+        self.vocab = seg.strings("vocab")
+        self.offsets = seg.array("term_offsets")
+        self.term_blocks = seg.array("term_blocks")
+        self.block_max = seg.array("block_max")
+        self.avg_len = avg_len
+        self.packed = packed
+        if packed:
+            self.term_bytes = seg.array("term_bytes")
+            self.block_last = seg.array("block_last")
+            self.block_offsets = seg.array("block_offsets")
+            self.data = seg.array("packed")
+        else:
+            self.docs = seg.array("post_docs")
+            self.tfs = seg.array("post_tfs")
+        self.pos_offsets = seg.array("pos_offsets") if seg.has("pos_offsets") else None
+        self.pos_data = seg.array("pos_data") if self.pos_offsets is not None else None
+
+    def __getitem__(self, term: str) -> PostingList:
+        i = self.vocab.find(term)
+        if i < 0:
+            raise KeyError(term)
+        return self._posting_list(i)
+
+    def _posting_list(self, i: int) -> PostingList:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        b0, b1 = self.term_blocks[i], self.term_blocks[i + 1]
+        if self.packed:
+            plist = PostingList.from_packed(
+                self.data[self.term_bytes[i]:self.term_bytes[i + 1]],
+                self.block_last[b0:b1],
+                self.block_offsets[b0:b1],
+                end - start,
+            )
+        else:
+            plist = PostingList(self.docs[start:end], self.tfs[start:end])
+        plist.block_max = self.block_max[b0:b1]
+        plist.bound_count = end - start
+        plist.bound_avg_len = self.avg_len
+        if self.pos_offsets is not None:
+            plist.positions = TermPositions(self.pos_offsets[start:end + 1], self.pos_data)
+        return plist
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self.vocab.find(term) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.vocab)
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def values(self):
+        return (self._posting_list(i) for i in range(len(self.vocab)))
+
+
+class _MappedDf(Mapping):
+    """Document frequencies derived from posting list lengths."""
+
+    def __init__(self, postings: _MappedPostings):
+        self.postings = postings
+
+    def __getitem__(self, term: str) -> int:
+        i = self.postings.vocab.find(term)
+        if i < 0:
+            return 0
+        return self.postings.offsets[i + 1] - self.postings.offsets[i]
+
+    def __contains__(self, term: object) -> bool:
+        return term in self.postings
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.postings)
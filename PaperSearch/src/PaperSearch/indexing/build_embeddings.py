@@ -4,7 +4,12 @@ from .embedding_index import EmbeddingIndex
 from .canonical_index_builder import iter_canonical_docs
 from PaperSearch.src.PaperSearch.sql.db.connection import get_db
 
-def build_embedding_index(db_path: str):
+def build_embedding_index(db_path: str, batch_size: int = 64, chunk_size: int = 512):
+    """
+    Embed every canonical doc. Docs whose text, model and dtype are
+    unchanged since their vector was stored are skipped, so an
+    interrupted build can simply be run again.
+    """
     emb = EmbeddingIndex(db_path)
 
     # 1. Read all docs first (no writes yet)
@@ -14,7 +19,6 @@ def build_embedding_index(db_path: str):
             docs.append((work_id, text))
 
     # 2. Now write embeddings (no read cursor open)
-    for work_id, text in docs:
-        emb.add(work_id, text)
+    emb.add_many(docs, batch_size=batch_size, chunk_size=chunk_size)
 
     return emb
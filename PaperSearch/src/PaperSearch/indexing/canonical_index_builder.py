@@ -2,9 +2,20 @@
 
 import sqlite3
 import json
-from typing import Dict, Any, Iterable, Tuple
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Tuple
 
-from .bm25_index import BM25Index
+from PaperSearch.src.PaperSearch.sql.db.connection import MAX_IN_PARAMS
+from .autocomplete import TitleAutocomplete
+from .bm25_index import BM25Index, IndexShard
+from .facets import FacetColumns
+from .segment import MANIFEST_NAME
+
+# Title autocomplete segment, kept inside the BM25 segment directory.
+AUTOCOMPLETE_DIR = "autocomplete"
+FACETS_DIR = "facets"
 
 
 def inverted_index_to_text(inv_idx: Dict[str, list]) -> str:
@@ -43,8 +54,29 @@ def extract_concepts(md: Dict[str, Any]) -> list[tuple[str, float]]:
     return out
 
 
-def iter_canonical_docs(conn: sqlite3.Connection) -> Iterable[Tuple[str, str, list[tuple[str, float]]]]:
-    rows = conn.execute("SELECT work_id, title, openalex_metadata FROM normalized_works")
+def iter_canonical_docs(
+    conn: sqlite3.Connection,
+    work_ids: List[str] | None = None,
+    rowid_range: Tuple[int, int] | None = None,
+) -> Iterable[Tuple[str, str, list[tuple[str, float]]]]:
+    if rowid_range is not None:
+        rows = conn.execute(
+            "SELECT work_id, title, openalex_metadata FROM normalized_works "
+            "WHERE rowid >= ? AND rowid < ? ORDER BY rowid",
+            rowid_range,
+        )
+    elif work_ids is None:
+        rows = conn.execute("SELECT work_id, title, openalex_metadata FROM normalized_works")
+    else:
+        rows = (
+            row
+            for i in range(0, len(work_ids), MAX_IN_PARAMS)
+            for row in conn.execute(
+                "SELECT work_id, title, openalex_metadata FROM normalized_works WHERE work_id IN "
+                f"({','.join('?' for _ in work_ids[i:i + MAX_IN_PARAMS])})",
+                work_ids[i:i + MAX_IN_PARAMS],
+            )
+        )
     for row in rows:
         raw_md = row["openalex_metadata"] if "openalex_metadata" in row.keys() else None
         md = safe_load_metadata(raw_md)
@@ -57,11 +89,27 @@ def iter_canonical_docs(conn: sqlite3.Connection) -> Iterable[Tuple[str, str, li
         yield row["work_id"], text, concepts
 
 
-def build_canonical_bm25_index(db_path: str) -> BM25Index:
+def build_canonical_bm25_index(
+    db_path: str,
+    store_positions: bool = False,
+    parallel: bool = False,
+    workers: int | None = None,
+) -> BM25Index:
+    """
+    Build the BM25 index over `normalized_works`, serially by default.
+    `parallel=True` opts into indexing rowid ranges in a process pool of
+    `workers` (default: CPU count) and merging them, which gives the
+    same index but has only been measured slower so far (see
+    benchmarks/parallel_build.py). `store_positions` enables phrase and
+    NEAR queries.
+    """
+    if parallel:
+        return _build_parallel(db_path, workers or os.cpu_count() or 1, store_positions)
+
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
 
-    index = BM25Index()
+    index = BM25Index(store_positions=store_positions)
     doc_id = 0
 
     for work_id, text, concepts in iter_canonical_docs(conn):
@@ -72,3 +120,190 @@ def build_canonical_bm25_index(db_path: str) -> BM25Index:
     index.finalize()
     conn.close()
     return index
+
+
+# ------------------------------------------------------------
+# Parallel build
+# ------------------------------------------------------------
+SHARDS_PER_WORKER = 4
+
+
+def rowid_ranges(db_path: str, n_ranges: int) -> List[Tuple[int, int]]:
+    """
+    Split the rowids of `normalized_works` into `n_ranges` half-open
+    ranges of roughly equal row count, in rowid order.
+    """
+    conn = sqlite3.connect(db_path)
+    lo, hi, count = conn.execute(
+        "SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM normalized_works"
+    ).fetchone()
+    if not count:
+        conn.close()
+        return []
+
+    bounds = [lo]
+    step = count / n_ranges
+    for i in range(1, n_ranges):
+        row = conn.execute(
+            "SELECT rowid FROM normalized_works ORDER BY rowid LIMIT 1 OFFSET ?",
+            (int(i * step),),
+        ).fetchone()
+        if row[0] > bounds[-1]:
+            bounds.append(row[0])
+    conn.close()
+    bounds.append(hi + 1)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _build_shard(db_path: str, rowid_range: Tuple[int, int], store_positions: bool = False) -> IndexShard:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    index = BM25Index(store_positions=store_positions)
+    doc_id = 0
+    for work_id, text, concepts in iter_canonical_docs(conn, rowid_range=rowid_range):
+        if text.strip():
+            index.add_document(doc_id, work_id, text, concepts=concepts)
+            doc_id += 1
+
+    conn.close()
+    return index.to_shard()
+
+
+def _build_parallel(db_path: str, workers: int, store_positions: bool = False) -> BM25Index:
+    ranges = rowid_ranges(db_path, workers * SHARDS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = pool.map(
+            _build_shard, [db_path] * len(ranges), ranges, [store_positions] * len(ranges)
+        )
+        index = BM25Index.from_shards(shards)
+    index.finalize()
+    return index
+
+
+def refresh_canonical_bm25_index(index: BM25Index, db_path: str, work_ids: List[str]) -> None:
+    """
+    Bring `work_ids` in `index` up to date with `normalized_works`:
+    rows with text are upserted, missing or empty ones are deleted.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    seen = set()
+    for work_id, text, concepts in iter_canonical_docs(conn, work_ids):
+        if text.strip():
+            index.upsert_document(work_id, text, concepts=concepts)
+            seen.add(work_id)
+
+    for work_id in work_ids:
+        if work_id not in seen:
+            index.delete_document(work_id)
+
+    conn.close()
+
+
+def load_canonical_bm25_index(
+    db_path: str, segment_path: str, rebuild: bool = False, store_positions: bool = False
+) -> BM25Index:
+    """
+    Memory-map the BM25 segment at `segment_path`, building and saving it
+    from `db_path` first if it does not exist yet (or `rebuild` is set).
+    """
+    if rebuild or not Path(segment_path, MANIFEST_NAME).exists():
+        build_canonical_bm25_index(db_path, store_positions=store_positions).save(segment_path)
+        build_title_autocomplete(db_path).save(Path(segment_path, AUTOCOMPLETE_DIR))
+        index = BM25Index.load(segment_path)
+        build_facets(db_path, index).save(Path(segment_path, FACETS_DIR))
+        return index
+    return BM25Index.load(segment_path)
+
+
+# ------------------------------------------------------------
+# Title autocomplete
+# ------------------------------------------------------------
+def iter_title_citations(conn: sqlite3.Connection) -> Iterable[Tuple[str, str, int]]:
+    """
+    (work_id, title, cited_by_count) for every titled work. The count is
+    read with json_extract, so abstracts are never parsed in Python.
+    """
+    rows = conn.execute(
+        "SELECT work_id, title, "
+        "CASE WHEN json_valid(openalex_metadata) "
+        "THEN json_extract(openalex_metadata, '$.cited_by_count') END "
+        "FROM normalized_works WHERE title IS NOT NULL AND title != ''"
+    )
+    for work_id, title, cites in rows:
+        yield work_id, title, cites if isinstance(cites, int) else 0
+
+
+def build_title_autocomplete(db_path: str) -> TitleAutocomplete:
+    conn = sqlite3.connect(db_path)
+    index = TitleAutocomplete.build(iter_title_citations(conn))
+    conn.close()
+    return index
+
+
+def load_title_autocomplete(db_path: str, segment_path: str, rebuild: bool = False) -> TitleAutocomplete:
+    """
+    Memory-map the title autocomplete stored with the BM25 segment at
+    `segment_path`, building it from `db_path` first if needed.
+    """
+    path = Path(segment_path, AUTOCOMPLETE_DIR)
+    if rebuild or not Path(path, MANIFEST_NAME).exists():
+        build_title_autocomplete(db_path).save(path)
+    return TitleAutocomplete.load(path)
+
+
+# ------------------------------------------------------------
+# Facets
+# ------------------------------------------------------------
+def iter_facet_values(conn: sqlite3.Connection) -> Iterable[Tuple[str, int | None, str | None]]:
+    """
+    (work_id, year, venue) for every work. The year falls back to
+    `publication_year` in the metadata when the column is empty; both
+    metadata fields are read with json_extract.
+    """
+    rows = conn.execute(
+        "SELECT work_id, year, "
+        "CASE WHEN json_valid(openalex_metadata) "
+        "THEN json_extract(openalex_metadata, '$.publication_year') END, "
+        "CASE WHEN json_valid(openalex_metadata) "
+        "THEN json_extract(openalex_metadata, '$.primary_location.source.display_name') END "
+        "FROM normalized_works"
+    )
+    for work_id, year, md_year, venue in rows:
+        if not isinstance(year, int):
+            year = md_year if isinstance(md_year, int) else None
+        yield work_id, year, venue if isinstance(venue, str) else None
+
+
+def concept_labels(conn: sqlite3.Connection) -> Dict[str, str]:
+    """
+    OpenAlex concept id -> display name, over every work's concepts.
+    """
+    rows = conn.execute(
+        "SELECT DISTINCT json_extract(c.value, '$.id'), json_extract(c.value, '$.display_name') "
+        "FROM normalized_works, json_each("
+        "CASE WHEN json_valid(openalex_metadata) THEN openalex_metadata ELSE '{}' END, '$.concepts'"
+        ") AS c"
+    )
+    return {cid: name for cid, name in rows if isinstance(cid, str) and isinstance(name, str)}
+
+
+def build_facets(db_path: str, index: BM25Index) -> FacetColumns:
+    conn = sqlite3.connect(db_path)
+    facets = FacetColumns.build(index, iter_facet_values(conn), concept_labels(conn))
+    conn.close()
+    return facets
+
+
+def load_facets(db_path: str, segment_path: str, index: BM25Index, rebuild: bool = False) -> FacetColumns:
+    """
+    Memory-map the facet columns stored with the BM25 segment at
+    `segment_path` (loaded as `index`), building them from `db_path`
+    first if needed.
+    """
+    path = Path(segment_path, FACETS_DIR)
+    if rebuild or not Path(path, MANIFEST_NAME).exists():
+        build_facets(db_path, index).save(path)
+    return FacetColumns.load(path)
@@ -0,0 +1,305 @@
+# concepts.py
+
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .segment import SegmentReader, SegmentWriter
+
+_NO_ROW: Tuple[Tuple[int, ...], Tuple[float, ...]] = ((), ())
+
+
+def _as_numpy(buf, dtype) -> np.ndarray:
+    # Growable arrays are copied: exporting their buffer would make a
+    # concurrent append fail.
+    if isinstance(buf, array):
+        return np.frombuffer(buf.tobytes(), dtype=dtype)
+    return np.frombuffer(buf, dtype=dtype)
+
+
+class ConceptStore:
+    """
+    Per-document concept lists in CSR form. Row `doc_id` spans
+    offsets[doc_id]:offsets[doc_id + 1] of the parallel `cids` (uint32
+    interned concept ids) and `scores` (float32) arrays; concept names
+    are stored once in `names`.
+
+    Rows are appended in doc id order. Rewriting an existing row (a doc
+    id added twice, or blanked by compaction) is rare and is kept in
+    `patched` until the store is next written out.
+
+    Appends fill cids/scores before publishing the row offset, so readers
+    on other threads never see a partial row.
+
+    The store also answers the inverse question, which documents carry a
+    concept (`docs_with` / `docs_with_all`), from concept posting lists:
+    sorted doc ids per interned concept, in CSR form. They are built on
+    first use (or mapped from a segment) and cover the first `inv_rows`
+    rows; later appends go to per-concept `tail` arrays, and patched rows
+    are corrected for at query time.
+    """
+
+    def __init__(self):
+        self.names: Sequence[str] = []
+        self._ids: Dict[str, int] | None = {}
+        self.offsets: Sequence[int] = array("Q", [0])
+        self.cids: Sequence[int] = array("I")
+        self.scores: Sequence[float] = array("f")
+        self.patched: Dict[int, Tuple[Sequence[int], Sequence[float]]] = {}
+
+        self.inv_offsets: Sequence[int] | None = None
+        self.inv_docs: Sequence[int] = array("I")
+        self.inv_rows = 0
+        self.tail: Dict[int, array] = {}
+        self._patch_index: Tuple[int, np.ndarray, Dict[int, List[int]]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, doc_id: int) -> List[Tuple[str, float]]:
+        cids, scores = self.row(doc_id)
+        names = self.names
+        return [(names[cid], score) for cid, score in zip(cids, scores)]
+
+    # -----------------------------
+    # Interning
+    # -----------------------------
+    def _name_ids(self) -> Dict[str, int]:
+        if self._ids is None:
+            self._ids = {name: cid for cid, name in enumerate(self.names)}
+        return self._ids
+
+    def intern(self, name: str) -> int:
+        ids = self._name_ids()
+        cid = ids.get(name)
+        if cid is None:
+            cid = ids[name] = len(self.names)
+            self.names.append(name)
+        return cid
+
+    def lookup(self, names: Iterable[str]) -> List[int]:
+        """
+        Interned ids of `names`; -1 for names no document has.
+        """
+        ids = self._name_ids()
+        return [ids.get(name, -1) for name in names]
+
+    # -----------------------------
+    # Rows
+    # -----------------------------
+    def row(self, doc_id: int) -> Tuple[Sequence[int], Sequence[float]]:
+        """
+        Interned concept ids and scores of `doc_id`.
+        """
+        patch = self.patched.get(doc_id)
+        if patch is not None:
+            return patch
+        if doc_id + 1 >= len(self.offsets):
+            return _NO_ROW
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        return self.cids[start:end], self.scores[start:end]
+
+    def set(self, doc_id: int, concepts: Iterable[Tuple[str, float]]) -> None:
+        """
+        Store the concepts of `doc_id`, padding skipped doc ids with
+        empty rows.
+        """
+        cids = array("I")
+        scores = array("f")
+        for name, score in concepts:
+            cids.append(self.intern(name))
+            scores.append(score)
+
+        if doc_id < len(self):
+            self.patched[doc_id] = (cids, scores)
+            self._patch_index = None
+            return
+
+        end = self.offsets[-1]
+        self.cids.extend(cids)
+        self.scores.extend(scores)
+        self.offsets.extend([end] * (doc_id - len(self)))
+        self.offsets.append(end + len(cids))
+        if self.inv_offsets is not None:
+            for cid in cids:
+                docs = self.tail.setdefault(cid, array("I"))
+                if not docs or docs[-1] != doc_id:
+                    docs.append(doc_id)
+
+    def extend(
+        self,
+        names: Sequence[str],
+        offsets: Sequence[int],
+        cids: Sequence[int],
+        scores: Sequence[float],
+    ) -> None:
+        """
+        Append the rows of another store, given as its `flat()` arrays,
+        re-interning its concept ids.
+        """
+        remap = np.array([self.intern(name) for name in names], dtype=np.uint32)
+        offsets = _as_numpy(offsets, np.uint64)
+        cids = _as_numpy(cids, np.uint32)
+        end = self.offsets[-1]
+        self.cids.frombytes(remap[cids].tobytes())
+        self.scores.frombytes(_as_numpy(scores, np.float32).tobytes())
+        self.offsets.frombytes((offsets[1:] + np.uint64(end)).tobytes())
+        if self.inv_offsets is not None:
+            self._invert()
+
+    def flat(self) -> Tuple[Sequence[str], Sequence[int], Sequence[int], Sequence[float]]:
+        """
+        names, offsets, cids and scores with patched rows written back in.
+        """
+        offsets, cids, scores = self.offsets, self.cids, self.scores
+        if self.patched:
+            offsets, cids, scores = array("Q", [0]), array("I"), array("f")
+            for doc_id in range(len(self)):
+                row_cids, row_scores = self.row(doc_id)
+                cids.extend(row_cids)
+                scores.extend(row_scores)
+                offsets.append(len(cids))
+        return self.names, offsets, cids, scores
+
+    def concept_score(self, doc_id: int, cids: Iterable[int]) -> float:
+        """
+        Sum of the doc's scores for the interned concepts in `cids`.
+        """
+        wanted = cids if isinstance(cids, (set, frozenset)) else set(cids)
+        doc_cids, doc_scores = self.row(doc_id)
+        return sum(s for c, s in zip(doc_cids, doc_scores) if c in wanted)
+
+    def has_all(self, doc_id: int, cids: Iterable[int]) -> bool:
+        doc_cids = set(self.row(doc_id)[0])
+        return all(c in doc_cids for c in cids)
+
+    # -----------------------------
+    # Concept -> documents
+    # -----------------------------
+    def _invert(self) -> None:
+        """
+        Build the concept posting lists from the CSR rows.
+        """
+        rows = len(self)
+        offsets = _as_numpy(self.offsets, np.uint64)[:rows + 1]
+        cids = _as_numpy(self.cids, np.uint32)[:int(offsets[-1])]
+        docs = np.repeat(np.arange(rows, dtype=np.uint64), np.diff(offsets).astype(np.int64))
+        # One sort orders entries by (concept, doc) and drops concepts a
+        # doc lists twice.
+        keys = np.unique((cids.astype(np.uint64) << np.uint64(32)) | docs)
+        inv_cids = (keys >> np.uint64(32)).astype(np.int64)
+        inv_offsets = np.zeros(len(self.names) + 1, dtype=np.uint64)
+        np.cumsum(np.bincount(inv_cids, minlength=len(self.names)), out=inv_offsets[1:])
+
+        self.inv_docs = array("I", (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32).tobytes())
+        self.tail = {}
+        self.inv_rows = rows
+        self.inv_offsets = array("Q", inv_offsets.tobytes())
+
+    def _patches(self) -> Tuple[np.ndarray, Dict[int, List[int]]]:
+        """
+        Ids of patched docs and, per concept, the patched docs that now
+        carry it. Rebuilt after every patch.
+        """
+        cached = self._patch_index
+        if cached is None or cached[0] != len(self.patched):
+            by_cid: Dict[int, List[int]] = {}
+            for doc_id, (cids, _) in list(self.patched.items()):
+                for cid in set(cids):
+                    by_cid.setdefault(cid, []).append(doc_id)
+            ids = np.array(sorted(self.patched), dtype=np.uint32)
+            cached = self._patch_index = (len(self.patched), ids, by_cid)
+        return cached[1], cached[2]
+
+    def docs_with(self, cid: int) -> np.ndarray:
+        """
+        Sorted ids of the documents tagged with interned concept `cid`.
+        """
+        if self.inv_offsets is None:
+            self._invert()
+        if cid < 0:
+            return np.zeros(0, dtype=np.uint32)
+
+        parts = []
+        if cid + 1 < len(self.inv_offsets):
+            start, end = self.inv_offsets[cid], self.inv_offsets[cid + 1]
+            parts.append(_as_numpy(self.inv_docs[start:end], np.uint32))
+        tail = self.tail.get(cid)
+        if tail:
+            parts.append(_as_numpy(tail, np.uint32))
+        docs = np.concatenate(parts) if len(parts) > 1 else parts[0] if parts else np.zeros(0, dtype=np.uint32)
+
+        if self.patched:
+            patched_ids, by_cid = self._patches()
+            docs = docs[~np.isin(docs, patched_ids)]
+            if cid in by_cid:
+                docs = np.union1d(docs, np.array(by_cid[cid], dtype=np.uint32))
+        return docs
+
+    def docs_with_all(self, cids: Sequence[int]) -> np.ndarray:
+        """
+        Sorted ids of the documents tagged with every concept in `cids`,
+        intersecting the shortest lists first.
+        """
+        if not cids:
+            raise ValueError("docs_with_all needs at least one concept")
+        lists = sorted((self.docs_with(cid) for cid in set(cids)), key=len)
+        docs = lists[0]
+        for other in lists[1:]:
+            if not docs.size:
+                break
+            docs = np.intersect1d(docs, other, assume_unique=True)
+        return docs
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def write(self, writer: SegmentWriter) -> None:
+        _, offsets, cids, scores = self.flat()
+        written = ConceptStore()
+        written.names = self.names
+        written.offsets, written.cids = offsets, cids
+        written._invert()
+
+        writer.write_strings("concept_names", self.names)
+        writer.write_array("concept_offsets", array("Q", offsets))
+        writer.write_array("concept_cids", array("I", cids))
+        writer.write_array("concept_scores", array("f", scores))
+        writer.write_array("concept_postings.offsets", written.inv_offsets)
+        writer.write_array("concept_postings", written.inv_docs)
+
+    @classmethod
+    def load(cls, seg: SegmentReader) -> "ConceptStore":
+        """
+        Map a store written by `write()`. The name -> id table is built
+        on first lookup.
+        """
+        store = cls()
+        store.names = seg.strings("concept_names")
+        store._ids = None
+        store.offsets = seg.array("concept_offsets")
+        store.cids = seg.array("concept_cids")
+        store.scores = seg.array("concept_scores")
+        store.inv_offsets = seg.array("concept_postings.offsets")
+        store.inv_docs = seg.array("concept_postings")
+        store.inv_rows = len(store)
+        return store
+
+    def thaw(self) -> "ConceptStore":
+        """
+        In-memory, appendable copy of a mapped store.
+        """
+        store = ConceptStore()
+        store.names = list(self.names)
+        store._ids = None
+        store.offsets = array("Q", self.offsets)
+        store.cids = array("I", self.cids)
+        store.scores = array("f", self.scores)
+        store.patched = dict(self.patched)
+        if self.inv_offsets is not None:
+            store.inv_offsets = array("Q", self.inv_offsets)
+            store.inv_docs = array("I", self.inv_docs)
+            store.inv_rows = self.inv_rows
+            store.tail = {cid: array("I", docs) for cid, docs in self.tail.items()}
+        return store
@@ -1,41 +1,450 @@
 # embedding_index.py
 
+import hashlib
 import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from PaperSearch.src.PaperSearch.sql.db.connection import MAX_IN_PARAMS
+from .ann import IVFIndex
+from .quantization import (
+    check_dtype,
+    decode_blobs,
+    decode_vector,
+    dequantize_rows,
+    quantize_rows,
+    score_all,
+    score_rows,
+)
+from .segment import SegmentReader, SegmentWriter
+
+SEGMENT_KIND = "embeddings"
+SEGMENT_VERSION = 1
+
+# Rows decoded at a time when loading the matrix from the table.
+LOAD_CHUNK = 10_000
+
+# array typecodes for matrix segments; float16 is stored as its bits.
+MATRIX_TYPECODES = {"float32": "f", "float16": "H", "int8": "b"}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key form of a query: surrounding and repeated whitespace
+    removed. Case is kept, since the model sees it.
+    """
+    return " ".join(text.split())
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of query vectors keyed by (model_name, normalized
+    query text), with hit/miss counters. Safe to share between threads
+    and between indexes; cached vectors are read-only.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Tuple[str, str], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, str]) -> np.ndarray | None:
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key: Tuple[str, str], vec: np.ndarray) -> None:
+        if self.maxsize <= 0:
+            return
+        vec.setflags(write=False)
+        with self._lock:
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    """
+    Scale rows to unit length in place; all-zero rows stay zero.
+    """
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    vecs /= norms
+    return vecs
+
 
 class EmbeddingIndex:
-    def __init__(self, db_path: str, model_name: str = "sentence-transformers/all-mpnet-base-v2"):
+    """
+    Document embeddings stored in the `embeddings` table.
+
+    The SentenceTransformer model is imported and loaded on first use,
+    so processes that only read stored vectors never pay for it. Query
+    vectors from `encode()` are kept in a `QueryCache`.
+
+    For reranking, `load_matrix()` makes every vector resident as one
+    contiguous matrix of unit rows with a work_id -> row map, so
+    `similarities()` scores a whole candidate list with one gather and
+    one matrix-vector product. The matrix can be saved as a segment and
+    memory-mapped by other processes.
+
+    Vectors are stored as float32, float16 or int8 with a per-vector
+    scale (`dtype`); each row records its own dtype, so `get()` decodes
+    rows written in any mode. The resident matrix can be quantized the
+    same way, independently of the storage mode.
+
+    `knn()` retrieves the nearest documents to a query by embedding
+    alone: approximately through an IVF index (`build_ann()` /
+    `load_ann()`), or exactly over the resident matrix.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        model_name: str = "sentence-transformers/all-mpnet-base-v2",
+        dtype: str = "float32",
+        query_cache: QueryCache | None = None,
+    ):
         self.db_path = db_path
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.dtype = check_dtype(dtype)
+        self.query_cache = query_cache if query_cache is not None else QueryCache()
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        self.matrix: np.ndarray | None = None
+        self.scales: np.ndarray | None = None
+        self.work_ids: Sequence[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.ann: IVFIndex | None = None
 
         with sqlite3.connect(db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS embeddings (
                     work_id TEXT PRIMARY KEY,
-                    vector BLOB
+                    vector BLOB,
+                    text_hash TEXT,
+                    dtype TEXT,
+                    scale REAL,
+                    model TEXT
                 )
             """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+            for name, decl in (("text_hash", "TEXT"), ("dtype", "TEXT"), ("scale", "REAL"), ("model", "TEXT")):
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE embeddings ADD COLUMN {name} {decl}")
 
-    def encode(self, text: str) -> np.ndarray:
-        return self.model.encode(text, convert_to_numpy=True)
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(self, text: str, stats: Dict[str, int] | None = None) -> np.ndarray:
+        """
+        Embed a query, served from the query cache when the same text
+        (up to whitespace) was encoded before. If `stats` is given, the
+        lookup is added to its "query_cache_hits" or "query_cache_misses".
+        """
+        key = (self.model_name, normalize_query(text))
+        vec = self.query_cache.get(key)
+        if stats is not None:
+            outcome = "query_cache_misses" if vec is None else "query_cache_hits"
+            stats[outcome] = stats.get(outcome, 0) + 1
+        if vec is None:
+            vec = np.asarray(self.model.encode(key[1], convert_to_numpy=True), dtype=np.float32)
+            self.query_cache.put(key, vec)
+        return vec
 
     def add(self, work_id: str, text: str):
-        vec = self.encode(text)
-        blob = vec.tobytes()
+        self.add_many([(work_id, text)], skip_unchanged=False)
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "REPLACE INTO embeddings (work_id, vector) VALUES (?, ?)",
-                (work_id, blob)
+    def add_many(
+        self,
+        docs: Iterable[Tuple[str, str]],
+        batch_size: int = 64,
+        chunk_size: int = 512,
+        skip_unchanged: bool = True,
+    ) -> int:
+        """
+        Embed (work_id, text) pairs in bulk. Docs are taken `chunk_size`
+        at a time; each chunk is encoded in model batches of `batch_size`
+        and written with one executemany in its own transaction, so an
+        interrupted run keeps every finished chunk. With `skip_unchanged`,
+        docs whose stored vector was computed from the same text (by
+        hash) with the same model and storage dtype are not re-encoded,
+        which makes re-running a build resume where it stopped. Returns
+        the number of docs embedded.
+        """
+        embedded = 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            chunk: List[Tuple[str, str]] = []
+            for doc in docs:
+                chunk.append(doc)
+                if len(chunk) >= chunk_size:
+                    embedded += self._add_chunk(conn, chunk, batch_size, skip_unchanged)
+                    chunk = []
+            if chunk:
+                embedded += self._add_chunk(conn, chunk, batch_size, skip_unchanged)
+        finally:
+            conn.close()
+        return embedded
+
+    def _add_chunk(
+        self,
+        conn: sqlite3.Connection,
+        chunk: List[Tuple[str, str]],
+        batch_size: int,
+        skip_unchanged: bool,
+    ) -> int:
+        hashes = {work_id: text_hash(text) for work_id, text in chunk}
+        if skip_unchanged:
+            ids = list(hashes)
+            stored: Dict[str, Tuple[str, str, str]] = {}
+            for start in range(0, len(ids), MAX_IN_PARAMS):
+                part = ids[start:start + MAX_IN_PARAMS]
+                placeholders = ",".join("?" for _ in part)
+                for wid, h, dtype, model in conn.execute(
+                    f"SELECT work_id, text_hash, dtype, model FROM embeddings WHERE work_id IN ({placeholders})",
+                    part,
+                ):
+                    stored[wid] = (h, dtype, model)
+            chunk = [
+                (wid, text) for wid, text in chunk
+                if stored.get(wid) != (hashes[wid], self.dtype, self.model_name)
+            ]
+        if not chunk:
+            return 0
+
+        vecs = self.model.encode(
+            [text for _, text in chunk],
+            batch_size=batch_size,
+            convert_to_numpy=True,
+        ).astype(np.float32, copy=False)
+        codes, scales = quantize_rows(vecs, self.dtype)
+
+        with conn:
+            conn.executemany(
+                "REPLACE INTO embeddings (work_id, vector, text_hash, dtype, scale, model) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        wid, codes[i].tobytes(), hashes[wid], self.dtype,
+                        None if scales is None else float(scales[i]), self.model_name,
+                    )
+                    for i, (wid, _) in enumerate(chunk)
+                ],
             )
+        return len(chunk)
 
     def get(self, work_id: str) -> np.ndarray | None:
         with sqlite3.connect(self.db_path) as conn:
-            row = conn.execute("SELECT vector FROM embeddings WHERE work_id = ?", (work_id,)).fetchone()
+            row = conn.execute(
+                "SELECT vector, dtype, scale FROM embeddings WHERE work_id = ?", (work_id,)
+            ).fetchone()
         if not row:
             return None
-        return np.frombuffer(row[0], dtype=np.float32)
+        return decode_vector(*row)
 
     def cosine_similarity(self, q_vec: np.ndarray, d_vec: np.ndarray) -> float:
         return float(np.dot(q_vec, d_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(d_vec)))
+
+    def similarities(self, q_vec: np.ndarray, work_ids: Sequence[str]) -> np.ndarray:
+        """
+        Cosine similarity of `q_vec` to each of `work_ids`, NaN where no
+        vector is stored. Uses the resident matrix when loaded, otherwise
+        fetches the vectors with bulk queries.
+        """
+        q = np.asarray(q_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1)
+        out = np.full(len(work_ids), np.nan, dtype=np.float32)
+
+        if self.matrix is not None:
+            rows = np.fromiter(
+                (self.row_of.get(wid, -1) for wid in work_ids), dtype=np.int64, count=len(work_ids)
+            )
+            found = rows >= 0
+            out[found] = score_rows(self.matrix, self.scales, rows[found], q)
+            return out
+
+        vecs = self._fetch_many(work_ids)
+        found = [i for i, wid in enumerate(work_ids) if wid in vecs]
+        if found:
+            mat = normalize_rows(np.stack([vecs[work_ids[i]] for i in found]).astype(np.float32))
+            out[found] = mat @ q
+        return out
+
+    def _fetch_many(self, work_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        vecs: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(work_ids))
+        with sqlite3.connect(self.db_path) as conn:
+            for start in range(0, len(unique), MAX_IN_PARAMS):
+                part = unique[start:start + MAX_IN_PARAMS]
+                placeholders = ",".join("?" for _ in part)
+                for wid, blob, dtype, scale in conn.execute(
+                    f"SELECT work_id, vector, dtype, scale FROM embeddings WHERE work_id IN ({placeholders})",
+                    part,
+                ):
+                    vecs[wid] = decode_vector(blob, dtype, scale)
+        return vecs
+
+    # ------------------------------------------------------------
+    # Resident matrix
+    # ------------------------------------------------------------
+    def load_matrix(self, path: str | Path | None = None, dtype: str | None = None) -> None:
+        """
+        Load every stored vector into `matrix` as unit rows of `dtype`
+        (default: the storage dtype); int8 rows come with per-row
+        `scales`. With `path`, memory-map a matrix written by
+        `save_matrix()` instead of reading the table, in the dtype it
+        was saved with. Vectors added afterwards are not seen until the
+        matrix is loaded again.
+        """
+        scales = None
+        if path is not None:
+            seg = SegmentReader(path, SEGMENT_KIND, SEGMENT_VERSION)
+            dim = seg.meta["dim"]
+            work_ids = seg.strings("work_ids")
+            np_dtype = np.dtype(seg.meta.get("dtype", "float32"))
+            matrix = np.frombuffer(seg.array("matrix"), dtype=np_dtype).reshape(-1, dim)
+            if seg.has("scales"):
+                scales = np.frombuffer(seg.array("scales"), dtype=np.float32)
+        else:
+            work_ids, matrix, scales = self._read_matrix(check_dtype(dtype or self.dtype))
+
+        self.work_ids = work_ids
+        self.row_of = {wid: i for i, wid in enumerate(work_ids)}
+        self.matrix = matrix
+        self.scales = scales
+
+    def _read_matrix(self, dtype: str) -> Tuple[List[str], np.ndarray, np.ndarray | None]:
+        """
+        Decode the table `LOAD_CHUNK` rows at a time, so a quantized
+        matrix is built without a float32 copy of the whole corpus.
+        """
+        work_ids: List[str] = []
+        parts = []
+        scale_parts = []
+        with sqlite3.connect(self.db_path) as conn:
+            cur = conn.execute("SELECT work_id, vector, dtype, scale FROM embeddings ORDER BY work_id")
+            while True:
+                rows = cur.fetchmany(LOAD_CHUNK)
+                if not rows:
+                    break
+                dim = len(decode_vector(*rows[0][1:]))
+                block = decode_blobs([r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows], dim)
+                codes, block_scales = quantize_rows(normalize_rows(block), dtype)
+                work_ids.extend(r[0] for r in rows)
+                parts.append(codes)
+                if block_scales is not None:
+                    scale_parts.append(block_scales)
+
+        if not parts:
+            return work_ids, np.zeros((0, 0), dtype=np.dtype(dtype)), None
+        matrix = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        scales = np.concatenate(scale_parts) if scale_parts else None
+        return work_ids, matrix, scales
+
+    def save_matrix(self, path: str | Path) -> None:
+        """
+        Write the resident matrix as a segment directory.
+        """
+        if self.matrix is None:
+            self.load_matrix()
+        dtype = self.matrix.dtype.name
+        values = array(MATRIX_TYPECODES[dtype])
+        values.frombytes(np.ascontiguousarray(self.matrix).tobytes())
+
+        writer = SegmentWriter(path, SEGMENT_KIND, SEGMENT_VERSION)
+        writer.write_array("matrix", values)
+        if self.scales is not None:
+            scales = array("f")
+            scales.frombytes(np.ascontiguousarray(self.scales, dtype=np.float32).tobytes())
+            writer.write_array("scales", scales)
+        writer.write_strings("work_ids", self.work_ids)
+        writer.close(dim=self.matrix.shape[1], rows=self.matrix.shape[0], dtype=dtype)
+
+    # ------------------------------------------------------------
+    # Nearest-neighbour search
+    # ------------------------------------------------------------
+    def build_ann(self, path: str | Path | None = None, n_lists: int | None = None, **kwargs) -> IVFIndex:
+        """
+        Build an IVF index over the resident matrix (loading it first if
+        needed) and use it for `knn()`. With `path`, also save it. The
+        index keeps float32 vectors whatever the matrix dtype.
+        """
+        if self.matrix is None:
+            self.load_matrix()
+        matrix = self.matrix
+        if matrix.dtype != np.float32:
+            matrix = dequantize_rows(matrix, self.scales)
+        self.ann = IVFIndex.build(matrix, self.work_ids, n_lists=n_lists, **kwargs)
+        if path is not None:
+            self.ann.save(path)
+        return self.ann
+
+    def load_ann(self, path: str | Path) -> None:
+        self.ann = IVFIndex.load(path)
+
+    def knn(
+        self,
+        query: str | np.ndarray,
+        k: int = 10,
+        nprobe: int = 8,
+        exact: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """
+        The `k` documents most similar to `query` (text or vector), as
+        (work_id, cosine) pairs, best first. Uses the IVF index when one
+        is loaded, probing `nprobe` lists: more lists, higher recall and
+        latency. With `exact`, or without an index, scans every vector.
+        """
+        q = self.encode(query) if isinstance(query, str) else query
+        q = np.asarray(q, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1)
+
+        if self.ann is not None and not exact:
+            rows, scores = self.ann.search(q, k, nprobe)
+            labels = self.ann.labels
+            return [(labels[int(r)], float(s)) for r, s in zip(rows, scores)]
+
+        if self.matrix is None:
+            self.load_matrix()
+        if not len(self.matrix):
+            return []
+        scores = score_all(self.matrix, self.scales, q)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.work_ids[int(r)], float(scores[r])) for r in top]
@@ -0,0 +1,171 @@
+# facets.py
+
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .segment import SegmentReader, SegmentWriter
+
+SEGMENT_KIND = "facets"
+SEGMENT_VERSION = 1
+
+# Years outside int16 are treated as unknown, like a missing year (0).
+_YEAR_RANGE = (1, np.iinfo(np.int16).max)
+
+
+def _to_array(values: np.ndarray, typecode: str) -> array:
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values).tobytes())
+    return out
+
+
+def _top(counts: np.ndarray, limit: int) -> np.ndarray:
+    """
+    Ids of the `limit` largest non-zero counts, largest first, ties by id.
+    """
+    ids = np.flatnonzero(counts)
+    if ids.size > limit:
+        ids = ids[np.argpartition(-counts[ids], limit - 1)[:limit]]
+    return ids[np.lexsort((ids, -counts[ids]))]
+
+
+class FacetColumns:
+    """
+    Per-document facet values aligned with a BM25Index's doc ids:
+
+    - `years`: int16 publication year, 0 if unknown
+    - `venues`: uint32 id into `venue_names`, 0 (the empty name) if unknown
+    - `concept_offsets` / `concept_ids`: CSR rows of ids into
+      `concept_names` (OpenAlex ids), with `concept_labels` for display
+
+    `counts()` builds histograms for any set of doc ids with bincount,
+    without touching the database. Documents added to the BM25 index
+    after the columns were built have no facet values until they are
+    rebuilt.
+    """
+
+    def __init__(
+        self,
+        years: np.ndarray,
+        venues: np.ndarray,
+        venue_names: Sequence[str],
+        concept_offsets: np.ndarray,
+        concept_ids: np.ndarray,
+        concept_names: Sequence[str],
+        concept_labels: Sequence[str],
+    ):
+        self.years = years
+        self.venues = venues
+        self.venue_names = venue_names
+        self.concept_offsets = concept_offsets
+        self.concept_ids = concept_ids
+        self.concept_names = concept_names
+        self.concept_labels = concept_labels
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    @classmethod
+    def build(
+        cls,
+        index,
+        values: Iterable[Tuple[str, int | None, str | None]],
+        labels: Dict[str, str] | None = None,
+    ) -> "FacetColumns":
+        """
+        Columns for the documents of BM25Index `index` from (work_id,
+        year, venue) rows; rows for works not in the index are ignored.
+        Concepts come from the index's own concept store; `labels` maps
+        concept ids to display names.
+        """
+        n_docs = len(index.doc_ids)
+        years = np.zeros(n_docs, dtype=np.int16)
+        venues = np.zeros(n_docs, dtype=np.uint32)
+        venue_ids: Dict[str, int] = {"": 0}
+        for work_id, year, venue in values:
+            doc_id = index.doc_id_of(work_id)
+            if doc_id is None:
+                continue
+            if isinstance(year, int) and _YEAR_RANGE[0] <= year <= _YEAR_RANGE[1]:
+                years[doc_id] = year
+            if venue:
+                venues[doc_id] = venue_ids.setdefault(venue, len(venue_ids))
+
+        names, offsets, cids, _ = index.doc_concepts.flat()
+        concept_offsets = np.frombuffer(array("Q", offsets).tobytes(), dtype=np.uint64)[:n_docs + 1]
+        concept_ids = np.frombuffer(array("I", cids).tobytes(), dtype=np.uint32)
+        labels = labels or {}
+        return cls(
+            years, venues, list(venue_ids),
+            concept_offsets, concept_ids, list(names), [labels.get(name, "") for name in names],
+        )
+
+    # -----------------------------
+    # Counting
+    # -----------------------------
+    def counts(self, docs: np.ndarray, limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Facet histograms over doc ids `docs`: every known year in order,
+        and the `limit` most frequent venues and concepts.
+        """
+        docs = np.asarray(docs, dtype=np.int64)
+        docs = docs[docs < len(self.years)]
+
+        years = np.bincount(self.years[docs], minlength=1)
+        years[0] = 0
+        year_ids = np.flatnonzero(years)
+
+        venues = np.bincount(self.venues[docs], minlength=len(self.venue_names))
+        venues[0] = 0
+
+        starts = self.concept_offsets[docs].astype(np.int64)
+        lens = self.concept_offsets[docs + 1].astype(np.int64) - starts
+        firsts = np.cumsum(lens) - lens
+        entries = np.arange(int(lens.sum())) + np.repeat(starts - firsts, lens)
+        concepts = np.bincount(self.concept_ids[entries], minlength=len(self.concept_names))
+
+        return {
+            "year": [{"value": int(y), "count": int(years[y])} for y in year_ids],
+            "venue": [
+                {"value": self.venue_names[v], "count": int(venues[v])} for v in _top(venues, limit)
+            ],
+            "concept": [
+                {"value": self.concept_names[c], "label": self.concept_labels[c], "count": int(concepts[c])}
+                for c in _top(concepts, limit)
+            ],
+        }
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, path: str | Path) -> None:
+        writer = SegmentWriter(path, SEGMENT_KIND, SEGMENT_VERSION)
+        writer.write_array("years", _to_array(self.years, "h"))
+        writer.write_array("venues", _to_array(self.venues, "I"))
+        writer.write_strings("venue_names", self.venue_names)
+        writer.write_array("concept_offsets", _to_array(self.concept_offsets, "Q"))
+        writer.write_array("concept_ids", _to_array(self.concept_ids, "I"))
+        writer.write_strings("concept_names", self.concept_names)
+        writer.write_strings("concept_labels", self.concept_labels)
+        writer.close(documents=len(self.years))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FacetColumns":
+        """
+        Memory-map columns written by `save()`.
+        """
+        seg = SegmentReader(path, SEGMENT_KIND, SEGMENT_VERSION)
+        return cls(
+            np.frombuffer(seg.array("years"), dtype=np.int16),
+            np.frombuffer(seg.array("venues"), dtype=np.uint32),
+            seg.strings("venue_names"),
+            np.frombuffer(seg.array("concept_offsets"), dtype=np.uint64),
+            np.frombuffer(seg.array("concept_ids"), dtype=np.uint32),
+            seg.strings("concept_names"),
+            seg.strings("concept_labels"),
+        )
@@ -0,0 +1,280 @@
+# fts_index.py
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from PaperSearch.src.PaperSearch.sql.db.connection import MAX_IN_PARAMS
+from .bm25_index import tokenize
+from .canonical_index_builder import extract_concepts, inverted_index_to_text, safe_load_metadata
+from .instrumentation import SearchTrace
+from .normalizer import normalize_text
+
+FTS_TABLE = "works_fts"
+PENDING_TABLE = "works_fts_pending"
+
+# Rows inserted per executemany while building or syncing.
+INSERT_BATCH = 5_000
+
+_SCHEMA = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(body, concepts, tokenize = 'unicode61');
+INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(1.0, 0.0)');
+CREATE TABLE {PENDING_TABLE} (id INTEGER PRIMARY KEY);
+
+CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON normalized_works BEGIN
+    INSERT OR IGNORE INTO {PENDING_TABLE}(id) VALUES (NEW.id);
+END;
+CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF id, title, openalex_metadata ON normalized_works BEGIN
+    INSERT OR IGNORE INTO {PENDING_TABLE}(id) VALUES (OLD.id);
+    INSERT OR IGNORE INTO {PENDING_TABLE}(id) VALUES (NEW.id);
+END;
+CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON normalized_works BEGIN
+    INSERT OR IGNORE INTO {PENDING_TABLE}(id) VALUES (OLD.id);
+END;
+"""
+
+_DROP = f"""
+DROP TRIGGER IF EXISTS {FTS_TABLE}_ai;
+DROP TRIGGER IF EXISTS {FTS_TABLE}_au;
+DROP TRIGGER IF EXISTS {FTS_TABLE}_ad;
+DROP TABLE IF EXISTS {PENDING_TABLE};
+DROP TABLE IF EXISTS {FTS_TABLE};
+"""
+
+
+def fts_text(text: str) -> str:
+    """
+    `text` as BM25Index indexes it: normalized, then split into
+    [a-z0-9]+ tokens, so FTS5 sees exactly the same terms.
+    """
+    return " ".join(tokenize(normalize_text(text)))
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def iter_fts_rows(conn: sqlite3.Connection, ids: Sequence[int] | None = None) -> Iterator[Tuple[int, str, str]]:
+    """
+    (id, body, concepts) for the normalized_works rows with text; the
+    body is the title plus reconstructed abstract, as in
+    `iter_canonical_docs`.
+    """
+    sql = "SELECT id, title, openalex_metadata FROM normalized_works"
+    if ids is None:
+        rows = conn.execute(sql)
+    else:
+        rows = conn.execute(f"{sql} WHERE id IN ({','.join('?' for _ in ids)})", list(ids))
+    for row_id, title, raw_md in rows:
+        md = safe_load_metadata(raw_md)
+        abstract = inverted_index_to_text(md.get("abstract_inverted_index") or {})
+        text = " ".join(filter(None, [title, abstract]))
+        if text.strip():
+            yield row_id, fts_text(text), " ".join(cid for cid, _ in extract_concepts(md))
+
+
+class FTS5Index:
+    """
+    BM25 retrieval with SQLite FTS5, stored in the works database itself
+    next to `normalized_works`, as an alternative to BM25Index that needs
+    no per-process build or segment.
+
+    FTS rows share their rowid with `normalized_works.id`. Triggers on
+    normalized_works record changed ids in `works_fts_pending`; the
+    synonym normalizer runs in Python, so the rows themselves are
+    rewritten by `sync()`. Writers therefore need nothing registered on
+    their connections, but whoever ingests must call `sync()` (like
+    `refresh_canonical_bm25_index` for BM25Index): queries read over a
+    read-only connection and never take the write lock, so rows changed
+    since the last sync are served in their old form (`pending()` counts
+    them).
+
+    `score()` follows BM25Index.score: same terms, same "any term
+    matches" semantics and concept filter, but FTS5's bm25() uses k1=1.2
+    and an idf without the +1, so rankings differ slightly.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        """
+        This thread's read-only connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = self._local.conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+        return conn
+
+    # -----------------------------
+    # Build / sync
+    # -----------------------------
+    @classmethod
+    def build(cls, db_path: str) -> "FTS5Index":
+        """
+        (Re)create the FTS table and its triggers in `db_path` and index
+        every row of normalized_works.
+        """
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.executescript(_DROP + _SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        _insert(conn, iter_fts_rows(conn))
+        conn.execute("COMMIT")
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        conn.close()
+        return cls(db_path)
+
+    def pending(self) -> int:
+        """
+        Rows changed since the last `sync()`, not yet searchable as changed.
+        """
+        return self._conn().execute(f"SELECT COUNT(*) FROM {PENDING_TABLE}").fetchone()[0]
+
+    def sync(self) -> int:
+        """
+        Re-index the rows changed since the last sync, on a writer
+        connection of its own. Run it after ingesting; queries do not.
+        Returns how many ids were processed.
+        """
+        if not self.pending():
+            return 0
+        with self._sync_lock:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    ids = [row[0] for row in conn.execute(f"SELECT id FROM {PENDING_TABLE}")]
+                    for i in range(0, len(ids), MAX_IN_PARAMS):
+                        chunk = ids[i:i + MAX_IN_PARAMS]
+                        conn.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = ?", ((row_id,) for row_id in chunk))
+                        _insert(conn, iter_fts_rows(conn, chunk))
+                    conn.execute(f"DELETE FROM {PENDING_TABLE}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.close()
+        return len(ids)
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def score(
+        self,
+        query: str,
+        top_k: int = 20,
+        required_concepts: Iterable[str] | None = None,
+        fuzzy: bool = False,
+        trace: SearchTrace | None = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank works for `query` as (work_id, score), best first. With
+        `required_concepts`, only works tagged with all of them match.
+        Read-only: rows changed since the last `sync()` are matched in
+        their old form. A `trace` gets the "normalize" and "bm25" (FTS5
+        query) times; FTS5 does not report postings or candidates.
+        """
+        if fuzzy:
+            raise ValueError("fuzzy matching is only supported by BM25Index")
+        q_tokens = tokenize(normalize_text(query))
+        if trace is not None:
+            trace.lap("normalize")
+            trace.count("query_terms", len(q_tokens))
+            trace.details["method"] = "fts5"
+        if not q_tokens or top_k <= 0:
+            return []
+        # Repeated terms are repeated phrases, which bm25() counts twice
+        # like BM25Index does.
+        match = "body : (" + " OR ".join(_quote(t) for t in q_tokens) + ")"
+        for concept in required_concepts or ():
+            match += " AND concepts : " + _quote(concept)
+
+        rows = self._conn().execute(
+            f"SELECT w.work_id, -f.rank FROM "
+            f"(SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY rank LIMIT ?) AS f "
+            f"JOIN normalized_works AS w ON w.id = f.rowid ORDER BY f.rank",
+            (match, top_k),
+        )
+        hits = [(work_id, score) for work_id, score in rows]
+        if trace is not None:
+            trace.lap("bm25")
+            trace.count("hits", len(hits))
+        return hits
+
+    def score_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 20,
+        required_concepts: Iterable[str] | None = None,
+        fuzzy: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        `score()` for every query; FTS5 evaluates one MATCH at a time, so
+        only repeated queries are shared.
+        """
+        required_concepts = list(required_concepts or ())
+        ranked = {q: self.score(q, top_k, required_concepts, fuzzy) for q in dict.fromkeys(queries)}
+        return [ranked[q] for q in queries]
+
+    def _concepts(self, work_ids: Sequence[str]) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Concepts of each of `work_ids` that exists, read with bulk IN
+        queries.
+        """
+        out: Dict[str, List[Tuple[str, float]]] = {}
+        unique = list(dict.fromkeys(work_ids))
+        conn = self._conn()
+        for start in range(0, len(unique), MAX_IN_PARAMS):
+            part = unique[start:start + MAX_IN_PARAMS]
+            for work_id, raw_md in conn.execute(
+                "SELECT work_id, openalex_metadata FROM normalized_works "
+                f"WHERE work_id IN ({','.join('?' for _ in part)})",
+                part,
+            ):
+                out.setdefault(work_id, extract_concepts(safe_load_metadata(raw_md)))
+        return out
+
+    def concept_boost(self, work_id: str, concepts: Iterable[str]) -> float:
+        """
+        Sum of `work_id`'s scores for the given concept ids.
+        """
+        return self.concept_boosts([work_id], concepts)[work_id]
+
+    def concept_boosts(self, work_ids: Sequence[str], concepts: Iterable[str]) -> Dict[str, float]:
+        """
+        `concept_boost()` of every one of `work_ids`, in one pass over
+        the database.
+        """
+        wanted = set(concepts)
+        tagged = self._concepts(work_ids) if wanted else {}
+        return {
+            work_id: sum(score for cid, score in tagged.get(work_id, ()) if cid in wanted)
+            for work_id in work_ids
+        }
+
+    def has_concepts(self, work_id: str, concepts: Iterable[str]) -> bool:
+        """
+        True if `work_id` is tagged with every one of `concepts`.
+        """
+        return set(concepts) <= {cid for cid, _ in self._concepts([work_id]).get(work_id, ())}
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _insert(conn: sqlite3.Connection, rows: Iterable[Tuple[int, str, str]]) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            conn.executemany(f"INSERT INTO {FTS_TABLE}(rowid, body, concepts) VALUES (?, ?, ?)", batch)
+            batch = []
+    conn.executemany(f"INSERT INTO {FTS_TABLE}(rowid, body, concepts) VALUES (?, ?, ?)", batch)
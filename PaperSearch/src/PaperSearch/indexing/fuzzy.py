@@ -0,0 +1,158 @@
+# fuzzy.py
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Words are padded so their first and last characters get trigrams of
+# their own: "net" -> "$$n", "$ne", "net", "et$", "t$$".
+PAD = "$$"
+
+
+def trigrams(word: str) -> List[str]:
+    padded = f"{PAD}{word}{PAD}"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def fuzziness(word: str) -> int:
+    """
+    Edit distance allowed for `word`: none up to 2 characters, 1 up to
+    7, 2 beyond. Two edits leave too little of a shorter word to tell a
+    typo from a different word.
+    """
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def bounded_edit_distance(a: str, b: str, max_dist: int) -> int:
+    """
+    Edit distance between `a` and `b` counting insertions, deletions,
+    substitutions and swaps of adjacent characters (optimal string
+    alignment), or `max_dist + 1` as soon as it is known to exceed
+    `max_dist`. Only the diagonal band of width 2 * max_dist + 1 is
+    computed.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    over = max_dist + 1
+    before: List[int] = []
+    prev = [min(j, over) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - max_dist), min(len(b), i + max_dist)
+        cur = [over] * (len(b) + 1)
+        cur[0] = i if i <= max_dist else over
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, before[j - 2] + 1)
+            cur[j] = d
+        if min(cur[max(0, lo - 1):hi + 1]) > max_dist and min(prev[max(0, lo - 1):hi + 1]) > max_dist:
+            return over
+        before, prev = prev, cur
+    return min(prev[len(b)], over)
+
+
+class TrigramIndex:
+    """
+    Character-trigram index over a vocabulary, for finding the terms
+    within a small edit distance of a word that is not in it.
+
+    `gram_offsets` / `gram_terms` list, per distinct trigram, the ids of
+    the terms containing it (CSR). An insertion, deletion or
+    substitution changes at most three trigrams on either side and a
+    swap four, so a term within distance d shares at least
+    max(|trigrams(word)|, |trigrams(term)|) - 3d of them, or - 4d if
+    some edit is a swap, which leaves the length alone. Only terms
+    passing this count and length filter are verified with
+    `bounded_edit_distance`.
+
+    Candidates must also start with the word's first character, which
+    misspellings rarely change. Terms are sorted, so those form one id
+    range, and a lookup reads only that range of the posting lists of
+    the word's own trigrams.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms: List[str] = sorted(terms)
+        self.lengths = np.fromiter((len(t) for t in self.terms), dtype=np.int32, count=len(self.terms))
+        self.gram_counts = np.zeros(len(self.terms), dtype=np.int32)
+
+        grams: Dict[str, int] = {}
+        gram_ids: List[int] = []
+        term_ids: List[int] = []
+        for term_id, term in enumerate(self.terms):
+            distinct = set(trigrams(term))
+            self.gram_counts[term_id] = len(distinct)
+            for gram in distinct:
+                gram_ids.append(grams.setdefault(gram, len(grams)))
+                term_ids.append(term_id)
+
+        gram_ids_np = np.array(gram_ids, dtype=np.uint32)
+        order = np.argsort(gram_ids_np, kind="stable")
+        self.gram_terms = np.array(term_ids, dtype=np.uint32)[order]
+        counts = np.bincount(gram_ids_np, minlength=len(grams))
+        self.gram_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.grams = grams
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def candidates(self, word: str, max_dist: int) -> np.ndarray:
+        """
+        Ids of the terms passing the trigram count and length filters.
+        """
+        grams = set(trigrams(word))
+        lo = bisect_left(self.terms, word[:1])
+        hi = bisect_left(self.terms, chr(ord(word[0]) + 1), lo) if word else lo
+        parts = []
+        for g in grams:
+            r = self.grams.get(g)
+            if r is not None:
+                posting = self.gram_terms[self.gram_offsets[r]:self.gram_offsets[r + 1]]
+                start, end = np.searchsorted(posting, (lo, hi))
+                parts.append(posting[start:end])
+        if not parts:
+            return np.zeros(0, dtype=np.uint32)
+        ids, shared = np.unique(np.concatenate(parts), return_counts=True)
+        most = np.maximum(self.gram_counts[ids], len(grams))
+        length_diff = np.abs(self.lengths[ids] - len(word))
+        keep = (shared >= most - 3 * max_dist) & (length_diff <= max_dist)
+        keep |= (shared >= most - 4 * max_dist) & (length_diff < max_dist)
+        return ids[keep]
+
+    def neighbours(self, word: str, max_dist: int | None = None) -> List[Tuple[str, int]]:
+        """
+        Terms within `max_dist` edits of `word` (default `fuzziness`),
+        as (term, distance), closest first.
+        """
+        if max_dist is None:
+            max_dist = fuzziness(word)
+        if max_dist <= 0:
+            return []
+        out = []
+        for term_id in self.candidates(word, max_dist):
+            term = self.terms[term_id]
+            dist = bounded_edit_distance(word, term, max_dist)
+            if dist <= max_dist:
+                out.append((term, dist))
+        out.sort(key=lambda td: (td[1], td[0]))
+        return out
+
+
+def nearest(neighbours: Sequence[Tuple[str, int]], df: Dict[str, int] | None, limit: int) -> List[Tuple[str, int]]:
+    """
+    Up to `limit` of the closest `neighbours` (all at the smallest
+    distance found), most frequent first when `df` is given.
+    """
+    live = [(t, d) for t, d in neighbours if df is None or df.get(t, 0) > 0]
+    if not live:
+        return []
+    best = live[0][1]
+    closest = [(t, d) for t, d in live if d == best]
+    if df is not None:
+        closest.sort(key=lambda td: -df.get(td[0], 0))
+    return closest[:limit]
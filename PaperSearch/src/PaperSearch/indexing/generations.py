@@ -0,0 +1,270 @@
+# generations.py
+#
+# Immutable index generations with an atomically switched CURRENT
+# pointer:
+#
+#   <root>/
+#       CURRENT                 name of the generation readers should use
+#       gen-000001/
+#           generation.json     number, creation time, components
+#           bm25/               BM25 segment (with autocomplete/ and facets/)
+#           embeddings/         embedding matrix segment (optional)
+#           ann/                IVF index segment (optional)
+#       gen-000002/ ...
+#       .staging-*/             generations being built
+#       .trash-*/               generations being deleted
+#
+#   python -m PaperSearch.src.PaperSearch.indexing.generations --root data/index/generations \
+#       build --db data/db/papers.db
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .canonical_index_builder import load_canonical_bm25_index
+from .embedding_index import EmbeddingIndex
+
+CURRENT_NAME = "CURRENT"
+GENERATION_MANIFEST = "generation.json"
+PREFIX = "gen-"
+STAGING_PREFIX = ".staging-"
+TRASH_PREFIX = ".trash-"
+
+BM25_DIR = "bm25"
+EMBEDDINGS_DIR = "embeddings"
+ANN_DIR = "ann"
+COMPONENTS = (BM25_DIR, EMBEDDINGS_DIR, ANN_DIR)
+
+# Generations kept by gc() besides the current and pinned ones, so a bad
+# build can be rolled back.
+KEEP = 2
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class GenerationStore:
+    """
+    A directory of index generations. A generation is built in a staging
+    directory, renamed into place by `commit()` and never modified
+    afterwards; `publish()` switches the CURRENT pointer to it by
+    replacing one small file, so readers see either the old or the new
+    generation, never a mix.
+
+    Pins are counted per process: `gc()` never removes the current
+    generation, a pinned one or the `keep` newest. Run it in the process
+    serving queries (the search service does after every swap); other
+    processes rely on the `keep` window.
+    """
+
+    def __init__(self, root: str | Path, keep: int = KEEP):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self._pins: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Listing
+    # -----------------------------
+    def generations(self) -> List[str]:
+        """
+        Committed generations, oldest first.
+        """
+        return sorted(
+            p.name for p in self.root.iterdir()
+            if p.name.startswith(PREFIX) and (p / GENERATION_MANIFEST).exists()
+        )
+
+    def current(self) -> str | None:
+        try:
+            name = (self.root / CURRENT_NAME).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return name or None
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def manifest(self, name: str) -> Dict[str, Any]:
+        with open(self.path(name) / GENERATION_MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def stage(self) -> Path:
+        """
+        A fresh directory to build the next generation in.
+        """
+        return Path(tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=self.root))
+
+    def commit(self, staging: str | Path, publish: bool = True, **meta: Any) -> str:
+        """
+        Turn `staging` into the next generation and, with `publish`, make
+        it current. Returns its name.
+        """
+        staging = Path(staging)
+        manifest = {
+            "created_at": time.time(),
+            "components": [c for c in COMPONENTS if (staging / c).is_dir()],
+            "meta": meta,
+        }
+        if BM25_DIR not in manifest["components"]:
+            raise ValueError(f"{staging} has no {BM25_DIR}/ segment")
+
+        while True:
+            existing = [int(p.name[len(PREFIX):]) for p in self.root.glob(f"{PREFIX}*") if p.name[len(PREFIX):].isdigit()]
+            number = max(existing, default=0) + 1
+            name = f"{PREFIX}{number:06d}"
+            _write_atomic(staging / GENERATION_MANIFEST, json.dumps({"generation": number, **manifest}, indent=2))
+            try:
+                os.rename(staging, self.path(name))
+                break
+            except OSError:
+                # Another builder took the number first.
+                if not self.path(name).exists():
+                    raise
+        if publish:
+            self.publish(name)
+        return name
+
+    def publish(self, name: str) -> None:
+        if not (self.path(name) / GENERATION_MANIFEST).exists():
+            raise ValueError(f"no committed generation {name!r} in {self.root}")
+        _write_atomic(self.root / CURRENT_NAME, name)
+
+    def rollback(self) -> str:
+        """
+        Make the generation before the current one current again.
+        """
+        names = self.generations()
+        current = self.current()
+        older = [n for n in names if current is None or n < current]
+        if not older:
+            raise ValueError(f"no generation older than {current!r} to roll back to")
+        self.publish(older[-1])
+        return older[-1]
+
+    # -----------------------------
+    # Pins and garbage collection
+    # -----------------------------
+    def pin(self, name: str) -> None:
+        with self._lock:
+            self._pins[name] += 1
+
+    def unpin(self, name: str) -> int:
+        """
+        Release one pin; returns how many are left.
+        """
+        with self._lock:
+            self._pins[name] -= 1
+            left = self._pins[name]
+            if left <= 0:
+                del self._pins[name]
+            return max(left, 0)
+
+    def gc(self) -> List[str]:
+        """
+        Remove unpinned generations outside the `keep` newest, other than
+        the current one. A generation that cannot be removed yet (files
+        still mapped on Windows) is left for the next call.
+        """
+        names = self.generations()
+        current = self.current()
+        removed = []
+        for name in names[:max(len(names) - self.keep, 0)]:
+            with self._lock:
+                if name == current or self._pins[name] > 0:
+                    continue
+            # Renamed out of the way first, so a half-deleted generation
+            # is never listed.
+            try:
+                os.rename(self.path(name), self.root / f"{TRASH_PREFIX}{name}")
+            except OSError:
+                continue
+            removed.append(name)
+        for trash in self.root.glob(f"{TRASH_PREFIX}*"):
+            shutil.rmtree(trash, ignore_errors=True)
+        return removed
+
+
+def build_generation(
+    db_path: str,
+    store: GenerationStore,
+    store_positions: bool = False,
+    embeddings: bool = False,
+    ann: bool = False,
+    publish: bool = True,
+) -> str:
+    """
+    Build a complete generation from `db_path`: the BM25 segment with its
+    concept store, title autocomplete and facet columns and, with
+    `embeddings`, the embedding matrix (plus an IVF index with `ann`).
+    Nothing becomes visible to readers until it is committed.
+    """
+    staging = store.stage()
+    try:
+        index = load_canonical_bm25_index(db_path, str(staging / BM25_DIR), store_positions=store_positions)
+        if embeddings:
+            emb = EmbeddingIndex(db_path)
+            emb.load_matrix()
+            emb.save_matrix(staging / EMBEDDINGS_DIR)
+            if ann:
+                emb.build_ann(staging / ANN_DIR)
+        return store.commit(staging, publish=publish, documents=index.N, store_positions=store_positions)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and manage PaperSearch index generations.")
+    parser.add_argument("--root", required=True, help="generation store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build a generation from the database and publish it")
+    build.add_argument("--db", required=True)
+    build.add_argument("--positions", action="store_true", help="store positions for phrase queries")
+    build.add_argument("--embeddings", action="store_true", help="include the embedding matrix")
+    build.add_argument("--ann", action="store_true", help="include an IVF index (implies --embeddings)")
+    build.add_argument("--no-publish", action="store_true")
+    sub.add_parser("list")
+    publish = sub.add_parser("publish")
+    publish.add_argument("name")
+    sub.add_parser("rollback")
+    sub.add_parser("gc")
+    args = parser.parse_args(argv)
+
+    store = GenerationStore(args.root)
+    if args.command == "build":
+        print(build_generation(
+            args.db, store, store_positions=args.positions, embeddings=args.embeddings or args.ann,
+            ann=args.ann, publish=not args.no_publish,
+        ))
+    elif args.command == "list":
+        current = store.current()
+        for name in store.generations():
+            print(f"{'*' if name == current else ' '} {name} {json.dumps(store.manifest(name)['meta'])}")
+    elif args.command == "publish":
+        store.publish(args.name)
+    elif args.command == "rollback":
+        print(store.rollback())
+    elif args.command == "gc":
+        print("\n".join(store.gc()))
+
+
+if __name__ == "__main__":
+    main()
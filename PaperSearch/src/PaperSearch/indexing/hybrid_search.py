@@ -1,46 +1,126 @@
 # hybrid_search.py
 
-from PaperSearch.src.PaperSearch.sql.db.connection import get_db
+import math
+import sqlite3
+from typing import Any, Dict, List, Sequence
+
+from PaperSearch.src.PaperSearch.sql.db.connection import MAX_IN_PARAMS, get_db
+from .instrumentation import SearchTrace
+
+DISPLAY_FIELDS = ("title", "authors", "year", "doi")
+
 
 class HybridSearch:
+    """
+    BM25 candidates reranked by embedding similarity and concept boost.
+
+    Only the final top_k results are hydrated with display metadata,
+    from the in-memory columns if `load_metadata()` was called, else with
+    one bulk query. `last_timings` holds the per-stage breakdown of the
+    most recent search, in milliseconds; pass a SearchTrace to `search()`
+    for the counters as well.
+    """
+
     def __init__(self, bm25, emb_index, db_path: str):
         self.bm25 = bm25
         self.emb = emb_index
         self.db_path = db_path
 
+        self.metadata: Dict[str, Dict[str, Any]] | None = None
+        self.metadata_fields: Sequence[str] = ()
+        self.last_timings: Dict[str, float] = {}
+
     def get_title(self, work_id: str) -> str:
-        with get_db(self.db_path) as conn:
-            row = conn.execute(
-                "SELECT title FROM normalized_works WHERE work_id = ?",
-                (work_id,)
-            ).fetchone()
+        row = self.fetch_metadata([work_id], ("title",)).get(work_id)
         return row["title"] if row else ""
 
-    def search(self, query, top_k=20, alpha=1.0, boosted_concepts=None):
-        bm25_results = self.bm25.score(query, top_k=300)
-        q_vec = self.emb.encode(query)
+    def load_metadata(self, fields: Sequence[str] = DISPLAY_FIELDS) -> None:
+        """
+        Keep `fields` of every normalized work in memory, so searches
+        hydrate results without touching the database.
+        """
+        columns = ", ".join(fields)
+        with get_db(self.db_path) as conn:
+            rows = conn.execute(
+                f"SELECT work_id, {columns} FROM normalized_works WHERE work_id IS NOT NULL"
+            ).fetchall()
+        self.metadata = {row["work_id"]: {f: row[f] for f in fields} for row in rows}
+        self.metadata_fields = tuple(fields)
 
-        reranked = []
-        for work_id, bm25_score in bm25_results:
-            d_vec = self.emb.get(work_id)
-            if d_vec is None:
-                continue
+    def fetch_metadata(
+        self,
+        work_ids: Sequence[str],
+        fields: Sequence[str] = DISPLAY_FIELDS,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        `fields` of each of `work_ids` that exists, keyed by work_id.
+        Served from memory when loaded with those fields, otherwise read
+        with bulk IN queries on a single connection.
+        """
+        if self.metadata is not None and set(fields) <= set(self.metadata_fields):
+            return {
+                wid: {f: self.metadata[wid][f] for f in fields}
+                for wid in work_ids
+                if wid in self.metadata
+            }
 
-            emb_score = self.emb.cosine_similarity(q_vec, d_vec)
+        out: Dict[str, Dict[str, Any]] = {}
+        unique = list(dict.fromkeys(work_ids))
+        columns = ", ".join(fields)
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for start in range(0, len(unique), MAX_IN_PARAMS):
+                part = unique[start:start + MAX_IN_PARAMS]
+                placeholders = ",".join("?" for _ in part)
+                for row in conn.execute(
+                    f"SELECT work_id, {columns} FROM normalized_works WHERE work_id IN ({placeholders})",
+                    part,
+                ):
+                    out.setdefault(row["work_id"], {f: row[f] for f in fields})
+        finally:
+            conn.close()
+        return out
 
-            concept_boost = 1.0
-            if boosted_concepts:
-                doc_concepts = self.bm25.get_doc_concepts(work_id)
-                for cid, score in doc_concepts:
-                    if cid in boosted_concepts:
-                        concept_boost += score
+    def search(self, query, top_k=20, alpha=1.0, boosted_concepts=None, trace: SearchTrace | None = None):
+        """
+        Stages: "normalize" and "bm25" (plus the BM25 index's filter
+        stages), "encode", "similarity", "combine" and "hydrate".
+        """
+        if trace is None:
+            trace = SearchTrace()
+
+        bm25_results = self.bm25.score(query, top_k=300, trace=trace)
+        q_vec = self.emb.encode(query, stats=trace.counters)
+        trace.lap("encode")
+        emb_scores = self.emb.similarities(q_vec, [work_id for work_id, _ in bm25_results])
+        trace.lap("similarity")
+
+        boosts = {}
+        if boosted_concepts:
+            boosts = self.bm25.concept_boosts([work_id for work_id, _ in bm25_results], boosted_concepts)
+        scored: List[tuple] = []
+        for (work_id, bm25_score), emb_score in zip(bm25_results, emb_scores):
+            if math.isnan(emb_score):
+                continue
+            emb_score = float(emb_score)
+
+            concept_boost = 1.0 + boosts.get(work_id, 0.0)
 
             final_score = bm25_score + alpha * emb_score + concept_boost
-            title = self.get_title(work_id)
+            scored.append((work_id, final_score, bm25_score, emb_score, concept_boost))
+
+        scored.sort(key=lambda x: x[1], reverse=True)
+        scored = scored[:top_k]
+        trace.lap("combine")
 
-            reranked.append(
-                (work_id, title, final_score, bm25_score, emb_score, concept_boost)
-            )
+        meta = self.fetch_metadata([s[0] for s in scored], ("title",))
+        reranked = [
+            (work_id, meta.get(work_id, {}).get("title", ""), final_score, bm25_score, emb_score, concept_boost)
+            for work_id, final_score, bm25_score, emb_score, concept_boost in scored
+        ]
+        trace.lap("hydrate")
+        trace.count("results", len(reranked))
 
-        reranked.sort(key=lambda x: x[2], reverse=True)
-        return reranked[:top_k]
+        self.last_timings = trace.timings()
+        return reranked
@@ -0,0 +1,197 @@
+# instrumentation.py
+#
+# Per-search traces and the metrics they are aggregated into:
+#
+#   trace = SearchTrace()
+#   canonical.search("graph neural networks", trace=trace)
+#   trace.to_dict()
+#   # {"total_ms": 3.1,
+#   #  "stages_ms": {"normalize": 0.02, "bm25": 1.9, "hydrate": 1.0, "rank": 0.2},
+#   #  "counters": {"query_terms": 3, "postings": 5120, "candidates": 212, "hits": 100, "results": 20},
+#   #  "details": {"method": "exhaustive"}}
+#   trace.report(sink, "canonical")      # canonical.total_ms, canonical.stage.bm25_ms, ...
+
+import math
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Protocol, Tuple
+
+# Histogram buckets per doubling of the value: bucket bounds are
+# 2 ** (i / BUCKETS_PER_OCTAVE), so a quantile is off by at most ~19%.
+BUCKETS_PER_OCTAVE = 4
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class MetricsSink(Protocol):
+    """
+    Anything that aggregates named observations: HistogramSink, or an
+    adapter to an external metrics client.
+    """
+
+    def observe(self, name: str, value: float) -> None:
+        ...
+
+
+class SearchTrace:
+    """
+    What one search did: wall time per stage in milliseconds, and
+    counters such as postings touched and candidates scored. Stages are
+    recorded with `lap(stage)`, which charges the time since the
+    previous lap (or since the trace was created) to `stage`, so the
+    stages add up to the total. Filled by the search code it is passed
+    to; a trace is not shared between threads.
+
+    Counters:
+    - `query_terms`: terms after normalization (and fuzzy expansion)
+    - `allowed`: documents passing the concept / phrase filters
+    - `postings`: postings decoded or scanned by BM25 scoring
+    - `candidates`: documents given a full BM25 score
+    - `hits`, `results`: BM25 hits, results returned
+    - `query_cache_hits` / `query_cache_misses`: query embedding cache
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.counters: Counter = Counter()
+        self.details: Dict[str, Any] = {}
+        self.start = self._mark = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._mark) * 1e3
+        self._mark = now
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    @property
+    def total_ms(self) -> float:
+        return (self._mark - self.start) * 1e3
+
+    def timings(self) -> Dict[str, float]:
+        """
+        Stage times plus "total", in milliseconds.
+        """
+        return {**self.stages, "total": self.total_ms}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": self.total_ms,
+            "stages_ms": dict(self.stages),
+            "counters": {name: int(n) for name, n in self.counters.items()},
+            "details": dict(self.details),
+        }
+
+    def report(self, sink: MetricsSink, prefix: str) -> None:
+        """
+        Send the total, every stage time and every counter to `sink` as
+        `<prefix>.total_ms`, `<prefix>.stage.<stage>_ms` and
+        `<prefix>.<counter>`.
+        """
+        sink.observe(f"{prefix}.total_ms", self.total_ms)
+        for stage, ms in self.stages.items():
+            sink.observe(f"{prefix}.stage.{stage}_ms", ms)
+        for name, n in self.counters.items():
+            sink.observe(f"{prefix}.{name}", n)
+
+
+class Histogram:
+    """
+    Log-bucketed histogram of non-negative values with exact count, sum,
+    min and max.
+    """
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @staticmethod
+    def bucket(value: float) -> int | None:
+        """
+        Index i of the bucket (2 ** ((i - 1) / B), 2 ** (i / B)] holding
+        `value`; None for zero and below.
+        """
+        if value <= 0:
+            return None
+        return math.ceil(math.log2(value) * BUCKETS_PER_OCTAVE)
+
+    def add(self, value: float) -> None:
+        self.buckets[self.bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile, clamped to the
+        observed range.
+        """
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, n in self._sorted():
+            seen += n
+            if seen >= rank:
+                bound = 0.0 if i is None else 2 ** (i / BUCKETS_PER_OCTAVE)
+                return min(max(bound, self.min), self.max)
+        return self.max
+
+    def _sorted(self) -> List[Tuple[int | None, int]]:
+        return sorted(self.buckets.items(), key=lambda item: -math.inf if item[0] is None else item[0])
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else math.nan,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in QUANTILES:
+            out[f"p{q * 100:g}"] = self.quantile(q)
+        # Cumulative counts per upper bound, as Prometheus buckets.
+        cumulative = 0
+        le: Dict[str, int] = {}
+        for i, n in self._sorted():
+            cumulative += n
+            le[f"{0.0 if i is None else 2 ** (i / BUCKETS_PER_OCTAVE):.6g}"] = cumulative
+        out["le"] = le
+        return out
+
+
+class HistogramSink:
+    """
+    In-process MetricsSink keeping one Histogram per metric name; safe to
+    share between threads. `export()` returns their summaries, e.g. for
+    the search service's /metrics route.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(value)
+
+    def export(self, prefix: str = "") -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: hist.to_dict()
+                for name, hist in sorted(self.histograms.items())
+                if name.startswith(prefix)
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self.histograms.clear()
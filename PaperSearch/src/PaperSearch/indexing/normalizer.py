@@ -1,14 +1,157 @@
  # normalizer.py
 
 import re
+from typing import Dict, List, Sequence, Tuple
+
 from .synonym_map import SYNONYMS
 
-def normalize_text(text: str) -> str:
-    text = text.lower()
+_WORD = re.compile(r"\w")
+
+
+def _is_word(ch: str) -> bool:
+    return _WORD.match(ch) is not None
+
+
+def _boundary(left: str | None, right: str | None) -> bool:
+    """
+    Whether \\b can hold between two characters. None stands for an
+    unknown neighbour, which may or may not be a word character.
+    """
+    if left is None or right is None:
+        return True
+    return _is_word(left) != _is_word(right)
+
+
+def _may_meet(inner: str, outer: str) -> bool:
+    """
+    Whether a \\b-delimited match of `inner` could overlap a piece of
+    text that contains `outer`: `inner` occurs inside `outer`, `outer`
+    occurs inside `inner`, or a suffix of one is a prefix of the other,
+    with word boundaries possible at the match edges.
+    """
+    if not inner or not outer:
+        return False
+
+    def edges_ok(s: str, start: int, end: int, sub: str) -> bool:
+        left = s[start - 1] if start > 0 else None
+        right = s[end] if end < len(s) else None
+        return _boundary(left, sub[0]) and _boundary(sub[-1], right)
+
+    for sub, s in ((inner, outer), (outer, inner)):
+        start = s.find(sub)
+        while start >= 0:
+            if sub is outer or edges_ok(s, start, start + len(sub), sub):
+                return True
+            start = s.find(sub, start + 1)
+
+    for k in range(1, min(len(inner), len(outer))):
+        # outer's tail overlaps inner's head
+        if outer[-k:] == inner[:k] and _boundary(outer[-k - 1], inner[0]):
+            return True
+        # inner's tail overlaps outer's head
+        if inner[-k:] == outer[:k] and _boundary(inner[-1], outer[k]):
+            return True
+    return False
+
+
+class SynonymNormalizer:
+    """
+    Rewrites synonym variants to their canonical form, with the same
+    output as applying one `re.sub(r"\\b<variant>\\b", canonical, text)`
+    per variant in map order.
 
-    for canonical, variants in SYNONYMS.items():
-        for v in variants:
-            pattern = r"\b" + re.escape(v.lower()) + r"\b"
-            text = re.sub(pattern, canonical, text)
+    A single alternation regex finds every position where some variant
+    matches. The occurrences there are then resolved as the sequential
+    substitutions would: variants in map order, each taking its leftmost
+    non-overlapping occurrences that an earlier variant has not already
+    rewritten. Text without any variant costs one regex scan.
 
-    return text
+    This is only exact when a replacement cannot create or destroy a
+    match of another variant, so the map is checked when compiled. If a
+    canonical form could overlap a variant, or changes the word / non-word
+    type of the text at a variant's edges, the normalizer falls back to
+    the precompiled sequential substitutions.
+    """
+
+    def __init__(self, synonyms: Dict[str, Sequence[str]]):
+        self.rules: List[Tuple[str, str]] = [
+            (canonical, v.lower()) for canonical, variants in synonyms.items() for v in variants
+        ]
+        self.patterns = [
+            (re.compile(r"\b" + re.escape(v) + r"\b"), canonical) for canonical, v in self.rules
+        ]
+        # re.sub expands escapes in the replacement template.
+        self.replacements = [re.sub(re.escape(v), canonical, v, count=1) for canonical, v in self.rules]
+
+        self.single_pass = self._is_confluent()
+        self.scanner = None
+        if self.single_pass and self.rules:
+            alternation = "|".join(
+                re.escape(v) for v in sorted({v for _, v in self.rules}, key=len, reverse=True)
+            )
+            self.scanner = re.compile(r"(?=\b(?:" + alternation + r")\b)")
+        # Rules by first character, so each position only tries the
+        # variants that can start there.
+        self.by_first: Dict[str, List[Tuple[int, re.Pattern]]] = {}
+        for rank, ((_, v), (pattern, _)) in enumerate(zip(self.rules, self.patterns)):
+            if v:
+                self.by_first.setdefault(v[0], []).append((rank, pattern))
+
+    def _is_confluent(self) -> bool:
+        for (canonical, v), repl in zip(self.rules, self.replacements):
+            if not v or not repl:
+                return False
+            if _is_word(v[0]) != _is_word(repl[0]) or _is_word(v[-1]) != _is_word(repl[-1]):
+                return False
+            if any(_may_meet(other, repl) for _, other in self.rules):
+                return False
+        return True
+
+    def __call__(self, text: str) -> str:
+        text = text.lower()
+        if not self.single_pass:
+            for pattern, canonical in self.patterns:
+                text = pattern.sub(canonical, text)
+            return text
+
+        if self.scanner is None:
+            return text
+        positions = [m.start() for m in self.scanner.finditer(text)]
+        if not positions:
+            return text
+
+        # Occurrences per rule, in text order.
+        occurrences: List[List[Tuple[int, int]]] = [[] for _ in self.rules]
+        for pos in positions:
+            for rank, pattern in self.by_first[text[pos]]:
+                m = pattern.match(text, pos)
+                if m is not None:
+                    occurrences[rank].append((pos, m.end()))
+
+        taken: List[Tuple[int, int, int]] = []
+        for rank, occs in enumerate(occurrences):
+            last_end = -1
+            for start, end in occs:
+                if start < last_end:
+                    continue
+                if any(start < t_end and t_start < end for t_start, t_end, _ in taken):
+                    continue
+                taken.append((start, end, rank))
+                last_end = end
+
+        taken.sort()
+        out = []
+        prev = 0
+        for start, end, rank in taken:
+            out.append(text[prev:start])
+            out.append(self.replacements[rank])
+            prev = end
+        out.append(text[prev:])
+        return "".join(out)
+
+
+_normalizer = SynonymNormalizer(SYNONYMS)
+
+
+def normalize_text(text: str) -> str:
+    return _normalizer(text)
@@ -0,0 +1,204 @@
+# positions.py
+
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Callable, List, Sequence, Tuple
+
+from .postings import vbyte_encode
+
+# "quoted phrase" or a NEAR/k operator; everything else is free text.
+_QUERY_SYNTAX = re.compile(r'"([^"]*)"|\bNEAR/(\d+)\b')
+
+
+# ------------------------------------------------------------
+# Storage
+# ------------------------------------------------------------
+class TermPositions:
+    """
+    Token positions of every posting in one term's posting list, in the
+    same order. Posting j spans data[offsets[j]:offsets[j + 1]]: its
+    positions delta-encoded from 0 and variable-byte coded.
+
+    `offsets` are absolute into `data`, so a mapped term can share one
+    segment-wide blob and offsets array.
+    """
+
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets: Sequence[int] | None = None, data: Sequence[int] | None = None):
+        self.offsets = offsets if offsets is not None else array("Q", [0])
+        self.data = data if data is not None else bytearray()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def append(self, positions: Sequence[int]) -> None:
+        """
+        Add the next posting's positions, ascending.
+        """
+        prev = 0
+        deltas = []
+        for p in positions:
+            deltas.append(p - prev)
+            prev = p
+        vbyte_encode(deltas, self.data)
+        self.offsets.append(len(self.data))
+
+    def raw(self, j: int) -> bytes:
+        return bytes(self.data[self.offsets[j]:self.offsets[j + 1]])
+
+    def extend_raw(self, raw: bytes) -> None:
+        self.data += raw
+        self.offsets.append(len(self.data))
+
+    def get(self, j: int) -> List[int]:
+        """
+        Positions of posting `j`.
+        """
+        data = self.data
+        pos, end = self.offsets[j], self.offsets[j + 1]
+        out: List[int] = []
+        prev = 0
+        while pos < end:
+            v = 0
+            shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                v |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            prev += v
+            out.append(prev)
+        return out
+
+    def span(self) -> Tuple[int, int]:
+        return self.offsets[0], self.offsets[-1]
+
+    def copy(self) -> "TermPositions":
+        """
+        In-memory, appendable copy with offsets rebased to 0.
+        """
+        base = self.offsets[0]
+        return TermPositions(
+            array("Q", (o - base for o in self.offsets)),
+            bytearray(self.data[base:self.offsets[-1]]),
+        )
+
+    def nbytes(self) -> int:
+        """
+        Heap footprint; memory-mapped buffers count only their views.
+        """
+        return sys.getsizeof(self.offsets) + sys.getsizeof(self.data)
+
+
+def token_positions(tokens: Sequence[str]) -> dict[str, List[int]]:
+    """
+    term -> ascending positions of its occurrences in `tokens`.
+    """
+    out: dict[str, List[int]] = {}
+    for i, term in enumerate(tokens):
+        out.setdefault(term, []).append(i)
+    return out
+
+
+# ------------------------------------------------------------
+# Query syntax
+# ------------------------------------------------------------
+@dataclass
+class ParsedQuery:
+    """
+    A query split into free tokens, quoted phrases and NEAR/k pairs.
+    Every token of a phrase or NEAR operand is also scored, so `tokens`
+    is the full BM25 query; phrases and NEAR pairs only filter.
+    """
+    tokens: List[str] = field(default_factory=list)
+    phrases: List[List[str]] = field(default_factory=list)
+    near: List[Tuple[List[str], List[str], int]] = field(default_factory=list)
+
+    @property
+    def constrained(self) -> bool:
+        return bool(self.phrases or self.near)
+
+
+def has_syntax(query: str) -> bool:
+    return '"' in query or "NEAR/" in query
+
+
+def parse_query(query: str, analyze: Callable[[str], List[str]]) -> ParsedQuery:
+    """
+    Split `query` into quoted phrases, `a NEAR/k b` pairs and free text.
+    `analyze` turns a piece of text into index tokens (normalization and
+    tokenization), and is applied to each piece separately. A NEAR
+    operand is the phrase or the single word on either side of it; a
+    quoted phrase with one token is just a term.
+    """
+    # Phrases and words as token lists, in query order, with NEAR/k
+    # operators (ints) between them.
+    operands: List[List[str] | int] = []
+    last = 0
+    for m in _QUERY_SYNTAX.finditer(query):
+        operands.extend([t] for t in analyze(query[last:m.start()]))
+        if m.group(1) is not None:
+            operands.append(analyze(m.group(1)))
+        else:
+            operands.append(int(m.group(2)))
+        last = m.end()
+    operands.extend([t] for t in analyze(query[last:]))
+
+    parsed = ParsedQuery()
+    bound = set()
+    for i, op in enumerate(operands):
+        if not isinstance(op, int) or i == 0 or i + 1 == len(operands):
+            continue
+        left, right = operands[i - 1], operands[i + 1]
+        if isinstance(left, list) and isinstance(right, list) and left and right:
+            parsed.near.append((left, right, op))
+            bound.update((i - 1, i + 1))
+
+    for i, op in enumerate(operands):
+        if isinstance(op, int):
+            continue
+        parsed.tokens.extend(op)
+        if len(op) > 1 and i not in bound:
+            parsed.phrases.append(op)
+    return parsed
+
+
+# ------------------------------------------------------------
+# Matching
+# ------------------------------------------------------------
+def phrase_starts(positions: Sequence[Sequence[int]]) -> List[int]:
+    """
+    Start positions of the phrase whose i-th token occurs at
+    `positions[i]`.
+    """
+    starts = positions[0]
+    for i, plist in enumerate(positions[1:], 1):
+        if not starts:
+            break
+        wanted = set(plist)
+        starts = [s for s in starts if s + i in wanted]
+    return list(starts)
+
+
+def spans_near(a: Sequence[int], len_a: int, b: Sequence[int], len_b: int, k: int) -> bool:
+    """
+    Whether some span [x, x + len_a) and some span [y, y + len_b) are
+    separated by at most `k` other tokens, in either order. Overlapping
+    spans do not count.
+    """
+    b = sorted(b)
+    for x in a:
+        # y may start from x - len_b - k (b before a) up to x + len_a + k.
+        i = bisect_left(b, x - len_b - k)
+        while i < len(b) and b[i] <= x + len_a + k:
+            y = b[i]
+            if y + len_b <= x or x + len_a <= y:
+                return True
+            i += 1
+    return False
@@ -0,0 +1,236 @@
+# postings.py
+
+import sys
+from array import array
+from typing import Iterator, Sequence, Tuple
+
+BLOCK_SIZE = 128
+
+# Shared placeholder for regions a list does not use, so empty lists
+# cost no array objects.
+_EMPTY: Tuple[int, ...] = ()
+
+
+# ------------------------------------------------------------
+# Variable-byte coding
+# ------------------------------------------------------------
+def vbyte_encode(values: Sequence[int], out: bytearray) -> None:
+    """
+    Append `values` to `out`, 7 bits per byte, least significant group
+    first. The high bit is set on every byte except the last of a value.
+    """
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7F) | 0x80)
+            v >>= 7
+        out.append(v)
+
+
+def vbyte_decode(buf: Sequence[int], start: int, count: int) -> Tuple[list[int], int]:
+    """
+    Decode `count` values from `buf` starting at `start`.
+    Returns the values and the offset just past the last byte read.
+    """
+    out: list[int] = []
+    pos = start
+    for _ in range(count):
+        v = 0
+        shift = 0
+        while True:
+            byte = buf[pos]
+            pos += 1
+            v |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        out.append(v)
+    return out, pos
+
+
+# ------------------------------------------------------------
+# Posting list
+# ------------------------------------------------------------
+class PostingList:
+    """
+    Postings for one term as parallel uint32 arrays of doc ids and term
+    frequencies, in increasing doc id order.
+
+    `compress()` moves all postings into `packed`: blocks of BLOCK_SIZE
+    postings whose doc ids are delta-encoded and, together with the tfs,
+    variable-byte coded. `block_last` keeps the last doc id of every
+    packed block uncompressed so readers can skip whole blocks.
+    Postings appended after compression go to the plain `docs`/`tfs`
+    tail until the next `compress()`.
+
+    Blocks are numbered across both regions: packed blocks first, then
+    the tail cut into BLOCK_SIZE slices.
+
+    `block_max` holds an upper bound on the BM25 tf component of each
+    block, computed over the first `bound_count` postings with average
+    document length `bound_avg_len` (see BM25Index.finalize).
+
+    `positions`, when the index stores them, is a `TermPositions` with one
+    entry per posting in the same order; compression leaves it alone.
+    """
+
+    __slots__ = (
+        "docs", "tfs", "packed", "block_last", "block_offsets", "packed_count",
+        "block_max", "bound_count", "bound_avg_len", "positions",
+    )
+
+    def __init__(self, docs: Sequence[int] = _EMPTY, tfs: Sequence[int] = _EMPTY):
+        self.docs = docs
+        self.tfs = tfs
+        self.packed: Sequence[int] = _EMPTY
+        self.block_last: Sequence[int] = _EMPTY
+        self.block_offsets: Sequence[int] = _EMPTY
+        self.packed_count = 0
+        self.block_max: Sequence[float] = _EMPTY
+        self.bound_count = 0
+        self.bound_avg_len = 0.0
+        self.positions = None
+
+    @classmethod
+    def from_packed(
+        cls,
+        packed: Sequence[int],
+        block_last: Sequence[int],
+        block_offsets: Sequence[int],
+        count: int,
+    ) -> "PostingList":
+        pl = cls()
+        pl.packed = packed
+        pl.block_last = block_last
+        pl.block_offsets = block_offsets
+        pl.packed_count = count
+        return pl
+
+    def append(self, doc_id: int, tf: int) -> None:
+        if self.docs is _EMPTY:
+            self.docs = array("I")
+            self.tfs = array("I")
+        self.docs.append(doc_id)
+        self.tfs.append(tf)
+
+    def __len__(self) -> int:
+        return self.packed_count + len(self.docs)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for i in range(len(self.block_last)):
+            docs, tfs = self._unpack_block(i)
+            yield from zip(docs, tfs)
+        yield from zip(self.docs, self.tfs)
+
+    # -----------------------------
+    # Block access
+    # -----------------------------
+    @property
+    def num_blocks(self) -> int:
+        return len(self.block_last) + -(-len(self.docs) // BLOCK_SIZE)
+
+    def block(self, i: int) -> Tuple[Sequence[int], Sequence[int]]:
+        """
+        Doc ids and tfs of block `i`.
+        """
+        n_packed = len(self.block_last)
+        if i < n_packed:
+            return self._unpack_block(i)
+        start = (i - n_packed) * BLOCK_SIZE
+        end = start + BLOCK_SIZE
+        return self.docs[start:end], self.tfs[start:end]
+
+    def block_end(self, i: int) -> int:
+        """
+        Position just past the last posting of block `i`.
+        """
+        n_packed = len(self.block_last)
+        if i < n_packed:
+            return min((i + 1) * BLOCK_SIZE, self.packed_count)
+        return self.packed_count + min((i - n_packed + 1) * BLOCK_SIZE, len(self.docs))
+
+    def block_lasts(self) -> list[int]:
+        """
+        Last doc id of every block, as one list.
+        """
+        lasts = list(self.block_last)
+        if self.docs:
+            lasts.extend(self.docs[BLOCK_SIZE - 1::BLOCK_SIZE])
+            if len(self.docs) % BLOCK_SIZE:
+                lasts.append(self.docs[-1])
+        return lasts
+
+    def block_bounds(self, fallback: float) -> list[float]:
+        """
+        Stored bound of every block, with `fallback` for blocks that have
+        grown since bounds were computed.
+        """
+        covered = len(self.block_max)
+        if covered and self.block_end(covered - 1) > self.bound_count:
+            covered -= 1
+        return list(self.block_max[:covered]) + [fallback] * (self.num_blocks - covered)
+
+    def _unpack_block(self, i: int) -> Tuple[list[int], list[int]]:
+        n_blocks = len(self.block_last)
+        count = BLOCK_SIZE if i < n_blocks - 1 else self.packed_count - (n_blocks - 1) * BLOCK_SIZE
+        deltas, pos = vbyte_decode(self.packed, self.block_offsets[i], count)
+        tfs, _ = vbyte_decode(self.packed, pos, count)
+
+        doc = self.block_last[i - 1] if i > 0 else 0
+        docs = []
+        for d in deltas:
+            doc += d
+            docs.append(doc)
+        return docs, tfs
+
+    # -----------------------------
+    # Compression
+    # -----------------------------
+    def compress(self) -> None:
+        """
+        Pack every posting, including any plain tail, into vbyte blocks.
+        """
+        if not self.docs:
+            return
+
+        docs = array("I")
+        tfs = array("I")
+        for doc_id, tf in self:
+            docs.append(doc_id)
+            tfs.append(tf)
+
+        packed = bytearray()
+        block_last = array("I")
+        block_offsets = array("I")
+        prev = 0
+        for start in range(0, len(docs), BLOCK_SIZE):
+            block_docs = docs[start:start + BLOCK_SIZE]
+            deltas = []
+            for d in block_docs:
+                deltas.append(d - prev)
+                prev = d
+            block_offsets.append(len(packed))
+            vbyte_encode(deltas, packed)
+            vbyte_encode(tfs[start:start + BLOCK_SIZE], packed)
+            block_last.append(prev)
+
+        self.packed = bytes(packed)
+        self.block_last = block_last
+        self.block_offsets = block_offsets
+        self.packed_count = len(docs)
+        self.docs = _EMPTY
+        self.tfs = _EMPTY
+        self.block_max = _EMPTY
+        self.bound_count = 0
+
+    def nbytes(self) -> int:
+        """
+        Heap footprint of this list: the object itself plus its arrays and
+        packed buffer. Memory-mapped buffers count only their view objects.
+        """
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(buf)
+            for buf in (
+                self.docs, self.tfs, self.packed, self.block_last, self.block_offsets, self.block_max,
+            )
+            if buf is not _EMPTY
+        ) + (self.positions.nbytes() if self.positions is not None else 0)
@@ -0,0 +1,115 @@
+# quantization.py
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+# Rows converted to float32 at a time when scanning a quantized matrix;
+# small enough for the converted block to stay in cache.
+SCAN_CHUNK = 1024
+
+
+def check_dtype(dtype: str) -> str:
+    if dtype not in DTYPES:
+        raise ValueError(f"unknown embedding dtype {dtype!r}; expected one of {', '.join(DTYPES)}")
+    return dtype
+
+
+def quantize_rows(vecs: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray | None]:
+    """
+    Convert float32 rows to `dtype`. int8 rows are scaled per row so
+    their largest component maps to +-127; the scales are returned
+    alongside (None for the float types).
+    """
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if dtype == "float32":
+        return vecs, None
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+
+    check_dtype(dtype)
+    scales = np.abs(vecs).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(vecs / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_rows(codes: np.ndarray, scales: np.ndarray | None = None) -> np.ndarray:
+    out = codes.astype(np.float32)
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+def decode_vector(blob: bytes, dtype: str | None, scale: float | None) -> np.ndarray:
+    """
+    Float32 vector from a stored BLOB. Rows written before the dtype
+    column existed have dtype NULL and are float32.
+    """
+    dtype = dtype or "float32"
+    codes = np.frombuffer(blob, dtype=np.dtype(check_dtype(dtype)))
+    if dtype == "float32":
+        return codes
+    out = codes.astype(np.float32)
+    if scale is not None:
+        out *= scale
+    return out
+
+
+def decode_blobs(
+    blobs: Sequence[bytes],
+    dtypes: Sequence[str | None],
+    scales: Sequence[float | None],
+    dim: int,
+) -> np.ndarray:
+    """
+    Decode many stored vectors into one float32 matrix. Rows of the same
+    dtype are joined and converted together.
+    """
+    out = np.empty((len(blobs), dim), dtype=np.float32)
+    kinds = np.array([d or "float32" for d in dtypes])
+    for dtype in np.unique(kinds):
+        idx = np.flatnonzero(kinds == dtype)
+        codes = np.frombuffer(b"".join(blobs[i] for i in idx), dtype=np.dtype(check_dtype(str(dtype))))
+        block = codes.reshape(len(idx), dim).astype(np.float32)
+        if dtype == "int8":
+            block *= np.array([scales[i] for i in idx], dtype=np.float32)[:, None]
+        out[idx] = block
+    return out
+
+
+def score_rows(
+    matrix: np.ndarray,
+    scales: np.ndarray | None,
+    rows: np.ndarray,
+    q: np.ndarray,
+) -> np.ndarray:
+    """
+    Inner products of float32 `q` with the given rows of a possibly
+    quantized matrix.
+    """
+    if matrix.dtype == np.float32:
+        return matrix[rows] @ q
+    out = matrix[rows].astype(np.float32) @ q
+    if scales is not None:
+        out *= scales[rows]
+    return out
+
+
+def score_all(matrix: np.ndarray, scales: np.ndarray | None, q: np.ndarray) -> np.ndarray:
+    """
+    Inner products of float32 `q` with every row. Quantized matrices are
+    converted `SCAN_CHUNK` rows at a time, so the scan never holds a
+    float32 copy of the whole matrix.
+    """
+    if matrix.dtype == np.float32:
+        return matrix @ q
+    out = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), SCAN_CHUNK):
+        block = matrix[start:start + SCAN_CHUNK]
+        out[start:start + len(block)] = block.astype(np.float32) @ q
+    if scales is not None:
+        out *= scales
+    return out
@@ -4,13 +4,18 @@ import sqlite3
 import json
 from typing import List, Dict, Any
 
+from PaperSearch.src.PaperSearch.sql.db.connection import MAX_IN_PARAMS
 from .bm25_index import BM25Index
+from .facets import FacetColumns
+from .fts_index import FTS5Index
+from .instrumentation import SearchTrace
 
 
 class CanonicalSearch:
-    def __init__(self, db_path: str, bm25_index: BM25Index):
+    def __init__(self, db_path: str, bm25_index: BM25Index | FTS5Index, facets: FacetColumns | None = None):
         self.db_path = db_path
         self.bm25 = bm25_index
+        self.facets = facets
 
     def _fetch_metadata_bulk(self, work_ids: List[str]) -> List[Dict[str, Any]]:
         if not work_ids:
@@ -27,22 +32,15 @@ class CanonicalSearch:
         by_id = {row["work_id"]: dict(row) for row in rows}
         return [by_id[wid] for wid in work_ids if wid in by_id]
 
-    def _concept_boost(
+    def _concept_boosts(
         self,
-        work_id: str,
+        work_ids: List[str],
         boosted_concepts: List[str] | None,
-    ) -> float:
+    ) -> Dict[str, float]:
         if not boosted_concepts:
-            return 0.0
-
-        doc_concepts = self.bm25.get_doc_concepts(work_id)
-        boosted_set = set(boosted_concepts)
+            return dict.fromkeys(work_ids, 0.0)
 
-        score = 0.0
-        for cid, cscore in doc_concepts:
-            if cid in boosted_set:
-                score += cscore
-        return score
+        return self.bm25.concept_boosts(work_ids, boosted_concepts)
 
     def _has_required_concepts(
         self,
@@ -52,9 +50,7 @@ class CanonicalSearch:
         if not required_concepts:
             return True
 
-        doc_concepts = self.bm25.get_doc_concepts(work_id)
-        doc_ids = {cid for cid, _ in doc_concepts}
-        return all(rc in doc_ids for rc in required_concepts)
+        return self.bm25.has_concepts(work_id, required_concepts)
 
     def search(
         self,
@@ -63,23 +59,28 @@ class CanonicalSearch:
         required_concepts: List[str] | None = None,
         boosted_concepts: List[str] | None = None,
         alpha: float = 1.0,
+        fuzzy: bool = False,
+        trace: SearchTrace | None = None,
     ) -> List[Dict[str, Any]]:
         """
         Minimal unified API:
         - BM25 lexical ranking
         - optional hard concept filtering
         - optional soft concept boosting (weight alpha)
+        - optional correction of misspelled terms (fuzzy)
+        - optional profiling into `trace` (see `explain()`)
         """
 
-        # 1. BM25 lexical ranking (get more than top_k to allow filtering)
-        bm25_hits = self.bm25.score(query, top_k=max(top_k * 5, top_k))
-        # bm25_hits: list[(work_id, bm25_score)]
-
-        # 2. Apply hard concept filtering at the ID level
-        filtered_hits: list[tuple[str, float]] = []
-        for work_id, score in bm25_hits:
-            if self._has_required_concepts(work_id, required_concepts or []):
-                filtered_hits.append((work_id, score))
+        # 1-2. BM25 lexical ranking restricted to documents carrying every
+        # required concept (get more than top_k to leave room for boosting)
+        filtered_hits = self.bm25.score(
+            query,
+            top_k=max(top_k * 5, top_k),
+            required_concepts=required_concepts,
+            fuzzy=fuzzy,
+            trace=trace,
+        )
+        # filtered_hits: list[(work_id, bm25_score)]
 
         if not filtered_hits:
             return []
@@ -87,16 +88,19 @@ class CanonicalSearch:
         # 3. Fetch metadata for remaining candidates
         work_ids = [wid for wid, _ in filtered_hits]
         docs = self._fetch_metadata_bulk(work_ids)
+        if trace is not None:
+            trace.lap("hydrate")
 
         # index by work_id for attaching scores
         score_by_id = {wid: s for wid, s in filtered_hits}
+        boosts = self._concept_boosts([d["work_id"] for d in docs], boosted_concepts)
 
         # 4. Attach scores and compute final_score
         enriched: list[dict[str, Any]] = []
         for d in docs:
             wid = d["work_id"]
             bm25_score = score_by_id.get(wid, 0.0)
-            concept_boost = self._concept_boost(wid, boosted_concepts or [])
+            concept_boost = boosts[wid]
 
             final_score = bm25_score + alpha * concept_boost
 
@@ -108,4 +112,101 @@ class CanonicalSearch:
 
         # 5. Sort and return top_k
         enriched.sort(key=lambda x: x["final_score"], reverse=True)
+        if trace is not None:
+            trace.lap("rank")
+            trace.count("results", min(len(enriched), top_k))
         return enriched[:top_k]
+
+    def explain(
+        self,
+        query: str,
+        top_k: int = 20,
+        required_concepts: List[str] | None = None,
+        boosted_concepts: List[str] | None = None,
+        alpha: float = 1.0,
+        fuzzy: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        `search()` plus where its time went: per-stage wall times
+        (normalize, filters, bm25, hydrate, rank), postings touched,
+        candidates scored and hit counts, as `SearchTrace.to_dict()`.
+        """
+        trace = SearchTrace()
+        results = self.search(query, top_k, required_concepts, boosted_concepts, alpha, fuzzy, trace)
+        return {"results": results, "explain": trace.to_dict()}
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 20,
+        required_concepts: List[str] | None = None,
+        boosted_concepts: List[str] | None = None,
+        alpha: float = 1.0,
+        fuzzy: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        `search()` for every query, in order. The BM25 ranking of the
+        whole batch is one `score_many` call, and a work hit by several
+        queries is fetched and concept-boosted once.
+        """
+        all_hits = self.bm25.score_many(
+            queries,
+            top_k=max(top_k * 5, top_k),
+            required_concepts=required_concepts,
+            fuzzy=fuzzy,
+        )
+
+        work_ids = list(dict.fromkeys(wid for hits in all_hits for wid, _ in hits))
+        rows: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(work_ids), MAX_IN_PARAMS):
+            for d in self._fetch_metadata_bulk(work_ids[i:i + MAX_IN_PARAMS]):
+                rows[d["work_id"]] = d
+        boosts = self._concept_boosts(list(rows), boosted_concepts)
+
+        results: List[List[Dict[str, Any]]] = []
+        for hits in all_hits:
+            enriched: list[dict[str, Any]] = []
+            for wid, bm25_score in hits:
+                if wid not in rows:
+                    continue
+                d = dict(rows[wid])
+                d["bm25_score"] = bm25_score
+                d["concept_boost"] = boosts[wid]
+                d["final_score"] = bm25_score + alpha * boosts[wid]
+                enriched.append(d)
+            enriched.sort(key=lambda x: x["final_score"], reverse=True)
+            results.append(enriched[:top_k])
+        return results
+
+    def search_with_facets(
+        self,
+        query: str,
+        top_k: int = 20,
+        required_concepts: List[str] | None = None,
+        boosted_concepts: List[str] | None = None,
+        alpha: float = 1.0,
+        fuzzy: bool = False,
+        facet_limit: int = 10,
+        trace: SearchTrace | None = None,
+    ) -> Dict[str, Any]:
+        """
+        `search()` plus year/venue/concept counts over every matching
+        document (not just the top_k), computed from the in-memory facet
+        columns, and the number of matches. Needs a BM25Index backend,
+        whose doc ids the facet columns are aligned with.
+        """
+        if self.facets is None:
+            raise ValueError("no facet columns loaded; build them with load_facets")
+        if not isinstance(self.bm25, BM25Index):
+            raise ValueError(f"facet counts need a BM25Index backend, not {type(self.bm25).__name__}")
+
+        results = self.search(query, top_k, required_concepts, boosted_concepts, alpha, fuzzy, trace)
+        docs = self.bm25.matching_docs(query, required_concepts=required_concepts, fuzzy=fuzzy)
+        counts = self.facets.counts(docs, facet_limit)
+        if trace is not None:
+            trace.lap("facets")
+        return {
+            "results": results,
+            "facets": counts,
+            "total": int(docs.size),
+        }
@@ -0,0 +1,547 @@
+# search_service.py
+#
+# Local search daemon: loads the indexes once and answers JSON requests
+# over HTTP on a TCP port or a Unix socket.
+#
+#   python -m PaperSearch.src.PaperSearch.indexing.search_service \
+#       --db data/db/papers.db --bm25 data/index/bm25 --port 8765
+#
+#   POST /search  {"query": "...", "mode": "canonical" | "hybrid", "top_k": 20, "facets": false,
+#                  "explain": false, ...}
+#   POST /complete {"text": "...", "limit": 10}
+#   POST /reload  {"bm25": "...", "embeddings": "...", "ann": "..."}
+#                 or, with --generations, {"generation": "gen-000042"}
+#   POST /rollback
+#   GET  /stats
+#   GET  /metrics
+#   GET  /health
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .autocomplete import TitleAutocomplete
+from .bm25_index import BM25Index
+from .canonical_index_builder import AUTOCOMPLETE_DIR, FACETS_DIR
+from .embedding_index import EmbeddingIndex
+from .facets import FacetColumns
+from .generations import ANN_DIR, BM25_DIR, EMBEDDINGS_DIR, GenerationStore
+from .hybrid_search import HybridSearch
+from .instrumentation import HistogramSink, MetricsSink, SearchTrace
+from .search_api import CanonicalSearch
+from .segment import MANIFEST_NAME
+
+# Search latencies kept for percentiles, and the window QPS is measured over.
+STATS_WINDOW = 10_000
+QPS_WINDOW_S = 60.0
+
+# How often a service over a GenerationStore checks for a new generation.
+WATCH_INTERVAL_S = 1.0
+
+MAX_BODY_BYTES = 1 << 20
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+@dataclass
+class SearchSnapshot:
+    """
+    One loaded set of indexes. Requests take a reference to the current
+    snapshot when they start, so a swap never affects a running query.
+    """
+    db_path: str
+    bm25_path: str
+    canonical: CanonicalSearch
+    hybrid: HybridSearch | None = None
+    autocomplete: TitleAutocomplete | None = None
+    embeddings_path: str | None = None
+    ann_path: str | None = None
+    index_generation: str | None = None
+    generation: int = 0
+    loaded_at: float = field(default_factory=time.time)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "index_generation": self.index_generation,
+            "loaded_at": self.loaded_at,
+            "bm25": self.bm25_path,
+            "embeddings": self.embeddings_path,
+            "ann": self.ann_path,
+            "documents": self.canonical.bm25.N,
+            "autocomplete": self.autocomplete is not None,
+            "facets": self.canonical.facets is not None,
+        }
+
+
+def load_snapshot(
+    db_path: str,
+    bm25_path: str,
+    embeddings_path: str | None = None,
+    ann_path: str | None = None,
+    previous: SearchSnapshot | None = None,
+) -> SearchSnapshot:
+    """
+    Memory-map the BM25 segment at `bm25_path` and, with
+    `embeddings_path`, the embedding matrix segment (plus an IVF index at
+    `ann_path`) for hybrid search. The embedding model and query cache
+    of `previous` are reused, so a reload does not load the model again.
+    A title autocomplete and facet columns saved with the BM25 segment
+    are mapped too; columns built for a different document count are
+    ignored.
+    """
+    bm25 = BM25Index.load(bm25_path)
+    facets = None
+    facets_path = Path(bm25_path, FACETS_DIR)
+    if Path(facets_path, MANIFEST_NAME).exists():
+        facets = FacetColumns.load(facets_path)
+        if len(facets) != len(bm25.doc_ids):
+            facets = None
+    snapshot = SearchSnapshot(db_path, bm25_path, CanonicalSearch(db_path, bm25, facets))
+    autocomplete_path = Path(bm25_path, AUTOCOMPLETE_DIR)
+    if Path(autocomplete_path, MANIFEST_NAME).exists():
+        snapshot.autocomplete = TitleAutocomplete.load(autocomplete_path)
+
+    if embeddings_path is not None:
+        old_emb = previous.hybrid.emb if previous is not None and previous.hybrid is not None else None
+        if old_emb is not None:
+            emb = EmbeddingIndex(db_path, old_emb.model_name, query_cache=old_emb.query_cache)
+            emb._model = old_emb._model
+        else:
+            emb = EmbeddingIndex(db_path)
+        emb.load_matrix(embeddings_path)
+        if ann_path is not None:
+            emb.load_ann(ann_path)
+        snapshot.hybrid = HybridSearch(bm25, emb, db_path)
+        snapshot.hybrid.load_metadata()
+        snapshot.embeddings_path = embeddings_path
+        snapshot.ann_path = ann_path
+
+    if previous is not None:
+        snapshot.generation = previous.generation + 1
+    return snapshot
+
+
+def load_generation(
+    db_path: str,
+    store: GenerationStore,
+    name: str | None = None,
+    previous: SearchSnapshot | None = None,
+) -> SearchSnapshot:
+    """
+    `load_snapshot` over the components of generation `name` (default:
+    the current one) of `store`.
+    """
+    name = name or store.current()
+    if name is None:
+        raise ValueError(f"no current generation in {store.root}")
+    path = store.path(name)
+    components = store.manifest(name)["components"]
+    snapshot = load_snapshot(
+        db_path,
+        str(path / BM25_DIR),
+        str(path / EMBEDDINGS_DIR) if EMBEDDINGS_DIR in components else None,
+        str(path / ANN_DIR) if ANN_DIR in components else None,
+        previous=previous,
+    )
+    snapshot.index_generation = name
+    return snapshot
+
+
+class LatencyStats:
+    """
+    Rolling request statistics: latency percentiles over the last
+    `STATS_WINDOW` searches and QPS over the last `QPS_WINDOW_S` seconds.
+    """
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.samples: deque[Tuple[float, float]] = deque(maxlen=window)
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def record(self, ms: float, ok: bool = True) -> None:
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.samples.append((time.time(), ms))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self.samples)
+            out = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "uptime_s": time.time() - self.started,
+            }
+        now = time.time()
+        window = min(QPS_WINDOW_S, max(now - self.started, 1e-9))
+        recent = sum(1 for t, _ in samples if t >= now - window)
+        out["qps"] = recent / window
+        if samples:
+            ms = np.array([m for _, m in samples])
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            out["latency_ms"] = {
+                "mean": float(ms.mean()), "p50": float(p50), "p90": float(p90),
+                "p99": float(p99), "max": float(ms.max()),
+            }
+        return out
+
+
+class SearchService:
+    """
+    Serves `search` requests against the current `SearchSnapshot` from a
+    thread pool of `workers`, so the event loop only parses requests and
+    writes responses. `reload()` loads a new snapshot in the pool while
+    the old one keeps serving, then swaps the reference; nothing is ever
+    unavailable.
+
+    BM25 scoring holds the GIL for most of its work, so threads mainly
+    overlap I/O, NumPy and SQLite; every worker reads the same
+    memory-mapped segments.
+
+    With a GenerationStore, snapshots are loaded from its generations:
+    the service follows CURRENT on its own, every request pins the
+    generation it runs on, and generations nothing uses any more are
+    garbage-collected after each swap.
+
+    Every search is traced and reported to `metrics` (per-stage times,
+    postings, candidates and cache hits under "canonical." / "hybrid.");
+    the default HistogramSink is exported by GET /metrics. A request with
+    `"explain": true` gets its own trace back under "explain".
+    """
+
+    def __init__(
+        self,
+        snapshot: SearchSnapshot,
+        workers: int = 4,
+        store: GenerationStore | None = None,
+        metrics: MetricsSink | None = None,
+    ):
+        self.snapshot = snapshot
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        self.stats = LatencyStats()
+        self.metrics = metrics if metrics is not None else HistogramSink()
+        self.watch_error: str | None = None
+        self._reload_lock = asyncio.Lock()
+        # Held while a request takes the snapshot and pins its generation,
+        # and while _swap replaces it, so gc() never sees a generation a
+        # request has taken but not yet pinned.
+        self._snapshot_lock = threading.Lock()
+        # Last CURRENT the service loaded from the store; watch() reloads
+        # only when CURRENT moves away from it, so a path reload sticks.
+        self._followed = snapshot.index_generation
+        if store is not None and snapshot.index_generation is not None:
+            store.pin(snapshot.index_generation)
+
+    @contextmanager
+    def _pinned(self) -> Iterator[SearchSnapshot]:
+        with self._snapshot_lock:
+            snap = self.snapshot
+            name = snap.index_generation if self.store is not None else None
+            if name is not None:
+                self.store.pin(name)
+        try:
+            yield snap
+        finally:
+            # The last request on a swapped-out generation has it
+            # collected in the pool, never on the event loop.
+            if name is not None and self.store.unpin(name) == 0 and name != self.snapshot.index_generation:
+                self.executor.submit(self.store.gc)
+
+    # -----------------------------
+    # Requests
+    # -----------------------------
+    def search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._pinned() as snap:
+            return self._search(snap, request)
+
+    def _search(self, snap: SearchSnapshot, request: Dict[str, Any]) -> Dict[str, Any]:
+        query = request["query"]
+        top_k = int(request.get("top_k", 20))
+        mode = request.get("mode", "canonical")
+        trace = SearchTrace()
+
+        if mode == "canonical":
+            args = dict(
+                top_k=top_k,
+                required_concepts=request.get("required_concepts"),
+                boosted_concepts=request.get("boosted_concepts"),
+                alpha=float(request.get("alpha", 1.0)),
+                fuzzy=bool(request.get("fuzzy", False)),
+                trace=trace,
+            )
+            if request.get("facets"):
+                response = snap.canonical.search_with_facets(
+                    query, facet_limit=int(request.get("facet_limit", 10)), **args
+                )
+            else:
+                response = {"results": snap.canonical.search(query, **args)}
+        elif mode == "hybrid":
+            if snap.hybrid is None:
+                raise ValueError("hybrid search needs an embeddings matrix; start or reload with one")
+            hits = snap.hybrid.search(
+                query,
+                top_k=top_k,
+                alpha=float(request.get("alpha", 1.0)),
+                boosted_concepts=request.get("boosted_concepts"),
+                trace=trace,
+            )
+            results = [
+                {
+                    "work_id": work_id, "title": title, "final_score": final_score,
+                    "bm25_score": bm25_score, "emb_score": emb_score, "concept_boost": concept_boost,
+                }
+                for work_id, title, final_score, bm25_score, emb_score, concept_boost in hits
+            ]
+            response = {"results": results}
+        else:
+            raise ValueError(f"unknown mode {mode!r}; expected 'canonical' or 'hybrid'")
+
+        trace.report(self.metrics, mode)
+        if request.get("explain"):
+            response["explain"] = trace.to_dict()
+        return {"generation": snap.generation, **response}
+
+    def complete(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Title completions for type-ahead. Lookups take well under a
+        millisecond, so they run on the event loop.
+        """
+        with self._pinned() as snap:
+            return self._complete(snap, request)
+
+    def _complete(self, snap: SearchSnapshot, request: Dict[str, Any]) -> Dict[str, Any]:
+        if snap.autocomplete is None:
+            raise ValueError("no title autocomplete next to the BM25 segment; build it with load_title_autocomplete")
+        text = request["text"]
+        limit = int(request.get("limit", 10))
+        return {
+            "generation": snap.generation,
+            "completions": [
+                {"work_id": work_id, "title": title, "cited_by_count": cites}
+                for work_id, title, cites in snap.autocomplete.complete(text, limit)
+            ],
+            # Word suggestions only while a word is being typed.
+            "terms": [term for term, _ in snap.autocomplete.complete_terms(text, limit)] if text[-1:].isalnum() else [],
+        }
+
+    async def handle_search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.stats.in_flight += 1
+        ok = False
+        try:
+            response = await loop.run_in_executor(self.executor, self.search, request)
+            ok = True
+            return response
+        finally:
+            self.stats.in_flight -= 1
+            self.stats.record((time.perf_counter() - start) * 1e3, ok)
+
+    async def reload(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Load the indexes named in `request` (defaulting to the current
+        paths) and swap them in once fully loaded. With a generation
+        store, `request["generation"]` is published first (rolling
+        forward or back), and without it the current generation is
+        loaded.
+        """
+        async with self._reload_lock:
+            current = self.snapshot
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            if self.store is not None and "bm25" not in request:
+                if request.get("generation"):
+                    self.store.publish(request["generation"])
+                load = partial(load_generation, current.db_path, self.store, previous=current)
+            else:
+                load = partial(
+                    load_snapshot,
+                    current.db_path,
+                    request.get("bm25", current.bm25_path),
+                    request.get("embeddings", current.embeddings_path),
+                    request.get("ann", current.ann_path),
+                    previous=current,
+                )
+            snapshot = await loop.run_in_executor(self.executor, load)
+            self._swap(snapshot)
+            if snapshot.index_generation is not None:
+                self._followed = snapshot.index_generation
+            if self.store is not None:
+                await loop.run_in_executor(self.executor, self.store.gc)
+            return {"load_s": time.perf_counter() - start, **snapshot.describe()}
+
+    def _swap(self, snapshot: SearchSnapshot) -> None:
+        with self._snapshot_lock:
+            old = self.snapshot
+            if self.store is not None and snapshot.index_generation is not None:
+                self.store.pin(snapshot.index_generation)
+            self.snapshot = snapshot
+            if self.store is not None and old.index_generation is not None:
+                self.store.unpin(old.index_generation)
+
+    async def rollback(self) -> Dict[str, Any]:
+        if self.store is None:
+            raise ValueError("rollback needs a generation store; start with --generations")
+        return await self.reload({"generation": self.store.rollback()})
+
+    async def watch(self, interval: float = WATCH_INTERVAL_S) -> None:
+        """
+        Reload whenever the store's CURRENT generation changes. A failed
+        load keeps the old snapshot serving and is reported in /stats.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                name = self.store.current()
+                if name is not None and name != self._followed:
+                    await self.reload({})
+                self.watch_error = None
+            except Exception as e:
+                self.watch_error = f"{type(e).__name__}: {e}"
+
+    def stats_response(self) -> Dict[str, Any]:
+        out = {**self.stats.snapshot(), "snapshot": self.snapshot.describe()}
+        if self.store is not None:
+            out["generations"] = self.store.generations()
+            out["watch_error"] = self.watch_error
+        return out
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            request = json.loads(body) if body else {}
+            if method == "POST" and path == "/search":
+                return 200, await self.handle_search(request)
+            if method == "POST" and path == "/complete":
+                return 200, self.complete(request)
+            if method == "POST" and path == "/reload":
+                return 200, await self.reload(request)
+            if method == "POST" and path == "/rollback":
+                return 200, await self.rollback()
+            if method == "GET" and path == "/stats":
+                return 200, self.stats_response()
+            if method == "GET" and path == "/metrics":
+                if not isinstance(self.metrics, HistogramSink):
+                    return 404, {"error": "metrics go to an external sink; nothing to export here"}
+                return 200, {"metrics": self.metrics.export()}
+            if method == "GET" and path == "/health":
+                return 200, {"status": "ok", "generation": self.snapshot.generation}
+            return 404, {"error": f"no route for {method} {path}"}
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    # -----------------------------
+    # HTTP
+    # -----------------------------
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Minimal HTTP/1.1 with keep-alive: one JSON request body in, one
+        JSON response out.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.dispatch(method, target.split("?", 1)[0], body)
+                    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, unix_path: str | None = None) -> None:
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        watcher = asyncio.create_task(self.watch()) if self.store is not None else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve PaperSearch queries from resident indexes.")
+    parser.add_argument("--db", required=True, help="SQLite database with normalized_works")
+    parser.add_argument("--bm25", help="BM25 segment directory")
+    parser.add_argument("--generations", help="generation store to serve (and follow) instead of --bm25")
+    parser.add_argument("--embeddings", help="embedding matrix segment (enables hybrid mode)")
+    parser.add_argument("--ann", help="IVF index segment for the embeddings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    store = None
+    if args.generations is not None:
+        store = GenerationStore(args.generations)
+        snapshot = load_generation(args.db, store)
+    elif args.bm25 is not None:
+        snapshot = load_snapshot(args.db, args.bm25, args.embeddings, args.ann)
+    else:
+        parser.error("one of --bm25 or --generations is required")
+    service = SearchService(snapshot, workers=args.workers, store=store)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# segment.py
+
+import json
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator
+
+MANIFEST_NAME = "segment.json"
+
+
+# ------------------------------------------------------------
+# Writer
+# ------------------------------------------------------------
+class SegmentWriter:
+    """
+    Writes a segment directory: one raw binary file per array plus a
+    JSON manifest, each moved into place once complete.
+    """
+
+    def __init__(self, path: str | Path, kind: str, version: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest: Dict[str, Any] = {
+            "kind": kind,
+            "version": version,
+            "byteorder": sys.byteorder,
+            "arrays": {},
+            "meta": {},
+        }
+
+    def _write_file(self, name: str, data) -> None:
+        target = self.path / f"{name}.bin"
+        tmp = target.with_suffix(".bin.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def write_array(self, name: str, values: array) -> None:
+        self._write_file(name, values.tobytes())
+        self.manifest["arrays"][name] = {
+            "typecode": values.typecode,
+            "length": len(values),
+        }
+
+    def write_strings(self, name: str, strings: Iterable[str]) -> None:
+        """
+        Store a list of strings as a UTF-8 blob plus a uint64 offsets array.
+        """
+        offsets = array("Q", [0])
+        blob = bytearray()
+        for s in strings:
+            blob += s.encode("utf-8")
+            offsets.append(len(blob))
+        self.write_array(f"{name}.offsets", offsets)
+        self.write_array(f"{name}.data", array("B", blob))
+
+    def close(self, **meta: Any) -> None:
+        self.manifest["meta"].update(meta)
+        target = self.path / MANIFEST_NAME
+        tmp = target.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, target)
+
+
+# ------------------------------------------------------------
+# Reader
+# ------------------------------------------------------------
+class SegmentReader:
+    """
+    Opens a segment directory and exposes its arrays as read-only
+    memoryviews over memory-mapped files.
+    """
+
+    def __init__(self, path: str | Path, kind: str, version: int):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_NAME, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get("kind") != kind:
+            raise ValueError(f"{self.path} is not a {kind} segment")
+        if self.manifest.get("version") != version:
+            raise ValueError(
+                f"{self.path} has segment version {self.manifest.get('version')}, "
+                f"expected {version}; rebuild the index"
+            )
+        if self.manifest.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{self.path} was written on a {self.manifest['byteorder']}-endian machine")
+
+        self.meta: Dict[str, Any] = self.manifest["meta"]
+        self._maps: list[mmap.mmap] = []
+
+    def has(self, name: str) -> bool:
+        return name in self.manifest["arrays"]
+
+    def array(self, name: str) -> memoryview:
+        spec = self.manifest["arrays"][name]
+        with open(self.path / f"{name}.bin", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return memoryview(b"").cast(spec["typecode"])
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._maps.append(mm)
+        view = memoryview(mm).cast(spec["typecode"])
+        if len(view) != spec["length"]:
+            raise ValueError(f"{self.path / name} is truncated")
+        return view
+
+    def strings(self, name: str) -> "StringTable":
+        return StringTable(self.array(f"{name}.offsets"), self.array(f"{name}.data"))
+
+
+class StringTable:
+    """
+    Read-only sequence of strings stored as offsets + UTF-8 blob.
+    Strings are decoded on access; `find` does a binary search and
+    requires the table to have been written in sorted order.
+    """
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def _raw(self, i: int) -> bytes:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._raw(i).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self._raw(i).decode("utf-8")
+
+    def find(self, s: str) -> int:
+        """
+        Return the position of `s`, or -1 if it is not in the table.
+        """
+        key = s.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._raw(lo) == key:
+            return lo
+        return -1
@@ -0,0 +1,316 @@
+# vector_scoring.py
+
+import math
+from array import array
+from collections import OrderedDict
+from typing import AbstractSet, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .postings import BLOCK_SIZE, PostingList
+
+
+def vbyte_decode_array(buf) -> np.ndarray:
+    """
+    Vectorized inverse of postings.vbyte_encode: decode every value in
+    `buf` at once.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    if data.size == 0:
+        return np.zeros(0, dtype=np.uint32)
+
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    value_of_byte = np.repeat(np.arange(ends.size), ends - starts + 1)
+    shifts = 7 * (np.arange(data.size) - starts[value_of_byte])
+    parts = (data & 0x7F).astype(np.uint64) << shifts.astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.uint32)
+
+
+def posting_arrays(plist: PostingList) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Doc ids and tfs of a posting list as uint32 arrays. Memory-mapped
+    lists are wrapped without copying; packed blocks are decoded in one
+    pass.
+    """
+    parts_docs = []
+    parts_tfs = []
+
+    n_blocks = len(plist.block_last)
+    if n_blocks:
+        values = vbyte_decode_array(plist.packed)
+        # Each block stores its deltas followed by its tfs.
+        last = plist.packed_count - (n_blocks - 1) * BLOCK_SIZE
+        full = values[:2 * BLOCK_SIZE * (n_blocks - 1)].reshape(n_blocks - 1, 2, BLOCK_SIZE)
+        tail = values[2 * BLOCK_SIZE * (n_blocks - 1):]
+        deltas = np.concatenate([full[:, 0, :].ravel(), tail[:last]])
+        parts_docs.append(np.cumsum(deltas, dtype=np.uint32))
+        parts_tfs.append(np.concatenate([full[:, 1, :].ravel(), tail[last:]]))
+
+    if len(plist.docs):
+        if isinstance(plist.docs, array):
+            # Snapshot growable arrays while holding the GIL; exporting
+            # their buffer would make a concurrent append fail.
+            parts_docs.append(np.frombuffer(plist.docs.tobytes(), dtype=np.uint32))
+            parts_tfs.append(np.frombuffer(plist.tfs.tobytes(), dtype=np.uint32))
+        else:
+            parts_docs.append(np.frombuffer(plist.docs, dtype=np.uint32))
+            parts_tfs.append(np.frombuffer(plist.tfs, dtype=np.uint32))
+
+    if not parts_docs:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32)
+    if len(parts_docs) == 1:
+        return parts_docs[0], parts_tfs[0]
+    return np.concatenate(parts_docs), np.concatenate(parts_tfs)
+
+
+def length_norms(doc_len, k1: float, b: float, avg_len: float) -> np.ndarray:
+    """
+    Per-document BM25 length normalisation k1 * (1 - b + b * dl / avg_len).
+    """
+    dl = np.frombuffer(doc_len.tobytes(), dtype=np.uint32).astype(np.float32)
+    return (k1 * (1 - b + b * dl / np.float32(avg_len))).astype(np.float32)
+
+
+def numpy_top_k(
+    index,
+    q_tokens: List[str],
+    top_k: int,
+    deleted: AbstractSet[int] = frozenset(),
+    allowed: np.ndarray | None = None,
+    term_weights: Dict[str, float] | None = None,
+    stats: Dict[str, int] | None = None,
+) -> List[Tuple[int, float]]:
+    """
+    Top k by scoring whole posting lists with array operations into a
+    dense float32 vector; matches the exhaustive path to float32 precision.
+    """
+    norms = index.length_norms()
+    if allowed is not None:
+        allowed = allowed[allowed < norms.size]
+        if allowed.size * 8 < norms.size:
+            return _numpy_top_k_subset(index, q_tokens, top_k, deleted, allowed, norms, term_weights, stats)
+    scores = np.zeros(norms.size, dtype=np.float32)
+    k1 = np.float32(index.k1)
+    postings = 0
+
+    for term in q_tokens:
+        if term not in index.inverted:
+            continue
+        df = index.df[term]
+        idf = np.float32(math.log(1 + (index.N - df + 0.5) / (df + 0.5)))
+        if term_weights is not None:
+            idf *= np.float32(term_weights.get(term, 1.0))
+
+        docs, tfs = posting_arrays(index.inverted[term])
+        if docs.size and docs[-1] >= norms.size:
+            # Documents added after `norms` was taken.
+            docs, tfs = docs[docs < norms.size], tfs[docs < norms.size]
+        postings += docs.size
+        tf = tfs.astype(np.float32)
+        # Doc ids are unique within a posting list, so fancy += is safe.
+        scores[docs] += idf * (tf * (k1 + 1) / (tf + norms[docs]))
+
+    if allowed is not None:
+        mask = np.zeros(norms.size, dtype=bool)
+        mask[allowed] = True
+        scores[~mask] = 0
+    if deleted:
+        scores[np.fromiter(deleted, dtype=np.int64, count=len(deleted))] = 0
+
+    if stats is not None:
+        stats["postings"] = stats.get("postings", 0) + int(postings)
+    return top_k_from_scores(scores, top_k, stats)
+
+
+def _numpy_top_k_subset(
+    index,
+    q_tokens: List[str],
+    top_k: int,
+    deleted: AbstractSet[int],
+    allowed: np.ndarray,
+    norms: np.ndarray,
+    term_weights: Dict[str, float] | None = None,
+    stats: Dict[str, int] | None = None,
+) -> List[Tuple[int, float]]:
+    scores = np.zeros(allowed.size, dtype=np.float32)
+    allowed_norms = norms[allowed]
+    k1 = np.float32(index.k1)
+    postings = 0
+
+    for term in q_tokens:
+        if term not in index.inverted:
+            continue
+        df = index.df[term]
+        idf = np.float32(math.log(1 + (index.N - df + 0.5) / (df + 0.5)))
+        if term_weights is not None:
+            idf *= np.float32(term_weights.get(term, 1.0))
+
+        docs, tfs = posting_arrays(index.inverted[term])
+        if not docs.size:
+            continue
+        postings += docs.size
+        pos = np.searchsorted(docs, allowed)
+        hit = pos < docs.size
+        hit[hit] = docs[pos[hit]] == allowed[hit]
+        tf = tfs[pos[hit]].astype(np.float32)
+        scores[hit] += idf * (tf * (k1 + 1) / (tf + allowed_norms[hit]))
+
+    if deleted:
+        scores[np.isin(allowed, np.fromiter(deleted, dtype=np.int64, count=len(deleted)))] = 0
+
+    if stats is not None:
+        stats["postings"] = stats.get("postings", 0) + int(postings)
+
+    # allowed is sorted, so ties still break by doc id.
+    return [(int(allowed[i]), score) for i, score in top_k_from_scores(scores, top_k, stats)]
+
+
+def top_k_from_scores(
+    scores: np.ndarray,
+    top_k: int,
+    stats: Dict[str, int] | None = None,
+) -> List[Tuple[int, float]]:
+    matched = np.flatnonzero(scores > 0)
+    if stats is not None:
+        stats["candidates"] = stats.get("candidates", 0) + int(matched.size)
+    if top_k <= 0 or matched.size == 0:
+        return []
+    if matched.size > top_k:
+        part = np.argpartition(-scores[matched], top_k - 1)[:top_k]
+        matched = matched[part]
+    order = np.lexsort((matched, -scores[matched]))
+    best = matched[order]
+    return [(int(d), float(s)) for d, s in zip(best, scores[best])]
+
+
+# batch_top_k works through the batch in steps of about BLOCK_POSTINGS
+# gathered query-term postings (small enough for a step's arrays to stay
+# in cache), and keeps the BM25 contributions of the
+# terms it has built (12 bytes a posting) for reuse by later steps up to
+# BATCH_POSTINGS postings, evicting the least recently used terms.
+BLOCK_POSTINGS = 1 << 14
+BATCH_POSTINGS = 1 << 22
+
+# A step is accumulated densely, with one bincount over all its (query,
+# doc) cells, while that is at most DENSE_CELLS_PER_POSTING cells per
+# gathered posting; sparser steps sort the postings instead.
+DENSE_CELLS_PER_POSTING = 8
+
+
+def batch_top_k(
+    index,
+    plans: Sequence[Tuple[List[str], Dict[str, float] | None, np.ndarray | None]],
+    top_k: int,
+    deleted: AbstractSet[int] = frozenset(),
+) -> List[List[Tuple[int, float]]]:
+    """
+    numpy_top_k for many (tokens, term_weights, allowed) plans at once,
+    sharing each distinct term's BM25 row across the batch.
+    """
+    norms = index.length_norms()
+    n_docs = norms.size
+    k1 = np.float32(index.k1)
+    rows: OrderedDict[str, Tuple[np.ndarray, np.ndarray] | None] = OrderedDict()
+    cached = 0
+
+    def term_row(term: str) -> Tuple[np.ndarray, np.ndarray] | None:
+        nonlocal cached
+        if term in rows:
+            rows.move_to_end(term)
+            return rows[term]
+        row = None
+        plist = index.inverted.get(term)
+        if plist is not None:
+            df = index.df[term]
+            idf = np.float32(math.log(1 + (index.N - df + 0.5) / (df + 0.5)))
+            docs, tfs = posting_arrays(plist)
+            if docs.size and docs[-1] >= n_docs:
+                docs, tfs = docs[docs < n_docs], tfs[docs < n_docs]
+            tf = tfs.astype(np.float32)
+            row = (docs.astype(np.int64), idf * (tf * (k1 + 1) / (tf + norms[docs])))
+            cached += docs.size
+        rows[term] = row
+        while cached > BATCH_POSTINGS and len(rows) > 1:
+            _, old = rows.popitem(last=False)
+            if old is not None:
+                cached -= old[0].size
+        return row
+
+    dead = None
+    if deleted:
+        dead = np.zeros(n_docs, dtype=bool)
+        ids = np.fromiter(deleted, dtype=np.int64, count=len(deleted))
+        dead[ids[ids < n_docs]] = True
+
+    out: List[List[Tuple[int, float]]] = [[] for _ in plans]
+    start = 0
+    while start < len(plans):
+        keys, vals = [], []
+        gathered = 0
+        end = start
+        while end < len(plans) and (end == start or gathered < BLOCK_POSTINGS):
+            tokens, weights, _ = plans[end]
+            offset = (end - start) * n_docs
+            for term in tokens:
+                row = term_row(term)
+                if row is None:
+                    continue
+                w = 1.0 if weights is None else weights.get(term, 1.0)
+                keys.append(row[0] + offset)
+                vals.append(row[1] if w == 1 else row[1] * np.float32(w))
+                gathered += row[0].size
+            end += 1
+        if gathered:
+            cell_keys = np.concatenate(keys)
+            cell_vals = np.concatenate(vals)
+            n_cells = (end - start) * n_docs
+            if n_cells <= DENSE_CELLS_PER_POSTING * gathered:
+                flat = np.bincount(cell_keys, cell_vals, minlength=n_cells).astype(np.float32)
+                cells = np.flatnonzero(flat > 0)
+                values = flat[cells]
+            else:
+                order = np.argsort(cell_keys, kind="stable")
+                cell_keys = cell_keys[order]
+                first = np.flatnonzero(np.concatenate(([True], cell_keys[1:] != cell_keys[:-1])))
+                cells = cell_keys[first]
+                values = np.add.reduceat(cell_vals[order], first)
+            _select_top_k(cells, values, n_docs, plans[start:end], top_k, dead, out[start:end])
+        start = end
+    return out
+
+
+def _select_top_k(
+    cells: np.ndarray,
+    values: np.ndarray,
+    n_docs: int,
+    plans: Sequence[Tuple[List[str], Dict[str, float] | None, np.ndarray | None]],
+    top_k: int,
+    dead: np.ndarray | None,
+    out: List[List[Tuple[int, float]]],
+) -> None:
+    """
+    Top k of every query of a step into `out`, from its matched cells
+    (sorted q * n_docs + doc keys) and their scores, leaving out `dead`
+    documents and those outside the query's allowed set.
+    """
+    if top_k <= 0:
+        return
+    bounds = np.searchsorted(cells, np.arange(len(plans) + 1) * n_docs)
+    for q, (_, _, allowed) in enumerate(plans):
+        lo, hi = bounds[q], bounds[q + 1]
+        docs, row = cells[lo:hi] - q * n_docs, values[lo:hi]
+        keep = row > 0
+        if dead is not None:
+            keep &= ~dead[docs]
+        if allowed is not None:
+            keep &= np.isin(docs, allowed, assume_unique=True)
+        docs, row = docs[keep], row[keep]
+        if docs.size > top_k:
+            part = np.argpartition(-row, top_k - 1)[:top_k]
+            docs, row = docs[part], row[part]
+        order = np.lexsort((docs, -row))
+        out[q].extend((int(d), float(s)) for d, s in zip(docs[order], row[order]))
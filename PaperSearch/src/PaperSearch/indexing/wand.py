@@ -0,0 +1,211 @@
+# wand.py
+
+import heapq
+import math
+from bisect import bisect_left
+from collections import Counter
+from operator import attrgetter
+from typing import AbstractSet, Dict, List, Sequence, Tuple
+
+from .postings import PostingList
+
+END = 1 << 32  # sorts after every uint32 doc id
+
+
+class TermCursor:
+    """
+    Forward-only cursor over one posting list that decodes a single block
+    at a time. `weight` turns a stored tf-component bound into a score
+    bound (idf x query multiplicity x avg_len drift). `decoded` counts
+    the postings in the blocks loaded so far.
+    """
+
+    __slots__ = (
+        "term", "plist", "idf", "n_blocks", "block_last", "block_ub",
+        "block", "docs", "tfs", "pos", "doc", "max_score", "decoded",
+    )
+
+    def __init__(self, term: str, plist: PostingList, idf: float, weight: float, fallback: float):
+        self.term = term
+        self.plist = plist
+        self.idf = idf
+        self.n_blocks = plist.num_blocks
+        self.block_last = plist.block_lasts()
+        self.block_ub = [weight * bound for bound in plist.block_bounds(fallback)]
+        self.max_score = max(self.block_ub, default=0.0)
+
+        self.block = -1
+        self.docs: Sequence[int] = ()
+        self.tfs: Sequence[int] = ()
+        self.pos = 0
+        self.doc = END
+        self.decoded = 0
+        if self.n_blocks:
+            self._load(0)
+            self.doc = self.docs[0]
+
+    def _load(self, i: int) -> None:
+        self.block = i
+        self.docs, self.tfs = self.plist.block(i)
+        self.pos = 0
+        self.decoded += len(self.docs)
+
+    @property
+    def tf(self) -> int:
+        return self.tfs[self.pos]
+
+    def find_block(self, target: int) -> int:
+        """
+        First block, from the current one on, whose last doc id >= target.
+        Only reads the skip table; nothing is decoded.
+        """
+        return bisect_left(self.block_last, target, max(self.block, 0))
+
+    def next_geq(self, target: int) -> None:
+        """
+        Move to the first posting with doc id >= target.
+        """
+        if self.doc >= target:
+            return
+        if self.block_last[self.block] < target:
+            i = self.find_block(target)
+            if i >= self.n_blocks:
+                self.doc = END
+                return
+            self._load(i)
+        self.pos = bisect_left(self.docs, target, self.pos)
+        self.doc = self.docs[self.pos]
+
+
+def wand_top_k(
+    index,
+    q_tokens: List[str],
+    top_k: int,
+    deleted: AbstractSet[int] = frozenset(),
+    block_max: bool = True,
+    allowed: Sequence[int] | None = None,
+    term_weights: Dict[str, float] | None = None,
+    stats: Dict[str, int] | None = None,
+) -> List[Tuple[int, float]]:
+    """
+    Top-k BM25 evaluation with WAND pivoting and, if `block_max` is set,
+    Block-Max WAND skipping. Documents are only fully scored when the
+    sum of their terms' upper bounds can beat the current k-th score, so
+    the result has the same documents and scores as exhaustive scoring
+    (documents tied at the k-th score may be chosen differently).
+    Documents in `deleted` are never returned. If `allowed` (sorted doc
+    ids) is given, only those documents are considered and the cursors
+    jump straight from one allowed pivot to the next. `term_weights`
+    scales the scores (and bounds) of the terms it names. If `stats` is
+    given, the postings decoded and documents fully scored are added to
+    its "postings" and "candidates".
+
+    Returns (doc_id, score) pairs, best first.
+    """
+    if top_k <= 0:
+        return []
+
+    k1, b = index.k1, index.b
+    fallback = k1 + 1  # supremum of the tf component
+
+    cursors: Dict[str, TermCursor] = {}
+    for term, mult in Counter(q_tokens).items():
+        if term not in index.inverted:
+            continue
+        plist = index.inverted[term]
+        df = index.df[term]
+        idf = math.log(1 + (index.N - df + 0.5) / (df + 0.5))
+        if term_weights is not None:
+            idf *= term_weights.get(term, 1.0)
+        # Scores only grow with avg_len, by at most this ratio.
+        drift = max(1.0, index.avg_len / plist.bound_avg_len) if plist.bound_avg_len else 1.0
+        cursors[term] = TermCursor(term, plist, idf, idf * mult * drift, fallback)
+
+    doc_len = index.doc_len
+    avg_len = index.avg_len
+    heap: List[Tuple[float, int]] = []
+    theta = 0.0
+    scored = 0
+
+    by_doc = attrgetter("doc")
+    active = [c for c in cursors.values() if c.doc < END]
+    while active:
+        active.sort(key=by_doc)
+        while active and active[-1].doc >= END:
+            active.pop()
+        if not active:
+            break
+
+        # Pivot: first cursor where the accumulated upper bound beats theta.
+        acc = 0.0
+        p = -1
+        for i, c in enumerate(active):
+            acc += c.max_score
+            if acc > theta:
+                p = i
+                break
+        if p < 0:
+            break
+        pivot = active[p].doc
+        while p + 1 < len(active) and active[p + 1].doc == pivot:
+            p += 1
+
+        if allowed is not None:
+            # Docs before the pivot cannot beat theta, so moving every
+            # cursor up to the pivot to the next allowed doc is safe.
+            i = bisect_left(allowed, pivot)
+            target = allowed[i] if i < len(allowed) else END
+            if target != pivot:
+                for c in active[:p + 1]:
+                    c.next_geq(target)
+                continue
+
+        if block_max:
+            block_sum = 0.0
+            skip_to = active[p + 1].doc if p + 1 < len(active) else END
+            for c in active[:p + 1]:
+                bi = c.find_block(pivot)
+                if bi >= c.n_blocks:
+                    continue  # no postings at or after the pivot
+                block_sum += c.block_ub[bi]
+                if c.block_last[bi] < skip_to:
+                    skip_to = c.block_last[bi] + 1
+            if block_sum <= theta:
+                for c in active[:p + 1]:
+                    c.next_geq(skip_to)
+                continue
+
+        if active[0].doc == pivot and pivot in deleted:
+            for c in active[:p + 1]:
+                c.next_geq(pivot + 1)
+        elif active[0].doc == pivot:
+            dl = doc_len[pivot]
+            norm = k1 * (1 - b + b * dl / avg_len)
+            score = 0.0
+            # Same term order and arithmetic as exhaustive scoring.
+            for term in q_tokens:
+                c = cursors.get(term)
+                if c is not None and c.doc == pivot:
+                    tf = c.tf
+                    score += c.idf * (tf * (k1 + 1) / (tf + norm))
+            scored += 1
+
+            if len(heap) < top_k:
+                heapq.heappush(heap, (score, -pivot))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, -pivot))
+            if len(heap) == top_k:
+                theta = heap[0][0]
+
+            for c in active[:p + 1]:
+                c.next_geq(pivot + 1)
+        else:
+            for c in active[:p]:
+                c.next_geq(pivot)
+
+    if stats is not None:
+        stats["postings"] = stats.get("postings", 0) + sum(c.decoded for c in cursors.values())
+        stats["candidates"] = stats.get("candidates", 0) + scored
+
+    heap.sort(reverse=True)
+    return [(-neg_doc, score) for score, neg_doc in heap]
@@ -1,6 +1,10 @@
 import sqlite3
 from contextlib import contextmanager
 
+# Most `?` placeholders to bind in one statement, e.g. a chunked
+# `IN (...)` clause; SQLite builds before 3.32 allow only 999.
+MAX_IN_PARAMS = 500
+
 @contextmanager
 def get_db(db_path: str):
     conn = sqlite3.connect(db_path)